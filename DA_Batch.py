@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+    1. Main (batch execution of many cells)
+2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage and Current to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+
+== Part of DA ==
+- Batch runner: processes many cells with DA_Main_Process in a process pool.
+  Every cell runs in its own worker, a failing cell does not stop the others,
+  and the timing and status of every cell is written to a summary table.
+
+Usage:
+    python DA_Batch.py N1T1 N2T2 --workers 4
+    python DA_Batch.py "N*" --data-folder DA_Data --result-folder DA_Result
+
+
+Authors: Hans and Matthias
+
+"""
+
+import matplotlib
+matplotlib.use('Agg')                                                          # Workers never open a window
+
+import argparse
+import contextlib
+import fnmatch
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+import DA_Main
+from DA_Function.DA00_Function_Render import DA00_Function_Render_Setup
+from DA_Function.DA00_Function_Fleet import DA00_Function_Fleet_Consolidate
+
+#--------------------------------Cell Selection--------------------------------
+def DA_Batch_Find_Cells(data_folder,patterns):
+    # Every pattern is matched against the cell folders in data_folder, so a
+    # plain name selects one cell and a glob such as 'N*' selects many
+    available = sorted(name for name in os.listdir(data_folder)
+                       if os.path.isdir(f'{data_folder}/{name}'))
+    cells = []
+    for pattern in patterns:
+        matches = fnmatch.filter(available, pattern)
+        if not matches:
+            print(f"No cell matches '{pattern}' in '{data_folder}'.")
+        cells += [cell for cell in matches if cell not in cells]
+    return cells
+
+#---------------------------------Run One Cell---------------------------------
+def DA_Batch_Run_Cell(data_folder,result_folder,file_name,rated_capacity):
+    # Run one cell, the console output and warnings go to a log file next to
+    # its results
+    os.makedirs(f'{result_folder}/{file_name}', exist_ok=True)
+    log_path = f'{result_folder}/{file_name}/DA_Batch_{file_name}.log'
+    start = time.perf_counter()
+    status, error = 'done', ''
+    with open(log_path, 'w') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            DA00_Function_Render_Setup(headless=True)
+            DA_Main.DA_Main_Process(data_folder,result_folder,file_name,rated_capacity)
+        except Exception as exc:
+            status, error = 'failed', f'{type(exc).__name__}: {exc}'
+            traceback.print_exc(file=log)
+
+    return {'Cell': file_name,
+            'Status': status,
+            'Wall_Time_s': time.perf_counter() - start,
+            'Error': error,
+            'Log': log_path}
+
+#-----------------------------------Batch Run----------------------------------
+def DA_Batch_Run(data_folder,result_folder,cells,rated_capacity,workers):
+    summary = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(DA_Batch_Run_Cell, data_folder, result_folder,
+                                   cell, rated_capacity): cell for cell in cells}
+        for future in as_completed(futures):
+            cell = futures[future]
+            # A crashed worker process is reported like any other failure
+            try:
+                result = future.result()
+            except Exception as exc:
+                result = {'Cell': cell, 'Status': 'failed', 'Wall_Time_s': float('nan'),
+                          'Error': f'{type(exc).__name__}: {exc}', 'Log': ''}
+            print(f"{result['Cell']}: {result['Status']} in {result['Wall_Time_s']:.1f} s {result['Error']}")
+            summary.append(result)
+
+    df_summary = pd.DataFrame(summary, columns=['Cell', 'Status', 'Wall_Time_s', 'Error', 'Log'])
+    return df_summary.sort_values(by='Cell').reset_index(drop=True)
+
+#-------------------------------------Main-------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Process many cells of DA_Main.py in parallel.')
+    parser.add_argument('cells', nargs='+', help='cell names or glob patterns of folders in the data folder')
+    parser.add_argument('--data-folder', default=DA_Main.data_folder, help='folder of the data file(s)')
+    parser.add_argument('--result-folder', default=DA_Main.result_folder, help='folder for results')
+    parser.add_argument('--rated-capacity', type=float, default=DA_Main.rated_capacity, help='rated capacity of the battery (mAh)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--summary', default=None, help='summary CSV (default: <result-folder>/DA_Batch_Summary.csv)')
+    args = parser.parse_args()
+
+    cells = DA_Batch_Find_Cells(args.data_folder, args.cells)
+    print(f"Processing {len(cells)} cells with {args.workers} workers: {cells}")
+
+    start = time.perf_counter()
+    df_summary = DA_Batch_Run(args.data_folder, args.result_folder, cells,
+                              args.rated_capacity, args.workers)
+
+    summary_path = args.summary or f'{args.result_folder}/DA_Batch_Summary.csv'
+    os.makedirs(os.path.dirname(summary_path) or '.', exist_ok=True)
+    df_summary.to_csv(summary_path, index=False)
+    print(df_summary[['Cell', 'Status', 'Wall_Time_s']])
+    print(f"{(df_summary['Status'] == 'done').sum()} of {len(cells)} cells done in "
+          f"{time.perf_counter() - start:.1f} s, summary saved to {summary_path}")
+
+    # Merge the CE/SOH of the finished cells into the fleet store
+    if DA_Main.fleet_folder is not None:
+        DA00_Function_Fleet_Consolidate(DA_Main.fleet_folder)
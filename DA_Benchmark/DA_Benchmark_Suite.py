@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of DA00-DA06 on synthetic Neware cells
+
+Writes a synthetic cell for every size (DA_Benchmark_Synthetic_Data), runs
+DA_Main_Process on it headless with profiling on and collects the wall time,
+CPU time and peak RSS of every DA function and sub-step. Every size runs in
+a fresh process, so the peak RSS of one size does not hide the next. The
+results are compared with the stored baseline, a step is a regression when
+it is slower than the baseline by more than the tolerance. Runs offline, the
+baseline is only comparable on the same machine.
+
+Usage (from the repository root):
+    python -m DA_Benchmark.DA_Benchmark_Suite
+    python -m DA_Benchmark.DA_Benchmark_Suite --rows 1000 10000000 --work-folder DA_Benchmark/data
+    python -m DA_Benchmark.DA_Benchmark_Suite --save-baseline
+
+
+Authors: Hans and Matthias
+
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from DA_Benchmark.DA_Benchmark_Synthetic_Data import (interval_for_rows,
+                                                      write_synthetic_cell)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DA_Benchmark_Baseline.json')
+RATED_CAPACITY = 2100
+
+#----------------------------------Cell Sizes----------------------------------
+def cycles_for_rows(rows):
+    # Longer tests have more cycles: 2 cycles up to 10^5 records, 250 cycles
+    # at 10^7 records (0.5 s logging), the sampling rate makes up the rest
+    return int(np.clip(rows // 40000, 2, 250))
+
+def cell_name(rows, seed):
+    return f'SYN_{rows}_{seed}'
+
+#------------------------------------One Size----------------------------------
+def run_size(data_folder, result_folder, rows, chunks, seed):
+    # Runs in its own process: write the cell (unless it is there already),
+    # process it with DA_Main and return the profile summary
+    import DA_Main
+    from DA_Function.DA00_Function_Render import DA00_Function_Render_Setup, DA00_Function_Render_Wait
+
+    file_name = cell_name(rows, seed)
+    if not os.path.exists(f'{data_folder}/{file_name}/{file_name}__0.txt'):
+        cycles = cycles_for_rows(rows)
+        write_synthetic_cell(data_folder, file_name, cycles, interval_for_rows(rows, cycles),
+                             chunks, RATED_CAPACITY, seed)
+
+    # Plain import of every cell, no caches or fleet store, figures saved headless
+    DA_Main.cache_folder = None
+    DA_Main.fleet_folder = None
+    DA_Main.incremental = False
+    DA_Main.streaming = False
+    DA_Main.headless = True
+    DA_Main.profiling = True
+    DA_Main.profiling_cprofile = False
+    DA00_Function_Render_Setup(True)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        DA_Main.DA_Main_Process(data_folder,result_folder,file_name,RATED_CAPACITY)
+        DA00_Function_Render_Wait()
+    total = time.perf_counter() - start
+
+    df_profile = pd.read_csv(f'{result_folder}/{file_name}/DA_Profile_{file_name}.csv')
+    df_profile.loc[len(df_profile)] = {'Step': 'DA_Main_Process', 'Calls': 1, 'Wall_Time_s': total}
+    df_profile.insert(0, 'Records', rows)
+    return df_profile
+
+#-----------------------------------Baseline-----------------------------------
+def machine_info():
+    return {'platform': platform.platform(), 'processor': platform.processor(),
+            'cpu_count': os.cpu_count(), 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__}
+
+def load_baseline(baseline_path):
+    if not os.path.exists(baseline_path):
+        return None, pd.DataFrame(columns=['Records', 'Step', 'Baseline_Wall_Time_s'])
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    df_baseline = pd.DataFrame(baseline['results'], columns=['Records', 'Step', 'Wall_Time_s'])
+    return baseline['machine'], df_baseline.rename(columns={'Wall_Time_s': 'Baseline_Wall_Time_s'})
+
+def save_baseline(baseline_path, df_results):
+    # Sizes not in this run keep their stored baseline
+    _, df_baseline = load_baseline(baseline_path)
+    df_baseline = df_baseline.rename(columns={'Baseline_Wall_Time_s': 'Wall_Time_s'})
+    df_baseline = df_baseline[~df_baseline['Records'].isin(df_results['Records'])]
+    df_baseline = pd.concat([df for df in [df_baseline, df_results[['Records', 'Step', 'Wall_Time_s']]] if len(df)],
+                            ignore_index=True)
+    with open(baseline_path, 'w') as f:
+        json.dump({'machine': machine_info(),
+                   'results': df_baseline.sort_values(by=['Records', 'Step']).round(4).to_dict(orient='records')},
+                  f, indent=1)
+    print(f'Baseline saved to {baseline_path}')
+
+def compare_baseline(df_results, df_baseline, tolerance, min_seconds):
+    # Slower than the baseline by more than tolerance and min_seconds
+    df_compare = df_results.merge(df_baseline, on=['Records', 'Step'], how='left')
+    df_compare['Ratio'] = df_compare['Wall_Time_s'] / df_compare['Baseline_Wall_Time_s']
+    df_compare['Regression'] = ((df_compare['Ratio'] > 1 + tolerance)
+                                & (df_compare['Wall_Time_s'] - df_compare['Baseline_Wall_Time_s'] > min_seconds))
+    return df_compare
+
+#-------------------------------------Main-------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark DA00-DA06 on synthetic Neware cells.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help='number of records of the synthetic cells (default 10^3 to 10^6)')
+    parser.add_argument('--chunks', type=int, default=2, help='number of txt files per cell')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data')
+    parser.add_argument('--work-folder', default=None,
+                        help='folder for the cells and results, kept and reused (default: temporary)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown')
+    parser.add_argument('--min-seconds', type=float, default=0.1, help='allowed absolute slowdown (s)')
+    parser.add_argument('--output', default=None, help='results CSV (default: <work-folder>/DA_Benchmark_Results.csv)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        work_folder = args.work_folder or tmp_folder
+        data_folder, result_folder = f'{work_folder}/data', f'{work_folder}/result'
+        results = []
+        for rows in args.rows:
+            print(f'Benchmark with {rows} records ({cycles_for_rows(rows)} cycles) ...')
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                df_profile = executor.submit(run_size, data_folder, result_folder, rows,
+                                             args.chunks, args.seed).result()
+            print(f"    DA_Main_Process: {df_profile['Wall_Time_s'].iloc[-1]:.2f} s")
+            results.append(df_profile)
+        df_results = pd.concat(results, ignore_index=True)
+
+        baseline_machine, df_baseline = load_baseline(args.baseline)
+        df_compare = compare_baseline(df_results, df_baseline, args.tolerance, args.min_seconds)
+        output_path = args.output or f'{work_folder}/DA_Benchmark_Results.csv'
+        if args.output or args.work_folder:
+            df_compare.to_csv(output_path, index=False)
+            print(f'Results saved to {output_path}')
+
+    pd.set_option('display.width', 200)
+    print(df_compare[['Records', 'Step', 'Calls', 'Rows', 'Cycles', 'Wall_Time_s', 'CPU_Time_s', 'Peak_RSS_MB',
+                      'Baseline_Wall_Time_s', 'Ratio', 'Regression']].to_string(index=False, float_format=lambda t: f'{t:.3f}'))
+    if baseline_machine is not None and baseline_machine != machine_info():
+        print(f'Baseline was recorded on another machine or environment: {baseline_machine}')
+
+    if args.save_baseline:
+        save_baseline(args.baseline, df_results)
+    elif df_compare['Regression'].any():
+        print(f"{df_compare['Regression'].sum()} steps slower than the baseline.")
+        sys.exit(1)
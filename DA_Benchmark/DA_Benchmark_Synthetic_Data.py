@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic Neware cells for the benchmarks of DA00-DA06
+
+Writes a cell in the Neware txt export format of DA_Data, split into chunk
+files '{file_name}__{i}.txt'. Every cycle runs Rest, CC_Chg, CV_Chg, Rest,
+CC_DChg, Rest on a model cell: an open circuit voltage with two plateaus (two
+dQ/dV peaks per direction), an internal resistance growing with the cycles
+(an I*R voltage step whenever the current starts or stops), capacity fade,
+a tapering CV current, voltage relaxation in the rests and measurement
+noise. 'Time', 'Capacity' and 'Energy' restart with every step,
+like in a Neware export. The chunk files are split by record count, so a
+cycle can span two files.
+
+Usage (from the repository root):
+    python -m DA_Benchmark.DA_Benchmark_Synthetic_Data DA_Data SYN1 --cycles 50 --interval 1 --chunks 4
+    python -m DA_Benchmark.DA_Benchmark_Synthetic_Data DA_Data SYN2 --rows 1000000
+
+
+Authors: Hans and Matthias
+
+"""
+
+import argparse
+import datetime
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+# Columns of the Neware txt export
+NEWARE_COLUMNS = ['Cycle ID', 'Step ID', 'Step Name', 'Record ID', 'Time(h:min:s.ms)',
+                  'Voltage(V)', 'Current(mA)', 'Capacity(mAh)', 'Energy(mWh)',
+                  'Realtime', 'dQ/dV(mAh/V)']
+
+# Test protocol and model cell
+PROTOCOL = {'c_rate_chg': 0.5,                                                 # CC charge current (C)
+            'c_rate_dchg': 0.5,                                                # CC discharge current (C)
+            'v_max': 4.2,                                                      # charge cut-off / CV voltage (V)
+            'v_min': 2.75,                                                     # discharge cut-off voltage (V)
+            'c_rate_cutoff': 0.05,                                             # CV cut-off current (C)
+            'rest_s': 1800,                                                    # duration of every rest (s)
+            'resistance': 0.05,                                                # internal resistance of cycle 1 (Ohm)
+            'resistance_growth': 0.002,                                        # relative resistance growth per cycle
+            'fade': 0.0005,                                                    # relative capacity fade per cycle
+            'noise_v': 0.0005}                                                 # voltage noise (V)
+
+#--------------------------------Model Cell------------------------------------
+def ocv(soc):
+    # Open circuit voltage with plateaus around 30 % and 70 % SOC and steep
+    # ends, so the cut-off voltages are reached before the cell is empty/full
+    return (3.05 + 1.0 * soc + 0.08 * np.tanh((soc - 0.3) * 25) + 0.06 * np.tanh((soc - 0.7) * 25)
+            - 0.3 * np.exp(-soc / 0.03) + 0.05 * np.exp(-(1 - soc) / 0.03))
+
+def cycle_duration(protocol=PROTOCOL):
+    # Approximate duration of one cycle (s), for choosing the sampling rate
+    chg_s = 3600 / protocol['c_rate_chg']
+    dchg_s = 3600 / protocol['c_rate_dchg']
+    return 3 * protocol['rest_s'] + 1.1 * chg_s + dchg_s
+
+def interval_for_rows(rows, cycles, protocol=PROTOCOL):
+    # Sampling interval (s) which gives about rows records for cycles cycles
+    return cycles * cycle_duration(protocol) / rows
+
+#--------------------------------Steps of a Cycle------------------------------
+def cycle_steps(cycle_id, soc, interval, rated_capacity, rng, protocol=PROTOCOL):
+    # List of (step name, voltage, current) arrays of one cycle, starting at
+    # soc. Returns the steps and the soc at the end of the cycle
+    capacity = rated_capacity * (1 - protocol['fade'] * (cycle_id - 1))               # mAh
+    resistance = protocol['resistance'] * (1 + protocol['resistance_growth'] * (cycle_id - 1))
+    noise = lambda n: rng.normal(0, protocol['noise_v'], n)
+    steps = []
+
+    def rest(soc, v_start):
+        # Exponential relaxation, after the CV step always down from v_max.
+        # v_start is the voltage once the current stopped, after its I*R step.
+        # Returns the voltage at the end of the rest (without noise)
+        t = np.arange(1, max(int(protocol['rest_s'] / interval), 1) + 1) * interval
+        v_ocv = min(ocv(soc), protocol['v_max'] - 0.02)
+        voltage = v_ocv + (v_start - v_ocv) * np.exp(-t / 300)
+        steps.append(('Rest', voltage + noise(len(t)), np.zeros(len(t))))
+        return voltage[-1]
+
+    def constant_current(soc, current, v_limit, v_rest):
+        # Runs until the terminal voltage crosses v_limit, soc stays in [0, 1].
+        # The voltage steps by I*R from v_rest, the end of the rest before,
+        # whose offset to the open circuit voltage decays as in a rest
+        soc_rate = current * interval / 3600 / capacity
+        n = max(int(np.ceil((1 - soc if current > 0 else soc) / abs(soc_rate))), 1)
+        soc_t = np.clip(soc + soc_rate * np.arange(1, n + 1), 0, 1)
+        t = np.arange(1, n + 1) * interval
+        voltage = ocv(soc_t) + (v_rest - ocv(soc)) * np.exp(-t / 300) + current / 1000 * resistance
+        crossed = np.nonzero(voltage >= v_limit if current > 0 else voltage <= v_limit)[0]
+        n = max(crossed[0], 1) if len(crossed) else n
+        steps.append((f"CC_{'Chg' if current > 0 else 'DChg'}", voltage[:n] + noise(n), np.full(n, current)))
+        return soc_t[n - 1], voltage[n - 1]
+
+    # Charge: Rest, CC_Chg, CV_Chg, Rest
+    v_rest = rest(soc, ocv(soc))
+    soc, _ = constant_current(soc, protocol['c_rate_chg'] * rated_capacity, protocol['v_max'], v_rest)
+    current_start = max((protocol['v_max'] - ocv(soc)) / resistance * 1000,
+                        protocol['c_rate_cutoff'] * rated_capacity * 1.01)
+    tau = 0.05 * 3600 / protocol['c_rate_chg']                                 # CV adds about 5 % capacity
+    n = max(int(np.ceil(tau * np.log(current_start / (protocol['c_rate_cutoff'] * rated_capacity)) / interval)), 1)
+    current = current_start * np.exp(-np.arange(1, n + 1) * interval / tau)
+    steps.append(('CV_Chg', protocol['v_max'] + noise(n), current))
+    soc = min(soc + current.sum() * interval / 3600 / capacity, 1.0)
+    v_rest = rest(soc, protocol['v_max'] - current[-1] / 1000 * resistance)
+
+    # Discharge: CC_DChg, Rest
+    current = -protocol['c_rate_dchg'] * rated_capacity
+    soc, v_end = constant_current(soc, current, protocol['v_min'], v_rest)
+    rest(soc, v_end - current / 1000 * resistance)
+    return steps, soc
+
+#------------------------------Records of a Cycle------------------------------
+def cycle_records(cycle_id, steps, first_step_id, first_record_id, start_time, interval):
+    # Neware columns of one cycle, 'Time', 'Capacity', 'Energy' per step
+    parts = []
+    for step_offset, (step_name, voltage, current) in enumerate(steps):
+        n = len(voltage)
+        step_time = np.arange(1, n + 1) * interval
+        capacity = np.cumsum(np.abs(current)) * interval / 3600                                  # mAh
+        energy = np.cumsum(np.abs(current) * voltage) * interval / 3600                          # mWh
+        if step_name == 'Rest' or n < 2:
+            dqdv = np.zeros(n)
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                dqdv = np.nan_to_num(np.gradient(capacity) / np.gradient(voltage), posinf=0, neginf=0)
+        parts.append(pd.DataFrame({'Cycle ID': cycle_id,
+                                   'Step ID': first_step_id + step_offset,
+                                   'Step Name': step_name,
+                                   'Step_Time': step_time,
+                                   'Voltage(V)': voltage.round(4),
+                                   'Current(mA)': current.round(1),
+                                   'Capacity(mAh)': capacity.round(2),
+                                   'Energy(mWh)': energy.round(2),
+                                   'dQ/dV(mAh/V)': dqdv.round(2)}))
+    df_cycle = pd.concat(parts, ignore_index=True)
+    df_cycle.insert(3, 'Record ID', first_record_id + np.arange(len(df_cycle)))
+    elapsed = np.cumsum(np.full(len(df_cycle), interval))
+    df_cycle['Realtime'] = start_time + pd.to_timedelta(elapsed, unit='s')
+    return df_cycle, start_time + pd.Timedelta(seconds=elapsed[-1])
+
+def format_durations(ms):
+    # 'h:mm:ss.mmm' text of integer milliseconds, built as a character matrix
+    # per hour width (the inverse of DA00_Function_Duration_Milliseconds)
+    hours = ms // 3600000
+    hour_digits = np.maximum(np.floor(np.log10(np.maximum(hours, 1))).astype(np.int64) + 1, 1)
+    text = np.empty(len(ms), dtype=object)
+    for width in np.unique(hour_digits):
+        rows = hour_digits == width
+        values = [hours[rows] // 10**k % 10 for k in range(width - 1, -1, -1)]
+        values += [ord(':') - ord('0'), ms[rows] // 600000 % 6, ms[rows] // 60000 % 10,
+                   ord(':') - ord('0'), ms[rows] // 10000 % 6, ms[rows] // 1000 % 10,
+                   ord('.') - ord('0'), ms[rows] // 100 % 10, ms[rows] // 10 % 10, ms[rows] % 10]
+        chars = (np.column_stack(np.broadcast_arrays(*values)) + ord('0')).astype(np.uint8)
+        text[rows] = np.ascontiguousarray(chars).view(f'S{width + 10}').ravel().astype(str)
+    return text
+
+def format_realtimes(realtime):
+    # 'mm/dd/yyyy HH:MM:SS' text, the characters of the ISO text rearranged
+    iso = np.asarray(realtime, dtype='datetime64[s]').astype('U19')
+    chars = iso.view(np.uint32).reshape(len(iso), 19)
+    chars = chars[:, [5, 6, 4, 8, 9, 4, 0, 1, 2, 3, 10, 11, 12, 13, 14, 15, 16, 17, 18]]
+    chars[:, [2, 5]] = ord('/')
+    chars[:, 10] = ord(' ')
+    return np.ascontiguousarray(chars).view('U19').ravel()
+
+def format_records(df_records):
+    # Neware text formats: 'h:mm:ss.mmm' step time, 'mm/dd/yyyy HH:MM:SS' realtime
+    ms = np.rint(df_records.pop('Step_Time').to_numpy() * 1000).astype(np.int64)
+    df_records.insert(4, 'Time(h:min:s.ms)', format_durations(ms))
+    df_records['Realtime'] = format_realtimes(df_records['Realtime'])
+    return df_records[NEWARE_COLUMNS]
+
+#---------------------------------Cell Writing---------------------------------
+def write_synthetic_cell(data_folder, file_name, cycles=10, interval=1.0, chunks=1,
+                         rated_capacity=2100, seed=0, protocol=PROTOCOL):
+    # Write the cell to data_folder/file_name/file_name__{i}.txt and return
+    # the number of records. The cycles are generated one at a time, so the
+    # memory stays at a few cycles also for 10^7 records
+    def all_cycles():
+        # Same seed on every pass, so every pass gives the same records
+        rng = np.random.default_rng(seed)
+        soc = 0.02
+        for cycle_id in range(1, cycles + 1):
+            steps, soc = cycle_steps(cycle_id, soc, interval, rated_capacity, rng, protocol)
+            yield cycle_id, steps
+
+    # First pass only counts the records, to split them evenly over the chunks
+    total_rows = sum(len(voltage) for _, steps in all_cycles() for _, voltage, _ in steps)
+    chunk_stops = [total_rows * (i + 1) // chunks for i in range(chunks)]
+
+    os.makedirs(f'{data_folder}/{file_name}', exist_ok=True)
+    for old_path in glob.glob(f'{data_folder}/{file_name}/{file_name}__*.txt'):
+        os.remove(old_path)
+    chunk, written = 0, 0
+    step_id, record_id = 1, 1
+    start_time = pd.Timestamp(datetime.datetime(2024, 10, 20, 8, 0, 0))
+    for cycle_id, steps in all_cycles():
+        df_cycle, start_time = cycle_records(cycle_id, steps, step_id, record_id, start_time, interval)
+        step_id += len(steps)
+        record_id += len(df_cycle)
+        df_cycle = format_records(df_cycle)
+        # Split the cycle where a chunk file ends
+        while len(df_cycle):
+            take = chunk_stops[chunk] - written
+            file_path = f'{data_folder}/{file_name}/{file_name}__{chunk}.txt'
+            df_cycle.iloc[:take].to_csv(file_path, sep='\t', index=False, mode='a',
+                                        header=not os.path.exists(file_path))
+            written += min(take, len(df_cycle))
+            df_cycle = df_cycle.iloc[take:]
+            if written == chunk_stops[chunk] and chunk < chunks - 1:
+                chunk += 1
+    print(f"Synthetic cell {file_name}: {cycles} cycles, {total_rows} records, {chunks} files in {data_folder}/{file_name}")
+    return total_rows
+
+#-------------------------------------Main-------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic cell in the Neware txt format.')
+    parser.add_argument('data_folder', help='folder of the data file(s)')
+    parser.add_argument('file_name', help='name of the cell')
+    parser.add_argument('--cycles', type=int, default=10, help='number of cycles')
+    parser.add_argument('--interval', type=float, default=1.0, help='sampling interval (s)')
+    parser.add_argument('--rows', type=int, default=None, help='approximate number of records, sets the sampling interval')
+    parser.add_argument('--chunks', type=int, default=1, help='number of txt files')
+    parser.add_argument('--rated-capacity', type=float, default=2100, help='rated capacity of the cell (mAh)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the measurement noise')
+    args = parser.parse_args()
+
+    interval = args.interval if args.rows is None else interval_for_rows(args.rows, args.cycles)
+    write_synthetic_cell(args.data_folder, args.file_name, args.cycles, interval, args.chunks,
+                         args.rated_capacity, args.seed)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the Time_Diff / Cycle_Time pipeline of DA00
+
+Compares the previous per-row implementation (string timedelta, groupby diff
+and a Python lambda per sample) with the vectorized implementation of
+DA00_Function_Duration_Milliseconds and DA00_Function_Prepare_Main on a
+synthetic Neware-like file (0.5 s logging).
+
+Usage (from the repository root):
+    python -m DA_Benchmark.DA_Benchmark_Time_Diff --rows 10000000
+
+
+Authors: Hans and Matthias
+
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from DA_Function.DA00_Function_Import_Main_df import (DA00_Function_Duration_Milliseconds,
+                                                      DA00_Function_Prepare_Main)
+
+#------------------------------Synthetic Data File-----------------------------
+def write_synthetic_file(file_path, rows, rows_per_cycle=20000, block=1_000_000):
+    # 0.5 s logging, 'Time' restarts with every step of 1000 records, written
+    # in blocks to keep the memory of the generator small
+    for first in range(0, rows, block):
+        record = np.arange(first, min(first + block, rows))
+        time_ms = (record % 1000) * 500
+        df = pd.DataFrame({
+            'Cycle ID': record // rows_per_cycle + 1,
+            'Record ID': record + 1,
+            'Time(h:min:s.ms)': [f'{ms // 3600000}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}'
+                                 for ms in time_ms],
+            'Voltage': 3.7,
+            'Current': 1000.0,
+            'Capacity': 0.0,
+            })
+        df.to_csv(file_path, sep='\t', index=False, mode='w' if first == 0 else 'a', header=first == 0)
+
+#-----------------------------Previous Implementation--------------------------
+def time_diff_previous(df_main):
+    df_main['Time'] = pd.to_timedelta(df_main['Time'].astype(str))
+    df_main = df_main.sort_values(by=['Cycle ID', 'Record ID', 'Time']).reset_index(drop=True)
+    df_main['Time_Diff'] = df_main.groupby('Cycle ID')['Time'].diff().fillna(pd.Timedelta(seconds=0))
+    df_main['Time_Diff'] = df_main['Time_Diff'].apply(lambda x: max(x.total_seconds(), 0))
+    df_main['Cycle_Time'] = df_main.groupby('Cycle ID')['Time_Diff'].cumsum()
+    return df_main
+
+#------------------------------Current Implementation--------------------------
+def time_diff_vectorized(df_main):
+    df_main['Time'] = pd.to_timedelta(DA00_Function_Duration_Milliseconds(df_main['Time']), unit='ms')
+    return DA00_Function_Prepare_Main(df_main)
+
+#-------------------------------------Main-------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Time_Diff/Cycle_Time pipeline of DA00.')
+    parser.add_argument('--rows', type=int, default=10_000_000, help='number of synthetic records')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        file_path = os.path.join(tmp_folder, 'BM__0.txt')
+        print(f'Writing synthetic file with {args.rows} rows ...')
+        write_synthetic_file(file_path, args.rows)
+        df_raw = pd.read_csv(file_path, sep='\t', index_col=False).rename(columns={'Time(h:min:s.ms)': 'Time'})
+
+    results = {}
+    for name, function in [('previous', time_diff_previous), ('vectorized', time_diff_vectorized)]:
+        start = time.perf_counter()
+        df_main = function(df_raw.copy())
+        print(f'{name:>10}: {time.perf_counter() - start:8.2f} s')
+        results[name] = df_main[['Time_Diff', 'Cycle_Time']]
+        del df_main
+
+    # Both implementations must give the same Cycle_Time
+    np.testing.assert_allclose(results['vectorized']['Cycle_Time'], results['previous']['Cycle_Time'])
+    np.testing.assert_allclose(results['vectorized']['Time_Diff'], results['previous']['Time_Diff'])
+    print('Results identical, memory of Time_Diff:',
+          f"{results['previous']['Time_Diff'].nbytes / 1e6:.0f} MB ->",
+          f"{results['vectorized']['Time_Diff'].nbytes / 1e6:.0f} MB")
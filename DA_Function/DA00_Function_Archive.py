@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for random access to single cycles of the raw data. The
+  df_main of the import cache (one .npy file per column, rows in cycle
+  order) is the archive: its columns are memory-mapped and an offset index
+  gives the first and last row of every cycle and step. Loading a few cycles
+  only reads the pages of their rows, not the rest of the cell.
+
+Usage (from the repository root):
+    python -m DA_Function.DA00_Function_Archive DA_Cache N1T1 --cycles 120 500 2999
+    python -m DA_Function.DA00_Function_Archive DA_Cache N1T1 --cycles 3 --columns Voltage Current --data-folder DA_Data
+
+
+Authors: Hans and Matthias
+
+"""
+
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from DA_Function.DA00_Function_Cache import (DA00_Function_Cache_Save,
+                                             DA00_Function_Cache_Load)
+from DA_Function.DA00_Function_Import_Main_df import (DA00_Function_Import,
+                                                      DA00_Function_Import_Signatures)
+
+#-----------------------------------Offset Index-------------------------------
+def DA00_Function_Archive_Index(df_main):
+    # First and last row (Start, Stop) of every cycle and of every step of a
+    # df_main sorted by cycle
+    cycle_ids = np.asarray(df_main['Cycle ID'])
+    step_ids = np.asarray(df_main['Step ID'])
+    cycle_bounds = np.r_[0, np.flatnonzero(np.diff(cycle_ids)) + 1, len(cycle_ids)]
+    step_bounds = np.r_[0, np.flatnonzero((np.diff(cycle_ids) != 0) | (np.diff(step_ids) != 0)) + 1, len(step_ids)]
+    if np.any(np.diff(cycle_ids) < 0):
+        raise ValueError("df_main is not sorted by 'Cycle ID', it can not be indexed.")
+    df_cycles = pd.DataFrame({'Cycle ID': cycle_ids[cycle_bounds[:-1]],
+                              'Start': cycle_bounds[:-1], 'Stop': cycle_bounds[1:]})
+    df_steps = pd.DataFrame({'Cycle ID': cycle_ids[step_bounds[:-1]],
+                             'Step ID': step_ids[step_bounds[:-1]],
+                             'Step Name': np.asarray(df_main['Step Name'])[step_bounds[:-1]].astype(str),
+                             'Start': step_bounds[:-1], 'Stop': step_bounds[1:]})
+    return df_cycles, df_steps
+
+#------------------------------------Archive-----------------------------------
+class DA00_Archive:
+    # Memory-mapped columns of the df_main cache of one cell with its offset
+    # index. archive.cycles / archive.steps are the index dataframes
+    def __init__(self, cache_folder, file_name):
+        self.path = f'{cache_folder}/{file_name}/df_main'
+        with open(f'{self.path}/manifest.json') as f:
+            self.manifest = json.load(f)
+        self.columns = [column['name'] for column in self.manifest['columns']]
+        self.arrays = {column['name']: np.load(f"{self.path}/{column['file']}", mmap_mode='r', allow_pickle=False)
+                       for column in self.manifest['columns']}
+
+        # The index is stored next to the cache entry, with the same source
+        index_path = f'{cache_folder}/{file_name}/df_main_index'
+        self.cycles = DA00_Function_Cache_Load(f'{index_path}/cycles', self.manifest['source'], mmap=False)
+        self.steps = DA00_Function_Cache_Load(f'{index_path}/steps', self.manifest['source'], mmap=False)
+        if self.cycles is None or self.steps is None:
+            self.cycles, self.steps = DA00_Function_Archive_Index(self.frame(['Cycle ID', 'Step ID', 'Step Name']))
+            DA00_Function_Cache_Save(self.cycles, f'{index_path}/cycles', self.manifest['source'])
+            DA00_Function_Cache_Save(self.steps, f'{index_path}/steps', self.manifest['source'])
+        self.positions = dict(zip(self.cycles['Cycle ID'], zip(self.cycles['Start'], self.cycles['Stop'])))
+
+    def frame(self, columns=None, rows=slice(None)):
+        # Dataframe of the rows (slice or index array) of the columns, only
+        # these rows are read from the mapped files
+        data = {}
+        for column in self.manifest['columns']:
+            if columns is not None and column['name'] not in columns:
+                continue
+            values = self.arrays[column['name']][rows]
+            if 'categories' in column:
+                values = pd.Categorical.from_codes(values, categories=column['categories'])
+            elif values.dtype.kind == 'U':
+                values = values.astype(object)
+            data[column['name']] = values
+        return pd.DataFrame(data)
+
+    def rows(self, spans):
+        # Row numbers of a list of (Start, Stop) spans
+        return np.concatenate([np.arange(start, stop) for start, stop in spans]) if spans else np.array([], dtype=np.int64)
+
+    def load_cycles(self, cycle_ids, columns=None):
+        missing = [cycle_id for cycle_id in cycle_ids if cycle_id not in self.positions]
+        if missing:
+            raise KeyError(f"Cycles {missing} are not in the archive of {os.path.dirname(self.path)}.")
+        return self.frame(columns, self.rows([self.positions[cycle_id] for cycle_id in cycle_ids]))
+
+    def load_steps(self, cycle_ids, step_names, columns=None):
+        # Rows of the steps with one of step_names (e.g. ['CC_DChg']) in the cycles
+        df_steps = self.steps[self.steps['Cycle ID'].isin(cycle_ids) & self.steps['Step Name'].isin(step_names)]
+        return self.frame(columns, self.rows(list(zip(df_steps['Start'], df_steps['Stop']))))
+
+#----------------------------------Opening-------------------------------------
+def DA00_Function_Archive_Open(cache_folder,file_name,data_folder=None,schema=None,parser='numpy'):
+    # Open the archive of the cell. With data_folder the archive is checked
+    # against the data files and imported again (DA00_Function_Import) when
+    # it is missing or stale, without it the last stored archive is used
+    manifest_path = f'{cache_folder}/{file_name}/df_main/manifest.json'
+    if data_folder is not None:
+        signatures = DA00_Function_Import_Signatures(data_folder,file_name)
+        stored = None
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                stored = json.load(f)['source'][:-1]                           # last entry is the schema
+        if stored != signatures:
+            print(f"Archive of {file_name} is missing or stale, importing '{data_folder}/{file_name}'.")
+            DA00_Function_Import(data_folder,file_name,None,cache_folder,schema,parser)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"No archive of {file_name} in '{cache_folder}', import it with a cache_folder "
+                                f"or pass data_folder.")
+    return DA00_Archive(cache_folder,file_name)
+
+def DA00_Function_Load_Cycles(cache_folder,file_name,cycle_ids,columns=None,data_folder=None):
+    # Records of the cycles, e.g. DA00_Function_Load_Cycles('DA_Cache','N1T1',[120,500,2999]),
+    # in the order of cycle_ids with the columns of df_main
+    return DA00_Function_Archive_Open(cache_folder,file_name,data_folder).load_cycles(cycle_ids,columns)
+
+#-------------------------------------Main-------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load single cycles from the archive of a cell.')
+    parser.add_argument('cache_folder', help='cache folder of DA_Main.py (cache_folder)')
+    parser.add_argument('file_name', help='name of the cell')
+    parser.add_argument('--cycles', type=int, nargs='*', default=[], help='cycle IDs to load')
+    parser.add_argument('--columns', nargs='*', default=None, help='columns to load (default all)')
+    parser.add_argument('--data-folder', default=None, help='import the cell again when the archive is stale')
+    parser.add_argument('--output', default=None, help='CSV file for the loaded records')
+    args = parser.parse_args()
+
+    archive = DA00_Function_Archive_Open(args.cache_folder, args.file_name, args.data_folder)
+    print(f"{args.file_name}: {len(archive.cycles)} cycles, {len(archive.steps)} steps, "
+          f"{archive.manifest['rows']} records, columns {archive.columns}")
+    if args.cycles:
+        df_cycles = archive.load_cycles(args.cycles, args.columns)
+        print(df_cycles)
+        if args.output:
+            df_cycles.to_csv(args.output, index=False)
+            print(f"Records saved to {args.output}")
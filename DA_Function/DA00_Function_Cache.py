@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for the binary import cache (one .npy file per column)
+
+
+Authors: Hans and Matthias
+
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+#-----------------------------Source File Signature----------------------------
+def DA00_Function_Cache_Signature(file_path):
+    # Identify a source file by its path, size and modification time, a cache
+    # entry is only valid while all three are unchanged
+    stat = os.stat(file_path)
+    return {'path': os.path.abspath(file_path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns}
+
+#---------------------------------Cache Saving---------------------------------
+def DA00_Function_Cache_Save(df, cache_path, signatures):
+    # Remove the old entry first, the manifest is written last so an
+    # interrupted save never leaves a valid-looking entry behind
+    if os.path.exists(cache_path):
+        shutil.rmtree(cache_path)
+    os.makedirs(cache_path, exist_ok=True)
+
+    columns = []
+    for idx, column in enumerate(df.columns):
+        entry = {'name': column, 'file': f'col_{idx}.npy', 'dtype': str(df[column].dtype)}
+        # Categorical columns are stored as their codes, the categories go to
+        # the manifest
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            values = df[column].cat.codes.to_numpy()
+            entry['categories'] = [str(category) for category in df[column].cat.categories]
+        else:
+            values = df[column].to_numpy()
+        # Strings are stored as fixed width unicode so the column can be mapped
+        if values.dtype == object:
+            values = values.astype(str)
+        np.save(f'{cache_path}/col_{idx}.npy', values, allow_pickle=False)
+        columns.append(entry)
+
+    manifest = {'source': signatures, 'rows': len(df), 'columns': columns}
+    with open(f'{cache_path}/manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+#---------------------------------Cache Loading--------------------------------
+def DA00_Function_Cache_Load(cache_path, signatures, mmap=True):
+    # Return the cached dataframe, or None when the entry is missing or any of
+    # its source files changed since it was written (signatures=None skips 
+    # the check and returns the last stored entry)
+    manifest_path = f'{cache_path}/manifest.json'
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if signatures is not None and manifest['source'] != signatures:
+        return None
+
+    data = {}
+    for column in manifest['columns']:
+        values = np.load(f"{cache_path}/{column['file']}",
+                         mmap_mode='r' if mmap else None, allow_pickle=False)
+        # Restore the original pandas dtype of string and categorical columns
+        if 'categories' in column:
+            values = pd.Categorical.from_codes(values, categories=column['categories'])
+        elif values.dtype.kind == 'U':
+            values = values.astype(object)
+        data[column['name']] = values
+
+    return pd.DataFrame(data)
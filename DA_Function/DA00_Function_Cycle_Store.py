@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for the long-format V-Q cycle store. One row per sample
+  (Cycle ID, Direction, Step Name, Voltage, Capacity, dQdV) with an offset
+  index per cycle and direction. Columns of the wide df_VQ_grouped, such as
+  'Cycle_3_CapChg', are served as zero-copy slices, so DA02-DA06 can use the
+  store in place of the wide dataframe.
+
+
+Authors: Hans and Matthias
+
+"""
+
+import re
+import pandas as pd
+
+# Wide column name parts: quantity prefix to long column, direction suffix
+VQ_QUANTITIES = {'V': 'Voltage', 'Cap': 'Capacity', 'dQdV': 'dQdV'}
+VQ_DIRECTIONS = ['Chg', 'DChg']
+
+#-----------------------------------Cycle Store--------------------------------
+class DA00_Cycle_Store:
+    def __init__(self, df_VQ_long, df_VQ_offsets, df_summary=None):
+        self.data = df_VQ_long                                                 # one row per sample
+        self.offsets = df_VQ_offsets                                           # Start/Stop rows per cycle and direction
+        self.summary = df_summary                                              # one row per cycle (DA00_Function_Cycle_Summary)
+        self.arrays = {quantity: df_VQ_long[quantity].to_numpy() for quantity in VQ_QUANTITIES.values()}
+        self.positions = {(cycle_id, direction): (row[f'{direction}_Start'], row[f'{direction}_Stop'])
+                          for cycle_id, row in df_VQ_offsets.iterrows() for direction in VQ_DIRECTIONS}
+
+    # Wide column names, in the order of the wide df_VQ_grouped
+    @property
+    def columns(self):
+        return [f'Cycle_{cycle_id}_{prefix}{direction}'
+                for cycle_id in self.offsets.index
+                for direction in VQ_DIRECTIONS
+                for prefix in VQ_QUANTITIES]
+
+    def parse(self, column):
+        match = re.fullmatch(r'Cycle_(\d+)_(V|Cap|dQdV)(Chg|DChg)', column)
+        if match is None or (int(match.group(1)), match.group(3)) not in self.positions:
+            return None
+        return int(match.group(1)), VQ_QUANTITIES[match.group(2)], match.group(3)
+
+    def __contains__(self, column):
+        return self.parse(column) is not None
+
+    def __getitem__(self, column):
+        parsed = self.parse(column)
+        if parsed is None:
+            raise KeyError(column)
+        cycle_id, quantity, direction = parsed
+        start, stop = self.positions[(cycle_id, direction)]
+        # Series on a view of the column, no data is copied
+        return pd.Series(self.arrays[quantity][start:stop], name=column, copy=False)
+
+    def cycle(self, cycle_id, direction):
+        # All samples of one cycle and direction as a dataframe slice
+        start, stop = self.positions[(cycle_id, direction)]
+        return self.data.iloc[start:stop]
+
+    def head(self, n=5):
+        return self.data.head(n)
+
+    def to_wide(self):
+        # NaN padded wide dataframe, six columns per cycle
+        return pd.concat([self[column] for column in self.columns], axis=1)
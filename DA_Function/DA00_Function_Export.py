@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for exporting the result tables of DA00-DA06 (df_VQ,
+  df_CE, df_SOH, df_dQdV, df_peaks, df_fitting). 'parquet' writes every
+  table of a cell as a compressed Parquet file into one dataset folder
+  DA_Results_{file_name}, 'csv' writes the {table}_{file_name}.csv files.
+  The writes run on a background thread, stored tables are read back from
+  whichever format exists
+
+
+Authors: Hans and Matthias
+
+"""
+
+import os
+import queue
+import threading
+import pandas as pd
+from DA_Function.DA00_Function_Profile import DA00_Function_Profile_Step
+
+# pyarrow is optional, without it only 'csv' is available
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_FORMATS = ['parquet', 'csv']
+
+# Export state shared by all DA functions, synchronous CSV until set up
+export_state = {'formats': ['csv'], 'compression': 'zstd', 'queue': None, 'thread': None, 'errors': []}
+
+#---------------------------------Export Setup---------------------------------
+def DA00_Function_Export_Setup(formats=('parquet',), compression='zstd', background=True, max_pending=8):
+    # formats: 'parquet' and/or 'csv', every table is written in each of them
+    # compression: Parquet codec ('zstd', 'snappy', 'gzip' or None)
+    # background: writes run on an export thread, at most max_pending tables
+    # wait for it
+    DA00_Function_Export_Wait()
+    formats = list(formats)
+    for export_format in formats:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{export_format}', use {EXPORT_FORMATS}.")
+    if 'parquet' in formats and pa is None:
+        print("pyarrow is not installed, the results are exported as 'csv'.")
+        formats = [export_format for export_format in formats if export_format != 'parquet'] or ['csv']
+    export_state['formats'] = formats
+    export_state['compression'] = compression
+
+    if background and export_state['thread'] is None:
+        export_state['queue'] = queue.Queue(maxsize=max_pending)
+        export_state['thread'] = threading.Thread(target=export_worker, daemon=True)
+        export_state['thread'].start()
+    elif not background and export_state['thread'] is not None:
+        export_state['queue'].put(None)
+        export_state['thread'].join()
+        export_state['queue'] = None
+        export_state['thread'] = None
+
+def DA00_Function_Export_Active(export_format):
+    return export_format in export_state['formats']
+
+def export_worker():
+    while True:
+        job = export_state['queue'].get()
+        if job is None:
+            export_state['queue'].task_done()
+            break
+        try:
+            export_write(*job)
+        except Exception as exc:
+            export_state['errors'].append(exc)
+        finally:
+            export_state['queue'].task_done()
+
+#---------------------------------Table Export---------------------------------
+def DA00_Function_Export_Path(result_folder,file_name,table,export_format):
+    if export_format == 'parquet':
+        return f'{result_folder}/{file_name}/DA_Results_{file_name}/{table}.parquet'
+    return f'{result_folder}/{file_name}/{table}_{file_name}.csv'
+
+def export_write(df, file_path, export_format, compression):
+    # Write to a temporary file first, so a cut off write is never read back
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with DA00_Function_Profile_Step(f'{export_format} export', rows=len(df)):
+        if export_format == 'parquet':
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), f'{file_path}.tmp',
+                           compression=compression)
+        else:
+            df.to_csv(f'{file_path}.tmp', index=False)
+    os.replace(f'{file_path}.tmp', file_path)
+
+def DA00_Function_Export_Table(df,result_folder,file_name,table,formats=None):
+    # Write the table in every active format (only those of formats, if
+    # given). df is written on the export thread, it must not be changed
+    # after it is passed here
+    for export_format in export_state['formats']:
+        if formats is not None and export_format not in formats:
+            continue
+        job = (df, DA00_Function_Export_Path(result_folder,file_name,table,export_format),
+               export_format, export_state['compression'])
+        if export_state['queue'] is not None:
+            export_state['queue'].put(job)
+        else:
+            export_write(*job)
+        print(f"{table} of {file_name} saved to", job[1])
+
+#---------------------------------Table Import---------------------------------
+def DA00_Function_Export_Read(result_folder,file_name,table):
+    # Stored table from the first format it exists in (active formats first),
+    # None when it was never exported
+    DA00_Function_Export_Wait()
+    formats = export_state['formats'] + [f for f in EXPORT_FORMATS if f not in export_state['formats']]
+    for export_format in formats:
+        file_path = DA00_Function_Export_Path(result_folder,file_name,table,export_format)
+        if not os.path.exists(file_path):
+            continue
+        if export_format == 'parquet':
+            if pa is None:
+                continue
+            return pq.read_table(file_path).to_pandas()
+        return pd.read_csv(file_path)
+    return None
+
+#---------------------------------Export Flush---------------------------------
+def DA00_Function_Export_Wait():
+    # Block until every queued table is written, errors of the export thread
+    # are raised here
+    if export_state['queue'] is not None:
+        export_state['queue'].join()
+    if export_state['errors']:
+        error = export_state['errors'][0]
+        export_state['errors'] = []
+        raise error
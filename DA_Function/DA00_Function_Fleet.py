@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for the fleet store: the per-cycle CE, SOH and capacities
+  of every processed cell in one cell x cycle index.
+- Every cell writes its own partition (cells/{cell}) when it finishes, so
+  cells processed in parallel never write the same files. Opening the store
+  merges the new or changed partitions into one dense matrix per metric
+  (row: cell, column: Cycle ID, NaN where a cell has no such cycle). The
+  matrices are memory-mapped and queries run on them as array reductions.
+
+Usage (from the repository root):
+    python -m DA_Function.DA00_Function_Fleet DA_Fleet --add-results DA_Result
+    python -m DA_Function.DA00_Function_Fleet DA_Fleet --below SOH 80 --before 500
+    python -m DA_Function.DA00_Function_Fleet DA_Fleet --statistic Coulombic_Efficiency median
+
+
+Authors: Hans and Matthias
+
+"""
+
+import argparse
+import json
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from DA_Function.DA00_Function_Cache import (DA00_Function_Cache_Signature,
+                                             DA00_Function_Cache_Save,
+                                             DA00_Function_Cache_Load)
+from DA_Function.DA00_Function_Export import DA00_Function_Export_Read
+
+# Per-cycle metrics of DA03 (df_CE) and DA04 (df_SOH) kept in the store
+FLEET_METRICS = ['Charge_Capacity', 'Discharge_Capacity', 'Coulombic_Efficiency',
+                 'Maximum_Capacity', 'SOH']
+
+#------------------------------Cell Partitions---------------------------------
+def DA00_Function_Fleet_Update(fleet_folder,file_name,df_ce=None,df_SOH=None):
+    # Store the per-cycle metrics of one cell, replacing its previous results
+    tables = [df for df in [df_ce, df_SOH] if df is not None and not df.empty]
+    if not tables:
+        return
+    df_cell = tables[0]
+    for df in tables[1:]:
+        df_cell = df_cell.merge(df, on='Cycle_ID', how='outer')
+    df_cell = df_cell.reindex(columns=['Cycle_ID'] + FLEET_METRICS).sort_values(by='Cycle_ID')
+    df_cell['Cycle_ID'] = df_cell['Cycle_ID'].astype(np.int64)
+    DA00_Function_Cache_Save(df_cell.astype({metric: np.float64 for metric in FLEET_METRICS}),
+                             f'{fleet_folder}/cells/{file_name}', [])
+    print(f"Fleet store '{fleet_folder}' updated with {len(df_cell)} cycles of {file_name}.")
+
+def DA00_Function_Fleet_Add_Results(fleet_folder,result_folder,cells=None):
+    # Add cells processed before, from their exported df_CE and df_SOH
+    cells = cells or sorted(name for name in os.listdir(result_folder)
+                            if os.path.isdir(f'{result_folder}/{name}'))
+    for file_name in cells:
+        DA00_Function_Fleet_Update(fleet_folder,file_name,
+                                   DA00_Function_Export_Read(result_folder,file_name,'df_CE'),
+                                   DA00_Function_Export_Read(result_folder,file_name,'df_SOH'))
+
+#--------------------------------Consolidation---------------------------------
+def DA00_Function_Fleet_Consolidate(fleet_folder):
+    # Merge new and changed partitions into the metric matrices, rows of
+    # unchanged cells are copied over, removed cells are dropped
+    partition_folder = f'{fleet_folder}/cells'
+    store_folder = f'{fleet_folder}/fleet'
+    signatures = {}
+    if os.path.isdir(partition_folder):
+        for cell in sorted(os.listdir(partition_folder)):
+            manifest_path = f'{partition_folder}/{cell}/manifest.json'
+            if os.path.exists(manifest_path):
+                signatures[cell] = DA00_Function_Cache_Signature(manifest_path)
+
+    manifest = {'cells': [], 'cycles': 0, 'source': {}}
+    if os.path.exists(f'{store_folder}/manifest.json'):
+        with open(f'{store_folder}/manifest.json') as f:
+            manifest = json.load(f)
+    if manifest['source'] == signatures:
+        return manifest
+
+    # Unchanged cells keep their rows and order, new cells are appended
+    kept = [cell for cell in manifest['cells'] if manifest['source'].get(cell) == signatures.get(cell)]
+    changed = [cell for cell in signatures if cell not in kept]
+    partitions = {cell: DA00_Function_Cache_Load(f'{partition_folder}/{cell}', None, mmap=False)
+                  for cell in changed}
+    cycles = max([manifest['cycles']] + [int(df['Cycle_ID'].max()) + 1 for df in partitions.values() if len(df)])
+    cells = kept + changed
+    rows_kept = np.array([manifest['cells'].index(cell) for cell in kept], dtype=np.int64)
+
+    os.makedirs(store_folder, exist_ok=True)
+    for metric in FLEET_METRICS:
+        matrix = np.full((len(cells), cycles), np.nan)
+        if len(kept):
+            old = np.load(f'{store_folder}/{metric}.npy', mmap_mode='r')
+            matrix[:len(kept), :old.shape[1]] = old[rows_kept]
+        for row, cell in enumerate(changed, start=len(kept)):
+            df_cell = partitions[cell]
+            matrix[row, df_cell['Cycle_ID'].to_numpy()] = df_cell[metric].to_numpy()
+        # Write to a temporary file first, readers keep the mapped old file
+        with open(f'{store_folder}/{metric}.npy.tmp', 'wb') as f:
+            np.save(f, matrix, allow_pickle=False)
+        os.replace(f'{store_folder}/{metric}.npy.tmp', f'{store_folder}/{metric}.npy')
+
+    manifest = {'cells': cells, 'cycles': cycles, 'source': signatures}
+    with open(f'{store_folder}/manifest.json.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(f'{store_folder}/manifest.json.tmp', f'{store_folder}/manifest.json')
+    print(f"Fleet store '{fleet_folder}': {len(changed)} cells merged, {len(cells)} cells, {cycles - 1} cycles.")
+    return manifest
+
+#------------------------------------Fleet-------------------------------------
+class DA00_Fleet:
+    # Metric matrices of all cells: fleet.metric('SOH')[row, cycle_id], the
+    # row of a cell is its position in fleet.cells
+    def __init__(self, fleet_folder, manifest):
+        self.folder = f'{fleet_folder}/fleet'
+        self.cells = np.array(manifest['cells'], dtype=object)
+        self.cycles = manifest['cycles']
+        self.matrices = {}
+
+    def metric(self, metric):
+        if metric not in FLEET_METRICS:
+            raise ValueError(f"Unknown fleet metric '{metric}', use {FLEET_METRICS}.")
+        if metric not in self.matrices:
+            self.matrices[metric] = (np.load(f'{self.folder}/{metric}.npy', mmap_mode='r')
+                                     if len(self.cells) else np.full((0, 0), np.nan))
+        return self.matrices[metric]
+
+    def rows(self, cells=None):
+        if cells is None:
+            return slice(None)
+        positions = {cell: row for row, cell in enumerate(self.cells)}
+        return np.array([positions[cell] for cell in cells], dtype=np.int64)
+
+    def cells_below(self, metric, threshold, before_cycle=None, cells=None):
+        # Cells with the metric below threshold in any cycle before before_cycle,
+        # e.g. cells_below('SOH', 80, 500)
+        matrix = self.metric(metric)[self.rows(cells), :before_cycle]
+        with np.errstate(invalid='ignore'):
+            hit = (matrix < threshold).any(axis=1)
+        return list((self.cells if cells is None else np.array(cells, dtype=object))[hit])
+
+    def first_cycle_below(self, metric, threshold, cells=None):
+        # First Cycle ID with the metric below threshold per cell (NaN: never)
+        with np.errstate(invalid='ignore'):
+            below = self.metric(metric)[self.rows(cells)] < threshold
+        first = np.where(below.any(axis=1), below.argmax(axis=1), np.nan)
+        return pd.Series(first, index=self.cells if cells is None else cells, name=f'First_Cycle_{metric}_Below_{threshold}')
+
+    def cycle_statistic(self, metric, statistic='median', cells=None):
+        # Statistic of the metric over the cells per Cycle ID: 'median',
+        # 'mean', 'min', 'max', 'std' or 'count'
+        matrix = self.metric(metric)[self.rows(cells)]
+        counts = np.sum(~np.isnan(matrix), axis=0)
+        if statistic == 'count':
+            values = counts
+        elif statistic == 'median' and len(matrix):
+            # NaNs are sorted to the end of every column, the median is read
+            # at the middle of the valid values (2x faster than np.nanmedian)
+            ordered = np.sort(matrix, axis=0)
+            columns = np.arange(matrix.shape[1])
+            values = (ordered[(counts - 1) // 2, columns] + ordered[counts // 2, columns]) / 2
+        else:
+            reduce = {'median': np.nanmedian, 'mean': np.nanmean, 'min': np.nanmin,
+                      'max': np.nanmax, 'std': np.nanstd}[statistic]
+            # Cycles without any cell give NaN and are dropped below
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                values = reduce(matrix, axis=0)
+        series = pd.Series(values, name=f'{metric}_{statistic}')
+        series.index.name = 'Cycle_ID'
+        return series[counts > 0]
+
+    def cell_frame(self, cell):
+        # Per-cycle metrics of one cell, as in its df_CE / df_SOH
+        row = self.rows([cell])[0]
+        df_cell = pd.DataFrame({metric: self.metric(metric)[row] for metric in FLEET_METRICS})
+        df_cell.insert(0, 'Cycle_ID', np.arange(self.cycles))
+        return df_cell[df_cell[FLEET_METRICS].notna().any(axis=1)].reset_index(drop=True)
+
+def DA00_Function_Fleet_Open(fleet_folder):
+    # Merge the partitions written since the last opening and map the store
+    return DA00_Fleet(fleet_folder, DA00_Function_Fleet_Consolidate(fleet_folder))
+
+#-------------------------------------Main-------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query the per-cycle CE and SOH of all processed cells.')
+    parser.add_argument('fleet_folder', help='fleet folder of DA_Main.py (fleet_folder)')
+    parser.add_argument('--add-results', default=None, metavar='RESULT_FOLDER',
+                        help='add the df_CE / df_SOH results of every cell in the result folder')
+    parser.add_argument('--below', nargs=2, default=None, metavar=('METRIC', 'THRESHOLD'),
+                        help='cells with the metric below the threshold')
+    parser.add_argument('--before', type=int, default=None, help='only cycles before this Cycle ID (with --below)')
+    parser.add_argument('--statistic', nargs=2, default=None, metavar=('METRIC', 'STATISTIC'),
+                        help='statistic of the metric over all cells per cycle (median, mean, min, max, std, count)')
+    parser.add_argument('--output', default=None, help='CSV file for the --statistic result')
+    args = parser.parse_args()
+
+    if args.add_results:
+        DA00_Function_Fleet_Add_Results(args.fleet_folder, args.add_results)
+    fleet = DA00_Function_Fleet_Open(args.fleet_folder)
+    print(f"{len(fleet.cells)} cells, up to cycle {max(fleet.cycles - 1, 0)}")
+    if args.below:
+        metric, threshold = args.below[0], float(args.below[1])
+        cells = fleet.cells_below(metric, threshold, args.before)
+        print(f"{len(cells)} cells with {metric} below {threshold}"
+              f"{'' if args.before is None else f' before cycle {args.before}'}: {cells}")
+    if args.statistic:
+        series = fleet.cycle_statistic(*args.statistic)
+        print(series.to_string())
+        if args.output:
+            series.to_csv(args.output)
+            print(f"Statistic saved to {args.output}")
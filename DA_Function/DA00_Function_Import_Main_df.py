@@ -11,6 +11,7 @@ Code Structure:
 6. DA04: Plot & analysis SOH over cycles
 7. DA05: Analysis of Statistical Summary
 8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
 
 == Part of DA ==
 - Function code for Data Import, Dataframe creation, grouping
@@ -21,13 +22,141 @@ Authors: Hans and Matthias
 """
 
 import pandas as pd
+import numpy as np
+import io
+import json
 import os
+from DA_Function.DA00_Function_Cache import (DA00_Function_Cache_Signature,
+                                             DA00_Function_Cache_Save,
+                                             DA00_Function_Cache_Load)
+from DA_Function.DA00_Function_Profile import (DA00_Function_Profile_Step,
+                                               DA00_Function_Profiled)
+from DA_Function.DA00_Function_Neware_Parser import (DA00_Function_Parse_Neware,
+                                                     DA00_Function_Read_Blocks,
+                                                     DA00_Function_Duration_Chars)
+from DA_Function.DA00_Function_Cycle_Store import (DA00_Cycle_Store,
+                                                   VQ_DIRECTIONS)
+from DA_Function.DA00_Function_Export import (DA00_Function_Export_Table,
+                                              DA00_Function_Export_Active)
+from DA_Function.DA07_Function_Energy_Metrics import (DA07_Function_Step_Table)
 
-#---------------------------------Data Import----------------------------------
-def DA00_Function_Import(data_folder,file_name,rated_capacity):
-    # Import multiple Neware txt files, loop until all files found, remove 
-    # tab and header using skiprows, remove index and "." as decimal
-    df_main = []
+# Column types of the Neware txt files, given explicitly so pandas does not
+# have to infer them for every file or chunk
+NEWARE_DTYPES = {'Cycle ID': np.int64, 'Step ID': np.int64, 'Step Name': object,
+                 'Record ID': np.int64, 'Time(h:min:s.ms)': object,
+                 'Voltage(V)': np.float64, 'Current(mA)': np.float64,
+                 'Capacity(mAh)': np.float64, 'Energy(mWh)': np.float64,
+                 'Realtime': object, 'dQ/dV(mAh/V)': np.float64}
+
+# Declared types of df_main after preparation: 'int' is the smallest signed
+# integer width holding all values, 'category' stores each name once, any
+# numpy dtype name is used as is and None keeps the column as read
+NEWARE_SCHEMA = {'Cycle ID': 'int', 'Step ID': 'int', 'Step Name': 'category',
+                 'Record ID': 'int', 'Voltage': 'float64', 'Current': 'float64',
+                 'Capacity': 'float64', 'Power': 'float64', 'Energy': 'float64',
+                 'dQdV': 'float64'}
+NEWARE_MEASUREMENTS = ['Voltage', 'Current', 'Capacity', 'Power', 'Energy', 'dQdV']
+
+#---------------------------------Column Schema--------------------------------
+def DA00_Function_Schema(float32=False,overrides=None):
+    # NEWARE_SCHEMA with the measurements as float32 (half the memory, about 
+    # 7 significant digits) if float32, and per-column overrides on top
+    schema = dict(NEWARE_SCHEMA)
+    if float32:
+        schema.update({column: 'float32' for column in NEWARE_MEASUREMENTS})
+    schema.update(overrides or {})
+    return schema
+
+def DA00_Function_Apply_Schema(df_main,schema=None,report=True):
+    # Convert the columns of df_main to the schema, with a memory report
+    schema = NEWARE_SCHEMA if schema is None else schema
+    memory_before = df_main.memory_usage(deep=True).sum() if report else 0
+    for column, dtype in schema.items():
+        if column not in df_main.columns or dtype is None:
+            continue
+        if dtype == 'int':
+            values = df_main[column].to_numpy()
+            low, high = (values.min(), values.max()) if len(values) else (0, 0)
+            dtype = next(int_type for int_type in [np.int8, np.int16, np.int32, np.int64]
+                         if np.iinfo(int_type).min <= low and high <= np.iinfo(int_type).max)
+        df_main[column] = df_main[column].astype(dtype)
+    if not report:
+        return df_main
+    memory_after = df_main.memory_usage(deep=True).sum()
+    print(f"Memory of df_main: {memory_before / 1e6:.1f} MB -> {memory_after / 1e6:.1f} MB "
+          f"({', '.join(f'{column}: {df_main[column].dtype}' for column in schema if column in df_main.columns)})")
+    return df_main
+
+#--------------------------------Duration Parsing------------------------------
+def DA00_Function_Duration_Milliseconds(time_text):
+    # Parse Neware 'h:min:s.ms' durations straight to integer milliseconds.
+    # The text is right aligned so 'min:s.ms' always sits in the last 9 
+    # characters and only the hour digits vary in width
+    text = np.asarray(time_text, dtype='S')
+    width = max(text.dtype.itemsize, 10)
+    text = np.char.rjust(text, width)
+    chars = np.ascontiguousarray(text.view(np.uint8).reshape(len(text), width).T)
+    milliseconds = DA00_Function_Duration_Chars(chars)
+
+    # Fall back to pandas for anything not in the expected layout
+    if milliseconds is None:
+        time_delta = pd.to_timedelta(pd.Series(time_text).astype(str))
+        return (time_delta // pd.Timedelta(milliseconds=1)).to_numpy(dtype=np.int64)
+    return milliseconds
+
+#------------------------------Single File Import------------------------------
+def DA00_Function_Read_Chunk(file_path,parser='pandas'):
+    # Read one Neware txt file. parser 'numpy' or 'pyarrow' uses the fixed-
+    # format Neware parser, which falls back to pandas for other layouts
+    if parser != 'pandas':
+        dataraw = DA00_Function_Parse_Neware(file_path,parser)
+        if dataraw is not None:
+            return DA00_Function_Convert_Chunk(dataraw)
+
+    # Remove tab and header using skiprows, remove index and "." as decimal
+    with DA00_Function_Profile_Step('DA00 CSV parse') as step:
+        dataraw = pd.read_csv(file_path, sep='\t', skiprows=0, index_col=False, decimal='.',
+                              dtype=NEWARE_DTYPES)
+        step.rows = len(dataraw)
+    return DA00_Function_Convert_Chunk(dataraw)
+
+def DA00_Function_Read_Chunks(file_path,chunk_rows,parser='pandas'):
+    # Read one Neware txt file in pieces of chunk_rows records. The fixed-
+    # format Neware parser reads blocks of about chunk_rows whole lines, a
+    # block which does not follow its layout is read with pandas
+    if parser != 'pandas':
+        for block in DA00_Function_Read_Blocks(file_path,chunk_rows):
+            dataraw = DA00_Function_Parse_Neware(file_path,parser,data=block)
+            if dataraw is None:
+                dataraw = pd.read_csv(io.BytesIO(block), sep='\t', skiprows=0, index_col=False,
+                                      decimal='.', dtype=NEWARE_DTYPES)
+            yield DA00_Function_Convert_Chunk(dataraw)
+        return
+    with pd.read_csv(file_path, sep='\t', skiprows=0, index_col=False, decimal='.',
+                     dtype=NEWARE_DTYPES, chunksize=chunk_rows) as reader:
+        for dataraw in reader:
+            yield DA00_Function_Convert_Chunk(dataraw)
+
+def DA00_Function_Convert_Chunk(dataraw):
+    # change column names
+    name_conversion_dict = {'Time(h:min:s.ms)': 'Time', 'Voltage(V)':'Voltage', 'Current(mA)': 'Current', 'Energy(mWh)': 'Energy', 'Capacity(mAh)': 'Capacity', 'dQ/dV(mAh/V)':'dQdV'}
+    dataraw = dataraw.rename(columns=name_conversion_dict)
+
+    # The Neware parser already decoded both columns
+    if dataraw['Realtime'].dtype == object:
+        with DA00_Function_Profile_Step('DA00 datetime conversion', rows=len(dataraw)):
+            # Convert the 'Realtime' column to pandas datetime format
+            dataraw['Realtime'] = pd.to_datetime(dataraw['Realtime'], format='%m/%d/%Y %H:%M:%S')
+
+            # Convert 'Time' to timedelta (duration) for cumulative addition
+            dataraw['Time'] = pd.to_timedelta(DA00_Function_Duration_Milliseconds(dataraw['Time']), unit='ms')
+
+    return dataraw
+
+#-------------------------------Data File Search-------------------------------
+def DA00_Function_Find_Files(data_folder,file_name):
+    # Find multiple Neware txt files, loop until all files found
+    file_paths = []
     i = 0  # Start counter
 
     while True:
@@ -36,58 +165,377 @@ def DA00_Function_Import(data_folder,file_name,rated_capacity):
         
         # Check if the file exists
         if os.path.exists(file_path):
-            # Read the file
-            dataraw = pd.read_csv(file_path, sep='\t', skiprows=0, index_col=False, decimal='.')
-            df_main.append(dataraw)  # Append dataframe to the list
+            file_paths.append(file_path)  # Append file path to the list
             i += 1  # Increment counter for the next file
         else:
             print(f"File {file_path} not found. Stopping.")
             break  # Exit loop when the file is not found
 
-    # Create one main dataframe by combining the loop import files
-    df_main = pd.concat(df_main, ignore_index=True)
+    return file_paths
 
-    # change column names
-    name_conversion_dict = {'Time(h:min:s.ms)': 'Time', 'Voltage(V)':'Voltage', 'Current(mA)': 'Current', 'Energy(mWh)': 'Energy', 'Capacity(mAh)': 'Capacity', 'dQ/dV(mAh/V)':'dQdV'}
-    df_main = df_main.rename(columns=name_conversion_dict)
+def DA00_Function_Import_Signatures(data_folder,file_name):
+    # Path, size and modification time of every data file of the cell
+    return [DA00_Function_Cache_Signature(file_path) 
+            for file_path in DA00_Function_Find_Files(data_folder,file_name)]
 
-    # Convert the 'Realtime' column to pandas datetime format
-    df_main['Realtime'] = pd.to_datetime(df_main['Realtime'], format='%m/%d/%Y %H:%M:%S')
+#-----------------------------Main df Preparation------------------------------
+@DA00_Function_Profiled
+def DA00_Function_Prepare_Main(df_main):
+    # Sort data properly: First by 'Cycle ID', then 'Record ID', then 'Time'.
+    # Neware records are usually in this order already (Record ID increasing
+    # with the cycles), then the sort is skipped
+    in_order = (df_main['Cycle ID'].is_monotonic_increasing and 
+                np.all(np.diff(df_main['Record ID'].to_numpy()) > 0))
+    if not in_order:
+        df_main = df_main.sort_values(by=['Cycle ID', 'Record ID', 'Time'])
+    df_main = df_main.reset_index(drop=True)
 
-    # Convert 'Time' to timedelta (duration) for cumulative addition
-    df_main['Time'] = pd.to_timedelta(df_main['Time'].astype(str))
-    
-    # Sort data properly: First by 'Cycle ID', then 'Record ID', then 'Time'
-    df_main = df_main.sort_values(by=['Cycle ID', 'Record ID', 'Time']).reset_index(drop=True)
-
-    # Compute Time difference within each cycle
-    df_main['Time_Diff'] = df_main.groupby('Cycle ID')['Time'].diff().fillna(pd.Timedelta(seconds=0))
+    # Compute Time difference within each cycle in integer milliseconds, the
+    # first record of every cycle starts at 0 (rows are sorted by 'Cycle ID')
+    cycle_id = df_main['Cycle ID'].to_numpy()
+    time_ms = df_main['Time'].to_numpy().astype('timedelta64[ms]').astype(np.int64)
+    cycle_start = np.ones(len(df_main), dtype=bool)
+    cycle_start[1:] = cycle_id[1:] != cycle_id[:-1]
+    time_diff = np.diff(time_ms, prepend=time_ms[:1])
+    time_diff[cycle_start] = 0
 
     # Ensure no negative values (set negatives to 0)
-    df_main['Time_Diff'] = df_main['Time_Diff'].apply(lambda x: max(x.total_seconds(), 0))  # Convert to milliseconds
+    np.clip(time_diff, 0, None, out=time_diff)
 
-    # Compute Cycle_Time as the cumulative sum of Time_Diff within each cycle
-    df_main['Cycle_Time'] = df_main.groupby('Cycle ID')['Time_Diff'].cumsum() 
+    # Compute Cycle_Time as the cumulative sum of Time_Diff within each cycle,
+    # subtracting the running sum at the start of the cycle
+    cycle_time = np.cumsum(time_diff)
+    cycle_time -= cycle_time[np.maximum.accumulate(np.where(cycle_start, np.arange(len(df_main)), 0))]
+    
+    # Convert to seconds, Time_Diff is a step of a few seconds so float32 is 
+    # sufficient, Cycle_Time keeps float64 for long cycles
+    df_main['Time_Diff'] = (time_diff / 1000).astype(np.float32)
+    df_main['Cycle_Time'] = cycle_time / 1000
     
     df_main.insert(df_main.columns.get_loc("Capacity") + 1, "Power", df_main["Voltage"] * df_main["Current"])
     
     # pd.set_option('display.max_columns', None)  # Show all columns   
     # print('DataFrame df_main preview: ',df_main.head(5))
+
+    return df_main
+
+#---------------------------------Data Import----------------------------------
+@DA00_Function_Profiled
+def DA00_Function_Import(data_folder,file_name,rated_capacity,cache_folder=None,
+                         schema=None,parser='pandas'):
+    file_paths = DA00_Function_Find_Files(data_folder,file_name)
+    schema = NEWARE_SCHEMA if schema is None else schema
+
+    # Load the complete df_main from cache when none of the files changed and
+    # it was stored with the same schema
+    if cache_folder is not None:
+        signatures = [DA00_Function_Cache_Signature(file_path) for file_path in file_paths]
+        df_main = DA00_Function_Cache_Load(f"{cache_folder}/{file_name}/df_main", 
+                                           signatures + [{'schema': schema}])
+        if df_main is not None:
+            print(f"DataFrame df_main of {file_name} loaded from cache '{cache_folder}/{file_name}'.")
+            return df_main
+
+    # Read every file, only files changed since the last run are parsed again
+    df_main = []
+    for i, file_path in enumerate(file_paths):
+        if cache_folder is None:
+            dataraw = DA00_Function_Read_Chunk(file_path,parser)
+        else:
+            chunk_cache = f"{cache_folder}/{file_name}/{file_name}__{i}"
+            dataraw = DA00_Function_Cache_Load(chunk_cache, [signatures[i]])
+            if dataraw is None:
+                dataraw = DA00_Function_Read_Chunk(file_path,parser)
+                DA00_Function_Cache_Save(dataraw, chunk_cache, [signatures[i]])
+        df_main.append(dataraw)  # Append dataframe to the list
+
+    # Create one main dataframe by combining the loop import files
+    df_main = pd.concat(df_main, ignore_index=True)
+    df_main = DA00_Function_Prepare_Main(df_main)
+    df_main = DA00_Function_Apply_Schema(df_main,schema)
+
+    # Store the fully typed df_main for the next run
+    if cache_folder is not None:
+        DA00_Function_Cache_Save(df_main, f"{cache_folder}/{file_name}/df_main", 
+                                 signatures + [{'schema': schema}])
    
     return df_main
+
+#----------------------------Streaming Data Import-----------------------------
+def DA00_Function_Import_Stream(data_folder,file_name,rated_capacity,chunk_rows=50000,
+                                online=None,schema=None,parser='pandas',reorder_cycles=1):
+    # Generator of (cycle_id, df_cycle) in cycle order, df_cycle prepared and
+    # typed (schema) as in df_main. The files are read in chunks, a cycle is
+    # complete once a record of a later cycle is read. The last reorder_cycles
+    # completed cycles are held back with the unfinished cycle, so records
+    # arriving late for them are merged in Record ID order. Only a record of
+    # a cycle which was already yielded raises an error.
+    # online: DA00_Online_Metrics fed with every chunk as it is read
+    file_paths = DA00_Function_Find_Files(data_folder,file_name)
+    schema = NEWARE_SCHEMA if schema is None else schema
+    pending = []                                                               # rows of cycles not yielded yet
+    last_yielded = None
+    
+    for file_path in file_paths:
+        for dataraw in DA00_Function_Read_Chunks(file_path,chunk_rows,parser):
+            cycle_ids = dataraw['Cycle ID'].to_numpy()
+            if last_yielded is not None and cycle_ids.min() <= last_yielded:
+                raise ValueError(f"Records of cycle {cycle_ids.min()} in {file_path} follow the "
+                                 f"yielded cycle {last_yielded}, increase reorder_cycles or use "
+                                 f"DA00_Function_Import instead.")
+            if online is not None:
+                online.update(dataraw)
+            pending.append(dataraw)
+            
+            # Every cycle before the latest cycle read is complete, all but 
+            # the last reorder_cycles of them are yielded
+            pending_ids = np.unique(np.concatenate([frame['Cycle ID'].to_numpy() for frame in pending]))
+            if len(pending_ids) <= reorder_cycles + 1:
+                continue
+            limit = pending_ids[-reorder_cycles - 1]                           # first cycle held back
+            completed, remaining = [], []
+            for frame in pending:
+                frame_ids = frame['Cycle ID'].to_numpy()
+                if frame_ids.max() < limit:
+                    completed.append(frame)
+                elif frame_ids.min() >= limit:
+                    remaining.append(frame)
+                else:
+                    completed.append(frame[frame_ids < limit])
+                    remaining.append(frame[frame_ids >= limit])
+            pending = remaining
+            
+            for cycle_id, df_cycle in DA00_Function_Split_Cycles(pd.concat(completed, ignore_index=True),schema):
+                last_yielded = cycle_id
+                yield cycle_id, df_cycle
+    
+    # The held back cycles and the last cycle are complete at the end of the
+    # last file
+    if online is not None:
+        online.finish()
+    if pending:
+        yield from DA00_Function_Split_Cycles(pd.concat(pending, ignore_index=True),schema)
+
+def DA00_Function_Split_Cycles(df_part,schema=None):
+    # Prepare complete cycles (sort, Time_Diff, Cycle_Time, Power), split
+    # them at the cycle boundaries and convert every cycle to the schema
+    df_part = DA00_Function_Prepare_Main(df_part)
+    cycle_ids = df_part['Cycle ID'].to_numpy()
+    bounds = np.flatnonzero(np.diff(cycle_ids)) + 1
+    for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(df_part)]):
+        df_cycle = df_part.iloc[start:stop].reset_index(drop=True)
+        yield int(cycle_ids[start]), DA00_Function_Apply_Schema(df_cycle,schema,report=False)
+
+#---------------------------Incremental Data Import----------------------------
+@DA00_Function_Profiled
+def DA00_Function_Import_Incremental(data_folder,file_name,rated_capacity,cache_folder,
+                                     schema=None,parser='pandas',online=None):
+    # Append-only import for tests which are still running: files before the 
+    # last ingested file are never read again, the last ingested file and 
+    # newer files are read and only records after the last Record ID are kept.
+    # online: DA00_Online_Metrics fed with the new records, its state is kept
+    # with the ingest state so the next run continues it.
+    # The new ingest state is only pending until DA00_Function_Import_Commit
+    # is called after all results are saved: a run which fails before that
+    # reads the same records again next time
+    file_paths = DA00_Function_Find_Files(data_folder,file_name)
+    signatures = [DA00_Function_Cache_Signature(file_path) for file_path in file_paths]
+    schema = NEWARE_SCHEMA if schema is None else schema
+    state_path = f"{cache_folder}/{file_name}/ingest_state.json"
+    pending_path = f"{cache_folder}/{file_name}/ingest_state_pending.json"
+    
+    # Without a previous state, import everything and update every cycle
+    df_prev = DA00_Function_Cache_Load(f"{cache_folder}/{file_name}/df_main", None)
+    if not os.path.exists(state_path) or df_prev is None:
+        df_main = DA00_Function_Import(data_folder,file_name,rated_capacity,cache_folder,schema,parser)
+        cycles_to_update = sorted(int(cycle_id) for cycle_id in df_main['Cycle ID'].unique())
+        if online is not None:
+            online.update(df_main)
+    
+    else:
+        with open(state_path) as f:
+            state = json.load(f)
+        
+        # Read only the new records
+        df_new = []
+        for file_path in file_paths[state['last_file']:]:
+            dataraw = DA00_Function_Read_Chunk(file_path,parser)
+            df_new.append(dataraw[dataraw['Record ID'] > state['last_record_id']])
+        df_new = pd.concat(df_new, ignore_index=True)
+        
+        # Records of a run which was not committed are in the stored df_main
+        # already, they are replaced by the ones read again
+        df_prev = df_prev[df_prev['Record ID'] <= state['last_record_id']].reset_index(drop=True)
+        
+        # Continue the online metrics, or start them on the stored records
+        if online is not None:
+            if 'online' in state:
+                online.restore(state['online'])
+            else:
+                online.update(df_prev)
+            online.update(df_new)
+        cycles_to_update = sorted(int(cycle_id) for cycle_id in df_new['Cycle ID'].unique())
+        print(f"{len(df_new)} new records of {file_name} found in cycles: {cycles_to_update}")
+
+        # Rebuild only the cycles touched by the new records
+        touched = df_prev['Cycle ID'].isin(cycles_to_update)
+        df_touched = pd.concat([df_prev[touched].drop(columns=['Power','Time_Diff','Cycle_Time']), 
+                                df_new], ignore_index=True)
+        df_touched = DA00_Function_Prepare_Main(df_touched)
+        df_main = pd.concat([df_prev[~touched], df_touched], ignore_index=True)
+        df_main = df_main.sort_values(by='Cycle ID', kind='stable').reset_index(drop=True)
+        df_main = DA00_Function_Apply_Schema(df_main,schema)
+        
+        DA00_Function_Cache_Save(df_main, f"{cache_folder}/{file_name}/df_main", 
+                                 signatures + [{'schema': schema}])
+        
+    # Remember the last file and Record ID ingested, pending until commit
+    state = {'last_file': len(file_paths) - 1,
+             'last_record_id': int(df_main['Record ID'].max())}
+    if online is not None:
+        state['online'] = online.state()
+    with open(pending_path, 'w') as f:
+        json.dump(state, f)
     
+    return df_main, cycles_to_update
+
+def DA00_Function_Import_Commit(cache_folder,file_name):
+    # Mark the records of the last DA00_Function_Import_Incremental as 
+    # ingested, to be called once every result of them is saved
+    pending_path = f"{cache_folder}/{file_name}/ingest_state_pending.json"
+    if os.path.exists(pending_path):
+        os.replace(pending_path, f"{cache_folder}/{file_name}/ingest_state.json")
+    
+#------------------------------Cycle Segmentation------------------------------
+def DA00_Function_Segment_Cycles(df_main):
+    # Find the charge (CC_Chg, then CV_Chg) and discharge (CC_DChg) rows of 
+    # every cycle with one stable sort on (cycle, step) keys. Rows are not 
+    # copied, the result is:
+    # - order: row positions of df_main, cycle by cycle, charge then discharge
+    # - direction_codes: 0 for charge and 1 for discharge rows of order
+    # - capacity: capacity of the rows of order, CV_Chg rows accumulated on top
+    #   of the last CC_Chg capacity of the cycle
+    # - df_offsets: Start/Stop positions in order per cycle and direction, 
+    #   for every cycle with a CC_DChg step
+    step_rank = pd.Categorical(df_main['Step Name'], categories=['CC_Chg', 'CV_Chg', 'CC_DChg']).codes
+    cycle_codes, cycle_ids = pd.factorize(df_main['Cycle ID'], sort=True)
+    n_cycles = len(cycle_ids)
+
+    # Sort the selected rows by (cycle, step), keeping the record order
+    selected = np.flatnonzero(step_rank >= 0)
+    key = cycle_codes[selected].astype(np.int64) * 3 + step_rank[selected]
+    sort_index = np.argsort(key, kind='stable')
+    order = selected[sort_index]
+    key = key[sort_index]
+
+    # Keep only the cycles with a discharge step
+    bounds = np.searchsorted(key, np.arange(n_cycles * 3 + 1))
+    included = bounds[3::3] > bounds[2::3]
+    keep = included[key // 3]
+    order = order[keep]
+    key = key[keep]
+    bounds = np.searchsorted(key, np.arange(n_cycles * 3 + 1))
+
+    # Add the last CC_Chg capacity of each cycle to its CV_Chg rows
+    capacity = df_main['Capacity'].to_numpy()[order].astype(np.float64)
+    cc_start, cc_stop = bounds[0:-1:3], bounds[1::3]
+    has_cc = cc_stop > cc_start
+    cc_end_capacity = np.zeros(n_cycles)
+    cc_end_capacity[has_cc] = capacity[cc_stop[has_cc] - 1]
+    is_cv = key % 3 == 1
+    capacity[is_cv] += cc_end_capacity[key[is_cv] // 3]
+
+    df_offsets = pd.DataFrame({'Chg_Start': bounds[0:-1:3], 'Chg_Stop': bounds[2::3],
+                               'DChg_Start': bounds[2::3], 'DChg_Stop': bounds[3::3]},
+                              index=pd.Index(cycle_ids.astype(np.int64), name='Cycle ID'))[included]
+
+    return order, (key % 3 == 2).astype(np.int8), capacity, df_offsets.astype(np.int64)
+
+#-----------------------------V-Q Long-Format Rows-----------------------------
+def DA00_Function_VQ_Long(df_main):
+    # Long-format V-Q rows of every cycle with a discharge step and the 
+    # Start/Stop offsets of each cycle and direction
+    order, direction_codes, capacity, df_VQ_offsets = DA00_Function_Segment_Cycles(df_main)
+    df_VQ_long = pd.DataFrame({
+        'Cycle ID': df_main['Cycle ID'].to_numpy()[order].astype(np.int32),
+        'Direction': pd.Categorical.from_codes(direction_codes, categories=VQ_DIRECTIONS),
+        'Step Name': pd.Categorical(df_main['Step Name'].to_numpy()[order]),
+        'Voltage': df_main['Voltage'].to_numpy()[order],
+        'Capacity': capacity,
+        'dQdV': df_main['dQdV'].to_numpy()[order],
+        })
+    return df_VQ_long, df_VQ_offsets
+
+#-------------------------------Per-Cycle Summary------------------------------
+# Steps of the summary (rank 0-2), all other steps have rank -1
+SUMMARY_STEPS = ['CC_Chg', 'CV_Chg', 'CC_DChg']
+SUMMARY_COLUMNS = ['Cycle_ID', 'Charge_Capacity', 'Discharge_Capacity', 'Maximum_Capacity',
+                   'Charge_Energy', 'Discharge_Energy', 'Duration', 'Voltage_Min', 'Voltage_Max',
+                   'Samples', 'Chg_Samples', 'DChg_Samples']
+
+def DA00_Function_Cycle_Summary(df_main):
+    # One row per cycle with a CC_DChg step, from one groupby on (cycle, step
+    # rank). Capacity and Energy restart with every step, the charge values
+    # are the CV_Chg value on top of the last CC_Chg value (as the V-Q rows):
+    # - Charge/Discharge_Capacity: capacity at the end of charge / discharge
+    # - Maximum_Capacity: larger of the charge and discharge maximum (DA04)
+    # - Charge/Discharge_Energy: energy at the end of charge / discharge
+    # - Duration: Cycle_Time of the last record (s)
+    # - Voltage_Min/Max, Samples: over all records of the cycle
+    # - Chg_Samples, DChg_Samples: records of the charge / discharge steps
+    step_rank = pd.Categorical(df_main['Step Name'], categories=SUMMARY_STEPS).codes
+    df_steps = df_main[['Cycle ID', 'Capacity', 'Energy', 'Voltage', 'Cycle_Time']].groupby(
+        [df_main['Cycle ID'].to_numpy(), step_rank], sort=True).agg(
+            cap_last=('Capacity', 'last'), cap_max=('Capacity', 'max'),
+            energy_last=('Energy', 'last'), voltage_min=('Voltage', 'min'),
+            voltage_max=('Voltage', 'max'), time_max=('Cycle_Time', 'max'),
+            samples=('Capacity', 'size'))
+    df_steps = df_steps.unstack().reindex(columns=pd.MultiIndex.from_product(
+        [df_steps.columns, [-1, 0, 1, 2]]))
+    step = lambda column, rank: df_steps[(column, rank)].to_numpy(dtype=np.float64)
+
+    # Charge end values: CV_Chg on top of the CC_Chg end (0 without CC_Chg)
+    cc_end = np.nan_to_num(step('cap_last', 0))
+    charge = np.where(np.isnan(step('cap_last', 1)), cc_end, step('cap_last', 1) + cc_end)
+    cc_energy_end = np.nan_to_num(step('energy_last', 0))
+    charge_energy = np.where(np.isnan(step('energy_last', 1)), cc_energy_end,
+                             step('energy_last', 1) + cc_energy_end)
+    charge_max = np.fmax(step('cap_max', 0), step('cap_max', 1) + cc_end)
+    discharge_max = step('cap_max', 2)
+    samples = df_steps['samples'].fillna(0).to_numpy(dtype=np.int64)
+
+    df_summary = pd.DataFrame({
+        'Cycle_ID': df_steps.index.to_numpy().astype(np.int64),
+        'Charge_Capacity': charge,
+        'Discharge_Capacity': step('cap_last', 2),
+        'Maximum_Capacity': np.where(charge_max > discharge_max, charge_max, discharge_max),
+        'Charge_Energy': charge_energy,
+        'Discharge_Energy': step('energy_last', 2),
+        'Duration': np.nanmax(df_steps['time_max'].to_numpy(dtype=np.float64), axis=1),
+        'Voltage_Min': np.nanmin(df_steps['voltage_min'].to_numpy(dtype=np.float64), axis=1),
+        'Voltage_Max': np.nanmax(df_steps['voltage_max'].to_numpy(dtype=np.float64), axis=1),
+        'Samples': samples.sum(axis=1),
+        'Chg_Samples': samples[:, 1] + samples[:, 2],
+        'DChg_Samples': samples[:, 3],
+        })
+    return df_summary[df_summary['DChg_Samples'] > 0].reset_index(drop=True)
+
 #----------------------------Grouping in Dataframe-----------------------------
-def DA00_Function_df_Cycle_Grouping(df_main,result_folder,file_name):
+@DA00_Function_Profiled
+def DA00_Function_df_Cycle_Grouping(df_main,result_folder,file_name,
+                                    long_format=False,export_wide_csv=True):
     #Make result folder
     os.makedirs(f"{result_folder}/{file_name}", exist_ok=True)  
     print(f"Folder '{result_folder}/{file_name}' created!")
     
-    # Dropping unnecessary columns
-    df_cycle_grouped = df_main.drop(columns=['Time','Realtime','Time_Diff'])
-    
-    # Grouping dataframe by Cycle ID, cycle_id = the cycle numbers
-    df_cycle_grouped = df_cycle_grouped.groupby('Cycle ID')
-    cycle_id = df_cycle_grouped.groups.keys()
+    with DA00_Function_Profile_Step('DA00 groupby', rows=len(df_main)) as step:
+        # Dropping unnecessary columns
+        df_cycle_grouped = df_main.drop(columns=['Time','Realtime','Time_Diff'])
+        
+        # Grouping dataframe by Cycle ID, cycle_id = the cycle numbers
+        df_cycle_grouped = df_cycle_grouped.groupby('Cycle ID')
+        cycle_id = df_cycle_grouped.groups.keys()
+        step.cycles = len(cycle_id)
     print("The cycles imported from", file_name, "are:", cycle_id, "and pre-processed.")
 
     # pd.set_option('display.max_columns', None)  # Show all columns   
@@ -97,61 +545,127 @@ def DA00_Function_df_Cycle_Grouping(df_main,result_folder,file_name):
     
     # df_cycle_grouped.to_csv(f'{result_folder}/{file_name}/df_cycle_grouped_{file_name}.csv', index=False)
     
-    # Initialize an empty list to store data for each cycle
-    df_VQ_grouped_list = []
+    # Charge (CC_Chg then CV_Chg) and discharge (CC_DChg) rows of every cycle
+    # in one pass, the long-format store takes the rows in that order
+    with DA00_Function_Profile_Step('DA00 V-Q segmentation', rows=len(df_main)) as step:
+        df_VQ_long, df_VQ_offsets = DA00_Function_VQ_Long(df_main)
+        step.cycles = len(df_VQ_offsets)
+
+    # End capacities, energies, duration, voltage range and sample counts of
+    # every cycle, DA03/DA04 read their values from it
+    with DA00_Function_Profile_Step('DA00 cycle summary', rows=len(df_main)) as step:
+        df_summary = DA00_Function_Cycle_Summary(df_main)
+        step.cycles = len(df_summary)
+
+    # One row per step for the energy metrics of DA07
+    with DA00_Function_Profile_Step('DA00 step table', rows=len(df_main)) as step:
+        df_steps = DA07_Function_Step_Table(df_main)
+        step.cycles = df_steps['Cycle_ID'].nunique()
+
+    # Long-format store of all cycles, DA02-DA06 read its columns as slices
+    vq_store = DA00_Cycle_Store(df_VQ_long, df_VQ_offsets, df_summary)
+
+    # Wide dataframe, all cycle data side by side (NaN padded), exported as
+    # CSV. Columnar formats get the long-format rows and their offsets
+    export_wide_csv = export_wide_csv and DA00_Function_Export_Active('csv')
+    if not long_format or export_wide_csv:
+        df_VQ_wide = vq_store.to_wide()
+        if export_wide_csv:
+            DA00_Function_Export_Table(df_VQ_wide,result_folder,file_name,'df_VQ_grouped',['csv'])
+    DA00_Function_Export_Table(vq_store.data,result_folder,file_name,'df_VQ_long',['parquet'])
+    DA00_Function_Export_Table(vq_store.offsets.reset_index(),result_folder,file_name,'df_VQ_offsets',['parquet'])
+    DA00_Function_Export_Table(vq_store.summary,result_folder,file_name,'df_Cycle_Summary')
+    df_VQ_grouped = vq_store if long_format else df_VQ_wide
+    
+    print('DataFrame df_VQ_grouped preview: ')
+    print(df_VQ_grouped.head())
     
-    # Function to add CC_Chg to CV_Chg capacity (as initial capacity)
-    def accumulate_capacity(df, start_capacity):
-        df['Accumulated_Capacity'] = df['Capacity'] + start_capacity
-        return df
+    return df_cycle_grouped,df_VQ_grouped,df_steps
 
-    # Iterate over each cycle
-    for cycle_id, df_cyc in df_cycle_grouped:
-        
-        # Group by Step Name within each cycle
-        df_step_grouped = df_cyc.groupby('Step Name')
-        step_group_name = df_step_grouped.groups.keys()
-       
-        if 'CC_Chg' and 'CV_Chg' and 'CC_DChg' in step_group_name:
-            
-            # Extract relevant steps
-            cc_chg = df_step_grouped.get_group('CC_Chg') if 'CC_Chg' in df_step_grouped.groups else pd.DataFrame()
-            cv_chg = df_step_grouped.get_group('CV_Chg') if 'CV_Chg' in df_step_grouped.groups else pd.DataFrame()
-            cc_dchg = df_step_grouped.get_group('CC_DChg') if 'CC_DChg' in df_step_grouped.groups else pd.DataFrame()
-            
-            # Voltage and Capacity for Charge steps
-            vchg = pd.concat([cc_chg['Voltage'], cv_chg['Voltage']]) if not cv_chg.empty else cc_chg['Voltage']
-            dqdvchg = pd.concat([cc_chg['dQdV'], cv_chg['dQdV']]) if not cv_chg.empty else cc_chg['dQdV']
-            cchg_start = cc_chg['Capacity'].iloc[-1] if not cc_chg.empty else 0
-            cchg = pd.concat([cc_chg['Capacity'], 
-                              accumulate_capacity(cv_chg, cchg_start)['Accumulated_Capacity']]) if not cv_chg.empty else   cc_chg['Capacity']
-
-            # Voltage and Capacity for Discharge steps
-            vdchg = cc_dchg['Voltage'] if not cc_dchg.empty else pd.Series()
-            cdchg = cc_dchg['Capacity'] if not cc_dchg.empty else pd.Series()
-            dqdvdchg = cc_dchg['dQdV'] if not cc_dchg.empty else pd.Series()
-        
-            # Combine into a DataFrame for V-Q
-            df_VQ = pd.DataFrame({
-                f'Cycle_{cycle_id}_VChg': vchg.reset_index(drop=True),
-                f'Cycle_{cycle_id}_CapChg': cchg.reset_index(drop=True),
-                f'Cycle_{cycle_id}_dQdVChg': dqdvchg.reset_index(drop=True),
-                f'Cycle_{cycle_id}_VDChg': vdchg.reset_index(drop=True),
-                f'Cycle_{cycle_id}_CapDChg': cdchg.reset_index(drop=True),
-                f'Cycle_{cycle_id}_dQdVDChg': dqdvdchg.reset_index(drop=True),
-                })
-               
-            # Combine all the cycles
-            df_VQ_grouped_list.append(df_VQ)
-        
-        else:
-            continue
-        
-    # Concatenate all cycle data horizontally and save the result
-    df_VQ_grouped = pd.concat(df_VQ_grouped_list, axis=1)
-    df_VQ_grouped.to_csv(f'{result_folder}/{file_name}/df_VQ_grouped_{file_name}.csv', index=False)
+#---------------------------Stored Grouping Products---------------------------
+# Columns of df_main used by DA01, the rest is not stored
+GROUPING_TIME_COLUMNS = ['Cycle ID', 'Voltage', 'Current', 'Power', 'Cycle_Time']
+
+def DA00_Function_Grouping_Save(store_folder,df_cycle_grouped,vq_store,df_steps):
+    # Store the DA01 columns, the long-format V-Q rows, the cycle index 
+    # (offsets of every cycle and direction), the per-cycle summary and the
+    # step table as binary columns
+    DA00_Function_Cache_Save(df_cycle_grouped.obj[GROUPING_TIME_COLUMNS].reset_index(drop=True),
+                             f'{store_folder}/df_cycle_grouped', [])
+    DA00_Function_Cache_Save(vq_store.data, f'{store_folder}/df_VQ_long', [])
+    DA00_Function_Cache_Save(vq_store.offsets.reset_index(), f'{store_folder}/df_VQ_offsets', [])
+    DA00_Function_Cache_Save(vq_store.summary, f'{store_folder}/df_summary', [])
+    DA00_Function_Cache_Save(df_steps, f'{store_folder}/df_steps', [])
+
+def DA00_Function_Grouping_Load(store_folder):
+    # df_cycle_grouped, the long-format store and the step table, None when
+    # not stored
+    df_time = DA00_Function_Cache_Load(f'{store_folder}/df_cycle_grouped', None)
+    df_VQ_long = DA00_Function_Cache_Load(f'{store_folder}/df_VQ_long', None)
+    df_VQ_offsets = DA00_Function_Cache_Load(f'{store_folder}/df_VQ_offsets', None)
+    df_summary = DA00_Function_Cache_Load(f'{store_folder}/df_summary', None)
+    df_steps = DA00_Function_Cache_Load(f'{store_folder}/df_steps', None)
+    if (df_time is None or df_VQ_long is None or df_VQ_offsets is None or df_summary is None
+            or df_steps is None):
+        return None
+    print(f"Grouped data loaded from '{store_folder}'.")
+    return df_time.groupby('Cycle ID'),DA00_Cycle_Store(df_VQ_long, df_VQ_offsets.set_index('Cycle ID'),
+                                                        df_summary),df_steps
+
+#-------------------------Streaming Grouping by Cycle--------------------------
+@DA00_Function_Profiled
+def DA00_Function_df_Cycle_Grouping_Stream(cycles,result_folder,file_name,
+                                           long_format=False,export_wide_csv=True):
+    # Same outputs as DA00_Function_df_Cycle_Grouping, built from a generator
+    # of (cycle_id, df_cycle) such as DA00_Function_Import_Stream. Of every 
+    # cycle only the columns used downstream are kept: the V-Q rows for 
+    # DA02-DA06, Cycle_Time, Voltage, Current, Power for DA01 and its steps
+    # for DA07. The rest of a cycle is released once it is grouped, but the
+    # kept columns of all cycles stay until the end, as DA01-DA06 plot every
+    # cycle: about 35 bytes per record plus 30 bytes per V-Q row (float64), 
+    # so memory still grows with the length of the test
+    os.makedirs(f"{result_folder}/{file_name}", exist_ok=True)  
+    print(f"Folder '{result_folder}/{file_name}' created!")
+    
+    df_time_parts = []
+    VQ_long_parts = []
+    VQ_offset_parts = []
+    summary_parts = []
+    step_parts = []
+    position = 0
+    for cycle_id, df_cycle in cycles:
+        df_time_parts.append(df_cycle[['Cycle ID', 'Voltage', 'Current', 'Power', 'Cycle_Time']])
+        df_VQ_long, df_VQ_offsets = DA00_Function_VQ_Long(df_cycle)
+        VQ_long_parts.append(df_VQ_long)
+        VQ_offset_parts.append(df_VQ_offsets + position)
+        summary_parts.append(DA00_Function_Cycle_Summary(df_cycle))
+        step_parts.append(DA07_Function_Step_Table(df_cycle))
+        position += len(df_VQ_long)
+    
+    # Grouping dataframe by Cycle ID, cycle_id = the cycle numbers
+    df_cycle_grouped = pd.concat(df_time_parts, ignore_index=True).groupby('Cycle ID')
+    print("The cycles imported from", file_name, "are:", df_cycle_grouped.groups.keys(), "and pre-processed.")
+    
+    # Long-format store of all cycles, the step names get common categories
+    df_VQ_long = pd.concat(VQ_long_parts, ignore_index=True)
+    df_VQ_long['Step Name'] = pd.Categorical(df_VQ_long['Step Name'].astype(object))
+    vq_store = DA00_Cycle_Store(df_VQ_long, pd.concat(VQ_offset_parts),
+                                pd.concat(summary_parts, ignore_index=True))
+    df_steps = pd.concat(step_parts, ignore_index=True)
+
+    # Wide dataframe, all cycle data side by side (NaN padded), exported as
+    # CSV. Columnar formats get the long-format rows and their offsets
+    export_wide_csv = export_wide_csv and DA00_Function_Export_Active('csv')
+    if not long_format or export_wide_csv:
+        df_VQ_wide = vq_store.to_wide()
+        if export_wide_csv:
+            DA00_Function_Export_Table(df_VQ_wide,result_folder,file_name,'df_VQ_grouped',['csv'])
+    DA00_Function_Export_Table(vq_store.data,result_folder,file_name,'df_VQ_long',['parquet'])
+    DA00_Function_Export_Table(vq_store.offsets.reset_index(),result_folder,file_name,'df_VQ_offsets',['parquet'])
+    DA00_Function_Export_Table(vq_store.summary,result_folder,file_name,'df_Cycle_Summary')
+    df_VQ_grouped = vq_store if long_format else df_VQ_wide
     
     print('DataFrame df_VQ_grouped preview: ')
     print(df_VQ_grouped.head())
     
-    return df_cycle_grouped,df_VQ_grouped
\ No newline at end of file
+    return df_cycle_grouped,df_VQ_grouped,df_steps
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for the fixed-format parser of the Neware txt export. The
+  file is read as raw bytes, the fields of every column are cut out as a
+  character matrix and decoded numerically into typed NumPy arrays: numbers
+  digit by digit, 'h:min:s.ms' durations to milliseconds and 'mm/dd/yyyy
+  HH:MM:SS' timestamps to datetime64, without building a string per field.
+  With the 'pyarrow' engine the multithreaded pyarrow CSV reader splits the
+  fields and parses numbers and timestamps, the durations are decoded from
+  its raw byte buffers. A file that does not follow the layout returns None,
+  so the caller can fall back to pd.read_csv. For the streaming import a file
+  is read in blocks of whole lines, each parsed on its own.
+
+
+Authors: Hans and Matthias
+
+"""
+
+import io
+import numpy as np
+import pandas as pd
+from DA_Function.DA00_Function_Profile import DA00_Function_Profile_Step
+
+# pyarrow is optional, only needed for the 'pyarrow' engine
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+# Kind of every Neware column, other columns are read as text
+NEWARE_FIELDS = {'Cycle ID': 'int', 'Step ID': 'int', 'Step Name': 'text',
+                 'Record ID': 'int', 'Time(h:min:s.ms)': 'duration',
+                 'Voltage(V)': 'float', 'Current(mA)': 'float',
+                 'Capacity(mAh)': 'float', 'Energy(mWh)': 'float',
+                 'Realtime': 'timestamp', 'dQ/dV(mAh/V)': 'float'}
+NEWARE_TIMESTAMP_FORMAT = '%m/%d/%Y %H:%M:%S'
+
+# Characters
+TAB, NEWLINE, RETURN, SPACE = 9, 10, 13, 32
+ZERO, DOT, MINUS, PLUS, COLON, SLASH = 48, 46, 45, 43, 58, 47
+
+#-------------------------------Field Characters-------------------------------
+def field_chars(buf, starts, ends, width=None, right=True, pad=SPACE):
+    # Character matrix (width, fields) of the bytes buf[start:end] of every
+    # field, right aligned (numbers) or left aligned (text) and padded. Row k
+    # holds the k-th character of every field, so the decoding below works on
+    # contiguous rows
+    lengths = ends - starts
+    if width is None:
+        width = max(int(lengths.max()) if len(lengths) else 0, 1)
+    # Smaller index types make the gathers faster
+    index_type = np.int32 if len(buf) < 2**31 - width else np.int64
+    index = (ends - width if right else starts).astype(index_type)
+    shortfall = np.minimum(width - lengths, width).astype(np.uint8 if width < 256 else np.int64)
+    chars = np.empty((width, len(starts)), dtype=np.uint8)
+    for k in range(width):
+        np.take(buf, index, out=chars[k], mode='clip')
+        outside = shortfall > k if right else (width - shortfall) <= k
+        chars[k][outside] = pad
+        index += 1
+    return chars
+
+#------------------------------Numeric Decoding--------------------------------
+def parse_integers(chars):
+    # Signed integers, None when a field is not a plain integer
+    if len(chars) > 18 or not np.all((chars[-1] >= ZERO) & (chars[-1] <= ZERO + 9)):
+        return None
+    values = np.zeros(chars.shape[1], dtype=np.int64)
+    negative = np.zeros(chars.shape[1], dtype=bool)
+    for row in chars:
+        is_digit = (row >= ZERO) & (row <= ZERO + 9)
+        is_sign = row == MINUS
+        if not np.all(is_digit | is_sign | (row == SPACE)):
+            return None
+        values = np.where(is_digit, values * 10 + (row.astype(np.int64) - ZERO), values)
+        negative |= is_sign
+    return np.where(negative, -values, values)
+
+def parse_floats(chars):
+    # Decimal numbers as mantissa / 10**decimals. Both are exact in float64
+    # for up to 15 digits, so the division gives the correctly rounded value.
+    # Empty fields are NaN, anything else (exponents, nan, long mantissas)
+    # goes through float() one field at a time. None when a field is not a
+    # number
+    count = chars.shape[1]
+    mantissa = np.zeros(count, dtype=np.int64)
+    digit_count = np.zeros(count, dtype=np.int64)
+    decimals = np.zeros(count, dtype=np.int64)
+    dots = np.zeros(count, dtype=np.int64)
+    negative = np.zeros(count, dtype=bool)
+    started = np.zeros(count, dtype=bool)                                     # a digit, dot or sign was read
+    irregular = np.zeros(count, dtype=bool)
+    for row in chars:
+        is_digit = (row >= ZERO) & (row <= ZERO + 9)
+        is_dot = row == DOT
+        is_sign = (row == MINUS) | (row == PLUS)
+        irregular |= ~(is_digit | is_dot | is_sign | (row == SPACE)) | (is_sign & started)
+        mantissa = np.where(is_digit, mantissa * 10 + (row.astype(np.int64) - ZERO), mantissa)
+        digit_count += is_digit
+        decimals += is_digit & (dots > 0)
+        dots += is_dot
+        negative |= row == MINUS
+        started |= is_digit | is_dot | is_sign
+    irregular |= (digit_count > 15) | (dots > 1) | ((digit_count == 0) & started)
+
+    values = mantissa / 10.0**decimals
+    values[negative] = -values[negative]
+    values[~started] = np.nan
+    for field in np.flatnonzero(irregular):
+        try:
+            values[field] = float(chars[:, field].tobytes())
+        except ValueError:
+            return None
+    return values
+
+def DA00_Function_Duration_Chars(chars):
+    # Neware 'h:min:s.ms' durations of a right aligned character matrix
+    # (width, fields) to integer milliseconds: 'min:s.ms' sits in the last 9
+    # characters and only the hour digits vary in width. None for anything
+    # else
+    width = len(chars)
+    if width < 10 or not (np.all(chars[-4] == DOT) and np.all(chars[-7] == COLON)
+                          and np.all(chars[-10] == COLON)):
+        return None
+
+    def digit(k):
+        column = chars[k].astype(np.int64)
+        return np.where(column == SPACE, 0, column - ZERO)
+
+    hours = np.zeros(chars.shape[1], dtype=np.int64)
+    for k in range(width - 10):
+        hours = hours * 10 + digit(k)
+    minutes = digit(-9) * 10 + digit(-8)
+    seconds = digit(-6) * 10 + digit(-5)
+    milliseconds = digit(-3) * 100 + digit(-2) * 10 + digit(-1)
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + milliseconds
+
+def parse_timestamps(chars):
+    # 'mm/dd/yyyy HH:MM:SS' to datetime64[s], the date from the month count
+    # since 1970 and the day of month. None for any other layout
+    if len(chars) != 19 or not (np.all(chars[[2, 5]] == SLASH) and np.all(chars[10] == SPACE)
+                                and np.all(chars[[13, 16]] == COLON)):
+        return None
+    number = lambda *rows: sum((chars[k].astype(np.int64) - ZERO) * 10**(len(rows) - 1 - i)
+                               for i, k in enumerate(rows))
+    month, day, year = number(0, 1), number(3, 4), number(6, 7, 8, 9)
+    month_start = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    days_in_month = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    if np.any((month < 1) | (month > 12) | (day < 1) | (day > days_in_month)):
+        return None
+    seconds = number(11, 12) * 3600 + number(14, 15) * 60 + number(17, 18)
+    return (month_start.astype('datetime64[D]') + (day - 1)).astype('datetime64[s]') + seconds
+
+def parse_text(chars):
+    # Text fields as Python strings, every distinct value decoded once
+    unique, inverse = np.unique(np.ascontiguousarray(chars.T).view(f'S{len(chars)}').ravel(),
+                                return_inverse=True)
+    return np.array([value.decode() for value in unique], dtype=object)[inverse.ravel()]
+
+def parse_column(kind, chars):
+    # Typed array of one column, None when a field does not fit the kind
+    if kind == 'int':
+        return parse_integers(chars)
+    if kind == 'float':
+        return parse_floats(chars)
+    if kind == 'duration':
+        milliseconds = DA00_Function_Duration_Chars(chars)
+        return None if milliseconds is None else milliseconds.astype('timedelta64[ms]')
+    if kind == 'timestamp':
+        return parse_timestamps(chars)
+    return parse_text(chars)
+
+#-------------------------------NumPy Engine-----------------------------------
+def parse_numpy(file_path, block_rows, data=None):
+    # Fields are found from the tab and newline positions, every line must
+    # have the same number of fields as the header. Blocks of block_rows lines
+    # keep the temporary character matrices small
+    buf = np.fromfile(file_path, dtype=np.uint8) if data is None else np.frombuffer(data, dtype=np.uint8)
+    if np.any(buf == RETURN):
+        buf = buf[buf != RETURN]
+    stop = len(buf)
+    while stop > 0 and buf[stop - 1] == NEWLINE:
+        stop -= 1
+    buf = np.append(buf[:stop], np.uint8(NEWLINE))
+
+    line_ends = np.flatnonzero(buf == NEWLINE)
+    names = buf[:line_ends[0]].tobytes().decode().split('\t')
+    field_count = len(names)
+    columns = [(position, name) for position, name in enumerate(names) if name != '']
+    row_count = len(line_ends) - 1
+    if row_count == 0:
+        return None
+    result = {name: None for _, name in columns}
+
+    for first in range(0, row_count, block_rows):
+        last = min(first + block_rows, row_count)
+        start, stop = line_ends[first] + 1, line_ends[last] + 1
+        block = buf[start:stop]
+        separators = np.flatnonzero((block == TAB) | (block == NEWLINE)) + start
+        if (len(separators) != (last - first) * field_count
+                or not np.all(buf[separators[field_count - 1::field_count]] == NEWLINE)):
+            return None
+        # One contiguous row of field ends and starts per column
+        ends = np.ascontiguousarray(separators.reshape(-1, field_count).T)
+        starts = np.empty_like(ends)
+        starts[1:] = ends[:-1] + 1
+        starts[0] = line_ends[first:last] + 1
+        for position, name in columns:
+            kind = NEWARE_FIELDS.get(name, 'text')
+            chars = field_chars(buf, starts[position], ends[position],
+                                right=kind != 'text', pad=SPACE if kind != 'text' else 0)
+            values = parse_column(kind, chars)
+            if values is None:
+                return None
+            if result[name] is None:
+                result[name] = np.empty(row_count, dtype=values.dtype)
+            result[name][first:last] = values
+
+    return pd.DataFrame(result, copy=False)
+
+#-------------------------------pyarrow Engine---------------------------------
+def parse_pyarrow(file_path, data=None):
+    # pyarrow splits the fields and parses numbers and timestamps in threads,
+    # durations are read as raw bytes and decoded from the arrow buffers
+    with (open(file_path, 'rb') if data is None else io.BytesIO(data)) as f:
+        names = f.readline().rstrip(b'\r\n').decode().split('\t')
+    arrow_types = {'int': pa.int64(), 'float': pa.float64(), 'duration': pa.binary(),
+                   'timestamp': pa.timestamp('s'), 'text': pa.string()}
+    column_types = {name: arrow_types[NEWARE_FIELDS.get(name, 'text')] for name in names if name != ''}
+    try:
+        table = pa_csv.read_csv(file_path if data is None else io.BytesIO(data),
+                                read_options=pa_csv.ReadOptions(use_threads=True),
+                                parse_options=pa_csv.ParseOptions(delimiter='\t'),
+                                convert_options=pa_csv.ConvertOptions(column_types=column_types,
+                                                                      include_columns=list(column_types),
+                                                                      timestamp_parsers=[NEWARE_TIMESTAMP_FORMAT]))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+
+    result = {}
+    for name in table.column_names:
+        kind = NEWARE_FIELDS.get(name, 'text')
+        column = table.column(name).combine_chunks()
+        if kind == 'duration':
+            if column.null_count:
+                return None
+            offsets = np.frombuffer(column.buffers()[1], dtype=np.int32)[column.offset:column.offset + len(column) + 1]
+            data = np.frombuffer(column.buffers()[2], dtype=np.uint8)
+            values = parse_column(kind, field_chars(data, offsets[:-1].astype(np.int64), offsets[1:].astype(np.int64)))
+            if values is None:
+                return None
+            result[name] = values
+        else:
+            result[name] = column.to_numpy(zero_copy_only=False)
+    return pd.DataFrame(result, copy=False)
+
+#---------------------------------Neware Parser--------------------------------
+def DA00_Function_Parse_Neware(file_path,engine='numpy',block_rows=1_000_000,data=None):
+    # Read one Neware txt file into a dataframe with the Neware column names,
+    # 'Realtime' as datetime64 and 'Time(h:min:s.ms)' as timedelta64. engine
+    # 'numpy' (single thread, no extra dependency) or 'pyarrow' (threads).
+    # With data (bytes of the header and whole lines, see 
+    # DA00_Function_Read_Blocks) only these lines are parsed. None when the 
+    # file does not follow the fixed layout
+    if engine == 'pyarrow' and pa is None:
+        print("pyarrow is not installed, parsing with the 'numpy' engine.")
+        engine = 'numpy'
+    if engine not in ['numpy', 'pyarrow']:
+        raise ValueError(f"Unknown Neware parser engine '{engine}', use 'numpy' or 'pyarrow'.")
+
+    with DA00_Function_Profile_Step('DA00 CSV parse') as step:
+        dataraw = parse_numpy(file_path,block_rows,data) if engine == 'numpy' else parse_pyarrow(file_path,data)
+        if dataraw is None:
+            print(f"{file_path} does not follow the Neware layout, reading it with pandas.")
+            return None
+        step.rows = len(dataraw)
+
+    # Same dtypes as pd.read_csv plus the datetime conversion of DA00
+    for column, dtype in [('Realtime', 'datetime64[ns]'), ('Time(h:min:s.ms)', 'timedelta64[ns]')]:
+        if column in dataraw.columns:
+            dataraw[column] = dataraw[column].astype(dtype)
+    return dataraw
+
+def DA00_Function_Read_Blocks(file_path,chunk_rows):
+    # The header line plus about chunk_rows whole lines per block, so a file
+    # can be parsed piece by piece. The line length is taken from the first
+    # 64 kB of the file
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        rest = f.read(1 << 16)
+        block_bytes = max(len(rest) * chunk_rows // max(rest.count(b'\n'), 1), 1 << 16)
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                break
+            rest += data
+            cut = rest.rfind(b'\n') + 1
+            if cut >= block_bytes:
+                yield header + rest[:cut]
+                rest = rest[cut:]
+        if rest.strip():
+            yield header + rest
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for online CE and SOH: the records are fed chunk by chunk
+  as they are read, every chunk is cut into its steps and only the last and
+  maximum capacity of each step type is kept per cycle. A cycle is emitted
+  as soon as its CC_DChg step ends, with the same values as DA03 and DA04
+  (charge capacity: CV_Chg on top of the last CC_Chg capacity).
+
+Usage (from the repository root):
+    python -m DA_Function.DA00_Function_Online DA_Data N1T1 2100
+    python -m DA_Function.DA00_Function_Online DA_Data N1T1 2100 --follow 60
+
+
+Authors: Hans and Matthias
+
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from DA_Function.DA00_Function_Import_Main_df import (DA00_Function_Find_Files,
+                                                      DA00_Function_Read_Chunks)
+
+# Per cycle: last and maximum capacity of the CC_Chg, CV_Chg and CC_DChg rows
+ONLINE_STEPS = ['CC_Chg', 'CV_Chg', 'CC_DChg']
+ONLINE_COLUMNS = ['Cycle_ID', 'Charge_Capacity', 'Discharge_Capacity', 'Coulombic_Efficiency',
+                  'Maximum_Capacity', 'SOH']
+
+#----------------------------------Accumulator---------------------------------
+class DA00_Online_Metrics:
+    # update(chunk) takes records in record order (columns Cycle ID, Step ID,
+    # Step Name, Capacity) and returns the rows of the cycles completed by it.
+    # callback(row) is called for every emitted row. A cycle is emitted again
+    # when later records of it change its values
+    def __init__(self, rated_capacity, callback=None):
+        self.rated_capacity = rated_capacity
+        self.callback = callback
+        self.cycles = {}                                                       # cycle_id: [last, max] x ONLINE_STEPS
+        self.rows = {}                                                         # cycle_id: last emitted row
+        self.open_step = None                                                  # (cycle_id, step_id, step name)
+
+    def update(self, chunk):
+        emitted = []
+        if len(chunk) == 0:
+            return emitted
+        cycle_ids = chunk['Cycle ID'].to_numpy()
+        step_ids = chunk['Step ID'].to_numpy()
+        capacity = chunk['Capacity'].to_numpy(dtype=np.float64)
+
+        # Steps of the chunk: last and maximum (NaN skipped) capacity
+        starts = np.flatnonzero(np.r_[True, (cycle_ids[1:] != cycle_ids[:-1]) | (step_ids[1:] != step_ids[:-1])])
+        stops = np.r_[starts[1:], len(chunk)]
+        last = capacity[stops - 1]
+        maximum = np.fmax.reduceat(capacity, starts)
+        names = np.asarray(chunk['Step Name'])[starts]
+
+        # Only the steps are looped, a step of the previous chunk continues
+        for cycle_id, step_id, name, step_last, step_max in zip(cycle_ids[starts].tolist(), step_ids[starts].tolist(),
+                                                                names, last, maximum):
+            if self.open_step is not None and self.open_step[:2] != (cycle_id, step_id):
+                emitted += self.close_step(cycle_id)
+            self.open_step = (cycle_id, step_id, str(name))
+            if name in ONLINE_STEPS:
+                state = self.cycles.setdefault(cycle_id, [np.nan] * 6)
+                idx = 2 * ONLINE_STEPS.index(name)
+                state[idx] = step_last
+                state[idx + 1] = np.fmax(state[idx + 1], step_max)
+        return emitted
+
+    def close_step(self, next_cycle_id):
+        # A CC_DChg step or a cycle ended: emit its cycle
+        cycle_id, _, name = self.open_step
+        if name == 'CC_DChg' or next_cycle_id != cycle_id:
+            return self.emit(cycle_id)
+        return []
+
+    def finish(self):
+        # End of the data, the last cycle is complete
+        emitted = [] if self.open_step is None else self.emit(self.open_step[0])
+        self.open_step = None
+        return emitted
+
+    def emit(self, cycle_id):
+        row = self.cycle_row(cycle_id)
+        previous = self.rows.get(cycle_id)
+        if row is None or (previous is not None and
+                           np.array_equal(list(previous.values()), list(row.values()), equal_nan=True)):
+            return []
+        self.rows[cycle_id] = row
+        if self.callback is not None:
+            self.callback(row)
+        return [row]
+
+    def cycle_row(self, cycle_id):
+        # CE as DA03 and SOH as DA04, only cycles with a CC_DChg step
+        state = self.cycles.get(cycle_id)
+        if state is None or np.isnan(state[4]):
+            return None
+        cc_last, cc_max, cv_last, cv_max, dchg_last, dchg_max = state
+        cc_end = 0 if np.isnan(cc_last) else cc_last
+        charge = cv_last + cc_end if not np.isnan(cv_last) else cc_end
+        charge_max = np.fmax(cc_max, cv_max + cc_end)
+        max_capacity = charge_max if charge_max > dchg_max else dchg_max
+        ce = dchg_last / charge * 100 if charge > 0 else 0
+        return {'Cycle_ID': cycle_id,
+                'Charge_Capacity': float(charge),
+                'Discharge_Capacity': float(dchg_last),
+                'Coulombic_Efficiency': float(ce) if ce <= 100 else np.nan,          # DA03 drops CE above 100 %
+                'Maximum_Capacity': float(max_capacity),
+                'SOH': float(max_capacity / self.rated_capacity * 100)}
+
+    def results(self):
+        # Latest row of every emitted cycle
+        return pd.DataFrame([self.rows[cycle_id] for cycle_id in sorted(self.rows)], columns=ONLINE_COLUMNS)
+
+    def state(self):
+        # JSON serializable state, to continue with restore() in a later run
+        return {'cycles': {str(cycle_id): [float(value) for value in state] for cycle_id, state in self.cycles.items()},
+                'open_step': None if self.open_step is None else list(self.open_step),
+                'emitted': sorted(self.rows)}
+
+    def restore(self, state):
+        self.cycles = {int(cycle_id): values for cycle_id, values in state['cycles'].items()}
+        self.open_step = None if state['open_step'] is None else tuple(state['open_step'])
+        self.rows = {cycle_id: self.cycle_row(cycle_id) for cycle_id in state['emitted']}
+
+#--------------------------------Live Printing---------------------------------
+def DA00_Function_Online_Print(row):
+    print(f"Cycle {row['Cycle_ID']}: charge {row['Charge_Capacity']:.2f} mAh, discharge "
+          f"{row['Discharge_Capacity']:.2f} mAh, CE {row['Coulombic_Efficiency']:.3f} %, SOH {row['SOH']:.2f} %")
+
+#-------------------------------------Main-------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print CE and SOH of every cycle as soon as its discharge ends.')
+    parser.add_argument('data_folder', help='folder of the data file(s)')
+    parser.add_argument('file_name', help='name of the cell')
+    parser.add_argument('rated_capacity', type=float, help='rated capacity of the battery (mAh)')
+    parser.add_argument('--chunk-rows', type=int, default=50000, help='records read at a time')
+    parser.add_argument('--follow', type=float, default=None, metavar='SECONDS',
+                        help='keep reading new records of a running test every SECONDS')
+    parser.add_argument('--output', default=None, help='CSV file for the rows of all cycles')
+    args = parser.parse_args()
+
+    online = DA00_Online_Metrics(args.rated_capacity, DA00_Function_Online_Print)
+    last_file, last_record_id = 0, -1
+    try:
+        while True:
+            # Files before the last read file are complete, of the last read
+            # file and newer files only the new records are used
+            file_paths = DA00_Function_Find_Files(args.data_folder, args.file_name)
+            for file_path in file_paths[last_file:]:
+                for chunk in DA00_Function_Read_Chunks(file_path, args.chunk_rows):
+                    chunk = chunk[chunk['Record ID'] > last_record_id]
+                    if len(chunk):
+                        online.update(chunk)
+                        last_record_id = int(chunk['Record ID'].max())
+            last_file = max(len(file_paths) - 1, 0)
+            if args.follow is None:
+                online.finish()
+                break
+            time.sleep(args.follow)
+    except KeyboardInterrupt:
+        pass
+
+    if args.output:
+        online.results().to_csv(args.output, index=False)
+        print(f"Online CE and SOH saved to {args.output}")
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+    1. Main
+2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for the stage pipeline of DA_Main.py. Every stage declares
+  the products it needs and makes, only the requested stages are run, plus
+  the stages whose stored products are missing or stale. A stage is stale
+  when its parameters or the parameters of a stage before it changed since
+  its products were stored.
+
+
+Authors: Hans and Matthias
+
+"""
+
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+
+# Raised when a stage has nothing to do, the later stages are skipped
+class DA00_Pipeline_Stop(Exception):
+    pass
+
+#----------------------------------Fingerprints--------------------------------
+def DA00_Function_Pipeline_Fingerprints(pipeline):
+    # Hash of the name and parameters of every stage and of the fingerprints
+    # of the stages making its inputs. Stages are declared in running order
+    producer = {}
+    fingerprints = {}
+    for name, stage in pipeline.items():
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps([name, stage.get('params', {})], sort_keys=True, default=str).encode())
+        for product in stage['inputs']:
+            digest.update(fingerprints[producer[product]].encode())
+        fingerprints[name] = digest.hexdigest()
+        for product in stage['outputs']:
+            producer[product] = name
+    return producer, fingerprints
+
+#-------------------------------------Running----------------------------------
+def DA00_Function_Pipeline_Run(pipeline, requested, store_folder=None):
+    # pipeline: {name: {'inputs': [...], 'outputs': [...], 'run': function,
+    #                   'params': dict, 'save': function, 'load': function}}
+    # run(*inputs) returns the outputs as a tuple, or None when there is
+    # nothing to do, which stops the pipeline. save(*outputs) stores the
+    # products in store_folder, load() returns them again (None when they are
+    # missing). Requested stages always run, any other stage only when its
+    # products are needed and can not be loaded fresh
+    unknown = [name for name in requested if name not in pipeline]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}, available: {list(pipeline)}")
+    producer, fingerprints = DA00_Function_Pipeline_Fingerprints(pipeline)
+
+    state_path = None if store_folder is None else f'{store_folder}/pipeline_state.json'
+    state = {}
+    if state_path is not None and os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    products = {}
+    report = []
+
+    def run(name):
+        stage = pipeline[name]
+        inputs = [resolve(product) for product in stage['inputs']]
+        start, cpu_start = time.perf_counter(), time.process_time()
+        outputs = stage['run'](*inputs)
+        if outputs is None:
+            report.append([name, 'stopped', time.perf_counter() - start, time.process_time() - cpu_start])
+            raise DA00_Pipeline_Stop(name)
+        products.update(zip(stage['outputs'], outputs))
+        if state_path is not None:
+            if 'save' in stage:
+                stage['save'](*outputs)
+            state[name] = fingerprints[name]
+            with open(state_path, 'w') as f:
+                json.dump(state, f, indent=1)
+        report.append([name, 'run', time.perf_counter() - start, time.process_time() - cpu_start])
+
+    def resolve(product):
+        if product in products:
+            return products[product]
+        name = producer[product]
+        outputs = None
+        if state.get(name) == fingerprints[name] and 'load' in pipeline[name]:
+            start, cpu_start = time.perf_counter(), time.process_time()
+            outputs = pipeline[name]['load']()
+            if outputs is not None:
+                products.update(zip(pipeline[name]['outputs'], outputs))
+                report.append([name, 'loaded', time.perf_counter() - start, time.process_time() - cpu_start])
+        if outputs is None:
+            run(name)
+        return products[product]
+
+    if state_path is not None:
+        os.makedirs(store_folder, exist_ok=True)
+    try:
+        for name in pipeline:
+            if name in requested:
+                run(name)
+    except DA00_Pipeline_Stop as stop:
+        print(f"Pipeline stopped after stage '{stop}', nothing to do.")
+
+    # Wall and CPU time of every stage that was run or loaded
+    df_report = pd.DataFrame(report, columns=['Stage', 'Status', 'Wall_Time_s', 'CPU_Time_s'])
+    print(df_report.to_string(index=False, float_format=lambda t: f'{t:.2f}'))
+    return df_report
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for the timing instrumentation of DA00-DA06. Every DA
+  function and its main sub-steps record wall time, CPU time, peak RSS and
+  the rows and cycles they handled. The records of a cell are written to a
+  JSON and a CSV report, optionally with a cProfile dump. Profiling is off
+  by default, a disabled step only costs one dictionary lookup.
+
+
+Authors: Hans and Matthias
+
+"""
+
+import cProfile
+import functools
+import json
+import os
+import resource
+import sys
+import time
+import pandas as pd
+
+# Profiling state shared by all DA functions
+profile_state = {'enabled': False, 'cprofile': False, 'profiler': None, 'records': []}
+
+#------------------------------------Steps-------------------------------------
+class DA00_Profile_Step:
+    # Context manager timing one step, rows and cycles can be set inside
+    def __init__(self, name, rows=None, cycles=None):
+        self.name = name
+        self.rows = rows
+        self.cycles = cycles
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        profile_state['records'].append({
+            'Step': self.name,
+            'Wall_Time_s': time.perf_counter() - self.start,
+            'CPU_Time_s': time.process_time() - self.cpu_start,
+            'Peak_RSS_MB': DA00_Function_Peak_RSS_MB(),
+            'Rows': self.rows,
+            'Cycles': self.cycles,
+            })
+        return False
+
+class DA00_Profile_No_Step:
+    # Stand-in while profiling is off, setting rows or cycles is ignored
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+no_step = DA00_Profile_No_Step()
+
+def DA00_Function_Profile_Step(name, rows=None, cycles=None):
+    # with DA00_Function_Profile_Step('DA00 CSV parse') as step: ...
+    if not profile_state['enabled']:
+        return no_step
+    return DA00_Profile_Step(name, rows, cycles)
+
+def DA00_Function_Profiled(function):
+    # Decorator recording every call of a DA function as one step, with the
+    # rows and cycles of its first dataframe argument
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not profile_state['enabled']:
+            return function(*args, **kwargs)
+        with DA00_Profile_Step(function.__name__, *DA00_Function_Profile_Counts(args)):
+            return function(*args, **kwargs)
+    return wrapper
+
+def DA00_Function_Profile_Counts(args):
+    # Rows and cycles of df_main (one row per record), of df_cycle_grouped
+    # (grouped by cycle), of a per-cycle or per-step table such as df_summary
+    # and df_steps (a Cycle_ID column), of a wide df_VQ_grouped (six columns
+    # per cycle) or of a cycle store
+    for arg in args:
+        if isinstance(arg, pd.core.groupby.DataFrameGroupBy):
+            return len(arg.obj), arg.ngroups
+        if hasattr(arg, 'offsets') and hasattr(arg, 'data'):
+            return len(arg.data), len(arg.offsets)
+        if isinstance(arg, pd.DataFrame):
+            if 'Cycle ID' in arg.columns:
+                return len(arg), arg['Cycle ID'].nunique()
+            if 'Cycle_ID' in arg.columns:
+                return len(arg), arg['Cycle_ID'].nunique()
+            if len(arg.columns) and str(arg.columns[0]).startswith('Cycle_'):
+                return int(arg.notna().sum().sum()), len(arg.columns) // 6
+            return len(arg), None
+    return None, None
+
+def DA00_Function_Peak_RSS_MB():
+    # Peak resident memory of the process so far (kB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+#---------------------------------Start & Report-------------------------------
+def DA00_Function_Profile_Start(enabled, cprofile=False):
+    # Start recording for one cell, cprofile also runs the function profiler
+    profile_state['enabled'] = enabled
+    profile_state['records'] = []
+    profile_state['cprofile'] = enabled and cprofile
+    if profile_state['cprofile']:
+        profile_state['profiler'] = cProfile.Profile()
+        profile_state['profiler'].enable()
+
+def DA00_Function_Profile_Report(result_folder, file_name):
+    # Write the records of the cell to DA_Profile_{file_name}.json (every
+    # record and a summary per step) and .csv (summary), the cProfile stats
+    # to DA_Profile_{file_name}.prof. Returns the summary
+    if not profile_state['enabled']:
+        return None
+    os.makedirs(f'{result_folder}/{file_name}', exist_ok=True)
+    if profile_state['profiler'] is not None:
+        profile_state['profiler'].disable()
+        profile_state['profiler'].dump_stats(f'{result_folder}/{file_name}/DA_Profile_{file_name}.prof')
+        profile_state['profiler'] = None
+
+    df_records = pd.DataFrame(profile_state['records'],
+                              columns=['Step', 'Wall_Time_s', 'CPU_Time_s', 'Peak_RSS_MB', 'Rows', 'Cycles'])
+    df_summary = df_records.groupby('Step', sort=False).agg(Calls=('Step', 'size'),
+                                                            Wall_Time_s=('Wall_Time_s', 'sum'),
+                                                            CPU_Time_s=('CPU_Time_s', 'sum'),
+                                                            Peak_RSS_MB=('Peak_RSS_MB', 'max'),
+                                                            Rows=('Rows', lambda v: v.sum(min_count=1)),
+                                                            Cycles=('Cycles', lambda v: v.sum(min_count=1))).reset_index()
+    df_summary.to_csv(f'{result_folder}/{file_name}/DA_Profile_{file_name}.csv', index=False)
+    # Missing counts are written as null
+    to_records = lambda df: df.astype(object).where(df.notna(), None).to_dict(orient='records')
+    with open(f'{result_folder}/{file_name}/DA_Profile_{file_name}.json', 'w') as f:
+        json.dump({'cell': file_name,
+                   'summary': to_records(df_summary),
+                   'records': to_records(df_records)}, f, indent=1, default=float)
+    print(f"Profile of {file_name} saved to {result_folder}/{file_name}/DA_Profile_{file_name}.json")
+    profile_state['enabled'] = False
+    return df_summary
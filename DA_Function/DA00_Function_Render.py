@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for saving figures of DA01-DA06, either interactively
+  (save, then show) or headless (save on a background thread, then free)
+- Per-cycle figures can be drawn and saved in a pool of worker processes,
+  every job only gets the arrays of its own cycle
+
+
+Authors: Hans and Matthias
+
+"""
+
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import matplotlib.pyplot as plt
+from DA_Function.DA00_Function_Profile import DA00_Function_Profile_Step
+
+# Rendering state shared by all DA functions
+render_state = {'headless': False, 'queue': None, 'thread': None, 'errors': [],
+                'pool': None, 'pending': set(), 'max_pending': 0}
+
+#---------------------------------Render Setup---------------------------------
+def DA00_Function_Render_Setup(headless, background=True, max_pending=4, workers=1):
+    # headless: switch to the non-interactive Agg backend, figures are never
+    # shown and are closed as soon as they are saved.
+    # background: PNG encoding runs on a render thread, at most max_pending
+    # figures wait for it so the memory stays flat for any number of cycles
+    # workers: per-cycle figures are drawn in this many worker processes
+    # (headless only), at most max_pending jobs per worker are submitted
+    DA00_Function_Render_Wait()
+    render_state['headless'] = headless
+    if render_state['pool'] is not None and (not headless or workers <= 1):
+        render_state['pool'].shutdown()
+        render_state['pool'] = None
+    if not headless:
+        return
+    plt.switch_backend('Agg')
+
+    # Workers are spawned, not forked, as the render thread may be busy
+    if workers > 1 and render_state['pool'] is None:
+        render_state['pool'] = ProcessPoolExecutor(max_workers=workers,
+                                                   mp_context=multiprocessing.get_context('spawn'),
+                                                   initializer=DA00_Function_Render_Setup,
+                                                   initargs=(True, False))
+        render_state['max_pending'] = workers * max_pending
+
+    if background and render_state['thread'] is None:
+        render_state['queue'] = queue.Queue(maxsize=max_pending)
+        render_state['thread'] = threading.Thread(target=render_worker, daemon=True)
+        render_state['thread'].start()
+    elif not background and render_state['thread'] is not None:
+        render_state['queue'].put(None)
+        render_state['thread'].join()
+        render_state['queue'] = None
+        render_state['thread'] = None
+
+def render_worker():
+    while True:
+        job = render_state['queue'].get()
+        if job is None:
+            render_state['queue'].task_done()
+            break
+        fig, file_path, savefig_kwargs = job
+        try:
+            with DA00_Function_Profile_Step('savefig'):
+                fig.savefig(file_path, **savefig_kwargs)
+        except Exception as exc:
+            render_state['errors'].append(exc)
+        finally:
+            render_state['queue'].task_done()
+
+#---------------------------------Figure Saving--------------------------------
+def DA00_Function_Save_Figure(fig, file_path, show=True, **savefig_kwargs):
+    # Interactive: save and show the figure (plt.show closes it)
+    if not render_state['headless']:
+        with DA00_Function_Profile_Step('savefig'):
+            fig.savefig(file_path, **savefig_kwargs)
+        if show:
+            plt.show()
+        return
+
+    # Headless: detach the figure from pyplot, so the next plot starts on a
+    # new figure, then render it on the background thread or right away
+    plt.close(fig)
+    if render_state['queue'] is not None:
+        render_state['queue'].put((fig, file_path, savefig_kwargs))
+    else:
+        with DA00_Function_Profile_Step('savefig'):
+            fig.savefig(file_path, **savefig_kwargs)
+
+#---------------------------------Figure Jobs----------------------------------
+def DA00_Function_Render_Submit(plot_function, *args):
+    # Draw and save one figure with plot_function(*args), in the worker pool
+    # when there is one. plot_function has to be defined at module level and
+    # args should only hold the (small) arrays of one cycle, they are pickled
+    if render_state['pool'] is None:
+        plot_function(*args)
+        return
+    if len(render_state['pending']) >= render_state['max_pending']:
+        done, render_state['pending'] = wait(render_state['pending'], return_when=FIRST_COMPLETED)
+        render_collect(done)
+    render_state['pending'].add(render_state['pool'].submit(plot_function, *args))
+
+def render_collect(futures):
+    for future in futures:
+        if future.exception() is not None:
+            render_state['errors'].append(future.exception())
+
+#---------------------------------Render Flush---------------------------------
+def DA00_Function_Render_Wait():
+    # Block until every queued figure is written, errors of the render thread
+    # and of the worker pool are raised here
+    if render_state['queue'] is not None:
+        render_state['queue'].join()
+    if render_state['pending']:
+        render_collect(wait(render_state['pending']).done)
+        render_state['pending'] = set()
+    if render_state['errors']:
+        error = render_state['errors'][0]
+        render_state['errors'] = []
+        raise error
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+    2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for the cycle-level results cache of DA06.
+  Every entry is addressed by the cell, the stage, the cycle ID, a hash of
+  the V-Q samples of the cycle and the analysis parameters, so a cycle is
+  only analysed again when its data or the parameters change. The cache is
+  limited in size, the least recently used entries are removed first.
+
+Usage (from the repository root):
+    python -m DA_Function.DA00_Function_Results_Cache DA_Cache
+    python -m DA_Function.DA00_Function_Results_Cache DA_Cache --clear --cell N1T1
+
+
+Authors: Hans and Matthias
+
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+import pandas as pd
+
+#------------------------------------Entry Key---------------------------------
+def DA00_Function_Results_Cache_Key(df_VQ_grouped, cycle_id, params):
+    # Hash of the charge and discharge V-Q samples of one cycle together with
+    # the analysis parameters (any JSON serialisable dict)
+    digest = hashlib.blake2b(digest_size=16)
+    for direction in ['Chg', 'DChg']:
+        for quantity in ['V', 'Cap', 'dQdV']:
+            column = f'Cycle_{cycle_id}_{quantity}{direction}'
+            if column in df_VQ_grouped:
+                values = df_VQ_grouped[column].dropna().to_numpy(dtype='float64')
+                digest.update(column.encode())
+                digest.update(values.tobytes())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def DA00_Function_Results_Cache_Path(cache_folder, file_name, stage, cycle_id, key):
+    return f"{cache_folder}/{file_name}/results/{stage}/Cycle_{cycle_id}_{key}.pkl"
+
+#-------------------------------Reading & Writing------------------------------
+def DA00_Function_Results_Cache_Get(cache_folder, file_name, stage, cycle_id, key):
+    # Stored result of the cycle, or None. A hit refreshes the modification
+    # time, which is the last use for the LRU eviction
+    entry_path = DA00_Function_Results_Cache_Path(cache_folder, file_name, stage, cycle_id, key)
+    try:
+        with open(entry_path, 'rb') as f:
+            result = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    os.utime(entry_path)
+    return result
+
+def DA00_Function_Results_Cache_Put(cache_folder, file_name, stage, cycle_id, key, result):
+    # Write to a temporary file first, so a cut off write is never read back
+    entry_path = DA00_Function_Results_Cache_Path(cache_folder, file_name, stage, cycle_id, key)
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    with open(f'{entry_path}.tmp', 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f'{entry_path}.tmp', entry_path)
+
+#----------------------------Inspection & Eviction-----------------------------
+def DA00_Function_Results_Cache_Inspect(cache_folder):
+    # One row per entry: cell, stage, cycle, size and last use
+    entries = []
+    for entry_path in glob.glob(f"{cache_folder}/*/results/*/Cycle_*.pkl"):
+        stat = os.stat(entry_path)
+        stage_folder = os.path.dirname(entry_path)
+        entries.append({'Cell': os.path.basename(os.path.dirname(os.path.dirname(stage_folder))),
+                        'Stage': os.path.basename(stage_folder),
+                        'Cycle_ID': int(os.path.basename(entry_path).split('_')[1]),
+                        'Size_kB': stat.st_size / 1e3,
+                        'Last_Used': stat.st_mtime,
+                        'Path': entry_path})
+    return pd.DataFrame(entries, columns=['Cell', 'Stage', 'Cycle_ID', 'Size_kB', 'Last_Used', 'Path'])
+
+def DA00_Function_Results_Cache_Evict(cache_folder, max_mb):
+    # Remove the least recently used entries until the cache fits in max_mb
+    df_entries = DA00_Function_Results_Cache_Inspect(cache_folder).sort_values(by='Last_Used')
+    excess = df_entries['Size_kB'].sum() / 1e3 - max_mb
+    removed = 0
+    for entry_path, size_kB in zip(df_entries['Path'], df_entries['Size_kB']):
+        if excess <= 0:
+            break
+        os.remove(entry_path)
+        excess -= size_kB / 1e3
+        removed += 1
+    if removed:
+        print(f"Results cache: {removed} least recently used entries removed to stay below {max_mb} MB.")
+
+def DA00_Function_Results_Cache_Clear(cache_folder, file_name=None, stage=None):
+    # Remove all results of one cell, one stage or the whole results cache,
+    # the import cache is kept
+    for results_folder in glob.glob(f"{cache_folder}/{file_name or '*'}/results"):
+        stage_folders = glob.glob(f"{results_folder}/{stage}") if stage else [results_folder]
+        for stage_folder in stage_folders:
+            shutil.rmtree(stage_folder)
+            print(f"Removed {stage_folder}")
+
+#-------------------------------------Main-------------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or clear the DA06 results cache.')
+    parser.add_argument('cache_folder', help='cache folder of DA_Main.py (cache_folder)')
+    parser.add_argument('--clear', action='store_true', help='remove the cached results')
+    parser.add_argument('--cell', default=None, help='only this cell')
+    parser.add_argument('--stage', default=None, help='only this stage (DA06)')
+    args = parser.parse_args()
+
+    if args.clear:
+        DA00_Function_Results_Cache_Clear(args.cache_folder, args.cell, args.stage)
+    else:
+        df_entries = DA00_Function_Results_Cache_Inspect(args.cache_folder)
+        if args.cell:
+            df_entries = df_entries[df_entries['Cell'] == args.cell]
+        if args.stage:
+            df_entries = df_entries[df_entries['Stage'] == args.stage]
+        df_summary = df_entries.groupby(['Cell', 'Stage']).agg(Entries=('Cycle_ID', 'size'),
+                                                               Cycles=('Cycle_ID', 'nunique'),
+                                                               Size_MB=('Size_kB', lambda size: size.sum() / 1e3),
+                                                               Last_Used=('Last_Used', 'max'))
+        df_summary['Last_Used'] = [time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t)) for t in df_summary['Last_Used']]
+        print(df_summary if len(df_summary) else f"No cached results in '{args.cache_folder}'.")
+        print(f"Total: {len(df_entries)} entries, {df_entries['Size_kB'].sum() / 1e3:.2f} MB")
@@ -11,9 +11,12 @@ Code Structure:
 6. DA04: Plot & analysis SOH over cycles
 7. DA05: Analysis of Statistical Summary
 8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
 
 == Part of DA ==
 - Function code for Plot & analysis of Voltage and Current to Time
+- Long series are decimated to about the pixel width of the figure before
+  plotting (min/max per bucket), unless full resolution is asked for
 
 
 Authors: Hans and Matthias
@@ -22,30 +25,91 @@ Authors: Hans and Matthias
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import numpy as np
+from DA_Function.DA00_Function_Render import (DA00_Function_Save_Figure,
+                                              DA00_Function_Render_Submit)
+from DA_Function.DA00_Function_Profile import DA00_Function_Profiled
+
+# Resolution of the saved figures
+plot_dpi = 300
+
+#----------------------------------Decimation----------------------------------
+def DA01_Function_Decimate(x,y,buckets):
+    # Keep the first, last, minimum and maximum sample of every bucket, so the
+    # line drawn on `buckets` pixel columns looks the same as with all
+    # samples. Buckets are equal spans of x for increasing x (Cycle_Time),
+    # equal numbers of samples otherwise. buckets=None keeps every sample
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if buckets is None or len(x) <= 4 * buckets:
+        return x, y
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if len(x) <= 4 * buckets:
+        return x, y
+
+    if np.all(np.diff(x) >= 0):
+        edges = np.searchsorted(x, np.linspace(x[0], x[-1], buckets + 1)[1:-1])
+    else:
+        edges = np.linspace(0, len(x), buckets + 1).astype(np.int64)[1:-1]
+    starts = np.unique(np.r_[0, edges])
+    starts = starts[starts < len(x)]
+    stops = np.r_[starts[1:], len(x)]
+
+    # Position of the minimum and maximum of every bucket: the first sample
+    # equal to the bucket extreme
+    counts = stops - starts
+    bucket_ids = np.repeat(np.arange(len(starts)), counts)
+    keep = [starts, stops - 1]
+    for extreme in [np.minimum, np.maximum]:
+        hits = np.flatnonzero(y == np.repeat(extreme.reduceat(y, starts), counts))
+        keep.append(hits[np.unique(bucket_ids[hits], return_index=True)[1]])
+    keep = np.unique(np.concatenate(keep))
+    return x[keep], y[keep]
+
+def DA01_Function_Plot_Buckets(fig,full_resolution):
+    # Pixel columns of the saved figure, None for full resolution
+    return None if full_resolution else int(fig.get_figwidth() * plot_dpi)
 
 #-----------------------------------VnIvsTime----------------------------------
-def DA01_Function_VnIvsTime(result_folder,file_name,df_cycle_grouped):
+def DA01_Function_VnIvsTime_Cycle_Plot(result_folder,file_name,i,cycle_time,
+                                       voltage,current,full_resolution):
+    # Figure of one cycle, may run in a render worker
+    fig, host = plt.subplots()
+    par1 = host.twinx()
+    buckets = DA01_Function_Plot_Buckets(fig,full_resolution)
+
+    # Insert the data for overview plot
+    p1, = host.plot(*DA01_Function_Decimate(cycle_time, voltage, buckets), "b-")
+    p2, = par1.plot(*DA01_Function_Decimate(cycle_time, current, buckets), "r-")
+    host.set_ylabel('Voltage (V)')
+    par1.set_ylabel('Current (mA)')
+    plt.title(f'Voltage and Current vs. Time - {file_name} - Cycle{i}')
+    DA00_Function_Save_Figure(plt.gcf(), f'{result_folder}/{file_name}/VnCvsTime_{file_name}_Cycle{i}.png', show=False, dpi=plot_dpi, bbox_inches='tight')
+
+@DA00_Function_Profiled
+def DA01_Function_VnIvsTime(result_folder,file_name,df_cycle_grouped,
+                            full_resolution=False,cycles_to_update=None):
     cycle_id = df_cycle_grouped.groups.keys()
     
     #---------------------------------Every cycles----------------------------- 
+    # With cycles_to_update only those cycles are drawn again, the figures of
+    # the other cycles are kept
     i = 0
     for i in cycle_id:    
+        if cycles_to_update is not None and i not in cycles_to_update:
+            continue
         cycle_data = df_cycle_grouped.get_group(i)
-        fig, host = plt.subplots()
-        par1 = host.twinx()
-
-        # Insert the data for overview plot
-        p1, = host.plot(cycle_data['Cycle_Time'], cycle_data['Voltage'], "b-")
-        p2, = par1.plot(cycle_data['Cycle_Time'], cycle_data['Current'], "r-")
-        host.set_ylabel('Voltage (V)')
-        par1.set_ylabel('Current (mA)')
-        plt.title(f'Voltage and Current vs. Time - {file_name} - Cycle{i}')
-        plt.savefig(f'{result_folder}/{file_name}/VnCvsTime_{file_name}_Cycle{i}.png', dpi=300, bbox_inches='tight')
+        DA00_Function_Render_Submit(DA01_Function_VnIvsTime_Cycle_Plot,result_folder,file_name,i,
+                                    cycle_data['Cycle_Time'].to_numpy(),
+                                    cycle_data['Voltage'].to_numpy(),
+                                    cycle_data['Current'].to_numpy(),
+                                    full_resolution)
         i += 1
         
     #-----------------------------------All cycles-----------------------------    
     fig, host = plt.subplots()
     par1 = host.twinx()  # Create the second y-axis
+    buckets = DA01_Function_Plot_Buckets(fig,full_resolution)
 
     # Get a colormap with enough colors for all cycles
     colors = cm.rainbow(np.linspace(0, 1, len(cycle_id)))
@@ -55,8 +119,8 @@ def DA01_Function_VnIvsTime(result_folder,file_name,df_cycle_grouped):
         cycle_data = df_cycle_grouped.get_group(cycle)
         
         # Plot each cycle with a different color
-        p1, = host.plot(cycle_data['Cycle_Time'], cycle_data['Voltage'], color=colors[i])#, label=f'Cycle {cycle} Voltage')
-        p2, = par1.plot(cycle_data['Cycle_Time'], cycle_data['Current'], color=colors[i], linestyle='--')#, label=f'Cycle {cycle} Current')
+        p1, = host.plot(*DA01_Function_Decimate(cycle_data['Cycle_Time'], cycle_data['Voltage'], buckets), color=colors[i])#, label=f'Cycle {cycle} Voltage')
+        p2, = par1.plot(*DA01_Function_Decimate(cycle_data['Cycle_Time'], cycle_data['Current'], buckets), color=colors[i], linestyle='--')#, label=f'Cycle {cycle} Current')
     
     # Set labels and titles
     host.set_xlabel('Cycle Time (s)')
@@ -69,44 +133,58 @@ def DA01_Function_VnIvsTime(result_folder,file_name,df_cycle_grouped):
     par1.legend(loc='upper right')
 
     # Save the combined plot
-    plt.savefig(f"{result_folder}/{file_name}/VnCvsTime_{file_name}_AllCycles.png", dpi=300, bbox_inches='tight')
-    plt.show()
+    DA00_Function_Save_Figure(plt.gcf(), f"{result_folder}/{file_name}/VnCvsTime_{file_name}_AllCycles.png", dpi=plot_dpi, bbox_inches='tight')
 
     return
 
 #------------------------------------Power-------------------------------------
-def DA01_Function_Power(result_folder,file_name,df_cycle_grouped):
+def DA01_Function_Power_Cycle_Plot(result_folder,file_name,i,cycle_time,power,
+                                   figsize,full_resolution):
+    # Figure of one cycle, may run in a render worker. Only the first cycle
+    # has figsize, the others keep the default size
+    plt.figure(figsize=figsize)
+
+    # Insert the data for overview plot
+    buckets = DA01_Function_Plot_Buckets(plt.gcf(),full_resolution)
+    plt.plot(*DA01_Function_Decimate(cycle_time, power, buckets))
+    plt.ylabel('Cycle Time (s)')
+    plt.ylabel('Power (mW)')
+    plt.title(f'Power vs. Time - {file_name} - Cycle{i}')
+    DA00_Function_Save_Figure(plt.gcf(), f'{result_folder}/{file_name}/PvsTime_{file_name}_Cycle{i}.png', dpi=plot_dpi, bbox_inches='tight')
+
+@DA00_Function_Profiled
+def DA01_Function_Power(result_folder,file_name,df_cycle_grouped,
+                        full_resolution=False,cycles_to_update=None):
     cycle_id = df_cycle_grouped.groups.keys()
     
-    plt.figure(figsize=(10, 6))
+    figsize = (10, 6)
     i = 0
     for i in cycle_id:
+        if cycles_to_update is not None and i not in cycles_to_update:
+            continue
         cycle_data = df_cycle_grouped.get_group(i)
-
-        # Insert the data for overview plot
-        plt.plot(cycle_data['Cycle_Time'], cycle_data['Power'])
-        plt.ylabel('Cycle Time (s)')
-        plt.ylabel('Power (mW)')
-        plt.title(f'Power vs. Time - {file_name} - Cycle{i}')
-        plt.savefig(f'{result_folder}/{file_name}/PvsTime_{file_name}_Cycle{i}.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        DA00_Function_Render_Submit(DA01_Function_Power_Cycle_Plot,result_folder,file_name,i,
+                                    cycle_data['Cycle_Time'].to_numpy(),
+                                    cycle_data['Power'].to_numpy(),
+                                    figsize,full_resolution)
+        figsize = None
         i += 1
         
     #-----------------------------------All cycles-----------------------------    
     # Get a colormap with enough colors for all cycles
     colors = cm.rainbow(np.linspace(0, 1, len(cycle_id)))
+    buckets = DA01_Function_Plot_Buckets(plt.gcf(),full_resolution)
 
     for i, cycle in enumerate(cycle_id):
         cycle_data = df_cycle_grouped.get_group(cycle)
         
         # Plot each cycle with a different color
-        plt.plot(cycle_data['Cycle_Time'], cycle_data['Power'], color=colors[i])
+        plt.plot(*DA01_Function_Decimate(cycle_data['Cycle_Time'], cycle_data['Power'], buckets), color=colors[i])
     
     # Set labels and titles
     plt.xlabel('Cycle Time (s)')
     plt.ylabel('Power (mW)')
     plt.title(f'Power vs. Cycle Time - All Cycles - {file_name}')
-    plt.savefig(f"{result_folder}/{file_name}/PvsTime_{file_name}_AllCycles.png", dpi=300, bbox_inches='tight')
-    plt.show()
+    DA00_Function_Save_Figure(plt.gcf(), f"{result_folder}/{file_name}/PvsTime_{file_name}_AllCycles.png", dpi=plot_dpi, bbox_inches='tight')
 
     return
\ No newline at end of file
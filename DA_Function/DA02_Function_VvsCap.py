@@ -11,6 +11,7 @@ Code Structure:
 6. DA04: Plot & analysis SOH over cycles
 7. DA05: Analysis of Statistical Summary
 8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
 
 == Part of DA ==
 - Function code for Plot & analysis of Voltage to Capacity (Potential Profile)
@@ -22,37 +23,67 @@ Authors: Hans and Matthias
 import numpy as np
 import matplotlib.pyplot as plt
 import re
+from DA_Function.DA00_Function_Render import (DA00_Function_Save_Figure,
+                                              DA00_Function_Render_Submit)
+from DA_Function.DA00_Function_Profile import DA00_Function_Profiled
 
 #--------------------Plotting Voltage to Capacity (VvsCap)---------------------
-def DA02_Function_VvsCap(df_VQ_grouped,file_name,result_folder,rated_capacity):  
-    cycle_columns = [col for col in df_VQ_grouped.columns if re.match(r'Cycle_\d+_', col)]
-    cycle_numbers = sorted({int(re.search(r'Cycle_(\d+)_', col).group(1)) for col in cycle_columns})
+def DA02_Function_VvsCap_Cycle_Plot(file_name,result_folder,rated_capacity,cycle_id,
+                                    cap_chg,v_chg,cap_dchg,v_dchg,figsize):
+    # Figure of one cycle, may run in a render worker. Missing branches are
+    # None, only the first cycle has figsize, the others keep the default size
+    plt.figure(figsize=figsize)
+
+    # Plot Charge V-Q
+    if cap_chg is not None:
+        plt.plot(cap_chg, v_chg, label=f'Cycle {cycle_id} Charge')
+
+    # Plot Discharge V-Q
+    if cap_dchg is not None:
+        plt.plot(cap_dchg, v_dchg, linestyle='--', 
+                 label=f'Cycle {cycle_id} Discharge')
+    
+    plt.xlabel('Capacity (mAh)')
+    plt.ylabel('Voltage (V)')
+    plt.xlim(0, rated_capacity)
+    plt.title(f'Voltage vs Capacity for Cycle {cycle_id} - {file_name}')
+    plt.legend()
+    plt.grid(True)
+    DA00_Function_Save_Figure(plt.gcf(), f'{result_folder}/{file_name}/V-Q_Cycle_{cycle_id}_{file_name}.png')
+
+@DA00_Function_Profiled
+def DA02_Function_VvsCap(df_VQ_grouped,file_name,result_folder,rated_capacity,df_summary=None,
+                         cycles_to_update=None):  
+    # Cycles from the per-cycle summary, else from the column names
+    if df_summary is not None:
+        cycle_numbers = df_summary['Cycle_ID'].tolist()
+    else:
+        cycle_columns = [col for col in df_VQ_grouped.columns if re.match(r'Cycle_\d+_', col)]
+        cycle_numbers = sorted({int(re.search(r'Cycle_(\d+)_', col).group(1)) for col in cycle_columns})
     
     #----------------------------Plot Every Cycles-----------------------------
-    plt.figure(figsize=(14, 8))
+    # With cycles_to_update only those cycles are drawn again
+    figsize = (14, 8)
 
     for idx, cycle_id in enumerate(cycle_numbers):
+        if cycles_to_update is not None and cycle_id not in cycles_to_update:
+            continue
+        cap_chg = v_chg = cap_dchg = v_dchg = None
 
-        # Plot Charge V-Q
+        # Charge V-Q
         if f'Cycle_{cycle_id}_VChg' in df_VQ_grouped and f'Cycle_{cycle_id}_CapChg' in df_VQ_grouped:
-            plt.plot(df_VQ_grouped[f'Cycle_{cycle_id}_CapChg'], 
-                     df_VQ_grouped[f'Cycle_{cycle_id}_VChg'], 
-                     label=f'Cycle {cycle_id} Charge')
+            cap_chg = df_VQ_grouped[f'Cycle_{cycle_id}_CapChg'].to_numpy()
+            v_chg = df_VQ_grouped[f'Cycle_{cycle_id}_VChg'].to_numpy()
 
-        # Plot Discharge V-Q
+        # Discharge V-Q
         if f'Cycle_{cycle_id}_VDChg' in df_VQ_grouped and f'Cycle_{cycle_id}_CapDChg' in df_VQ_grouped:
-            plt.plot(df_VQ_grouped[f'Cycle_{cycle_id}_CapDChg'],
-            df_VQ_grouped[f'Cycle_{cycle_id}_VDChg'], linestyle='--', 
-            label=f'Cycle {cycle_id} Discharge')
+            cap_dchg = df_VQ_grouped[f'Cycle_{cycle_id}_CapDChg'].to_numpy()
+            v_dchg = df_VQ_grouped[f'Cycle_{cycle_id}_VDChg'].to_numpy()
         
-        plt.xlabel('Capacity (mAh)')
-        plt.ylabel('Voltage (V)')
-        plt.xlim(0, rated_capacity)
-        plt.title(f'Voltage vs Capacity for Cycle {cycle_id} - {file_name}')
-        plt.legend()
-        plt.grid(True)
-        plt.savefig(f'{result_folder}/{file_name}/V-Q_Cycle_{cycle_id}_{file_name}.png')
-        plt.show()
+        DA00_Function_Render_Submit(DA02_Function_VvsCap_Cycle_Plot,file_name,result_folder,
+                                    rated_capacity,cycle_id,cap_chg,v_chg,cap_dchg,v_dchg,
+                                    figsize)
+        figsize = None
         
     #-----------------------------Plot All Cycles------------------------------
     # Plot V-Q for all cycles in one graph with different colors
@@ -84,7 +115,6 @@ def DA02_Function_VvsCap(df_VQ_grouped,file_name,result_folder,rated_capacity):
     plt.title(f'Voltage vs Capacity for All Cycles - {file_name}')
     plt.legend()
     plt.grid(True)
-    plt.savefig(f'{result_folder}/{file_name}/V-Q_All_Cycles_{file_name}.png')   
-    plt.show()
+    DA00_Function_Save_Figure(plt.gcf(), f'{result_folder}/{file_name}/V-Q_All_Cycles_{file_name}.png')
     
     return
\ No newline at end of file
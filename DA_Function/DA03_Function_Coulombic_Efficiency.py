@@ -11,6 +11,7 @@ Code Structure:
 6. DA04: Plot & analysis SOH over cycles
 7. DA05: Analysis of Statistical Summary
 8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
 
 == Part of DA ==
 - Function code for Plot & analysis of Coulombic Efficiency (CE)
@@ -22,38 +23,23 @@ Authors: Hans and Matthias
 
 import pandas as pd
 import matplotlib.pyplot as plt
-import re
+from DA_Function.DA00_Function_Render import DA00_Function_Save_Figure
+from DA_Function.DA00_Function_Profile import (DA00_Function_Profiled)
+from DA_Function.DA00_Function_Export import (DA00_Function_Export_Table)
 
 #---------------------Processing & Plotting CE over cycles---------------------
-def DA03_Function_Coulombic_Efficiency(df_VQ_grouped,file_name,result_folder):   
-    ce_cycle = []
+@DA00_Function_Profiled
+def DA03_Function_Coulombic_Efficiency(df_summary,file_name,result_folder):
+    # CE of every cycle from the end capacities of the per-cycle summary 
+    # (DA00_Function_Cycle_Summary), cycles with a CE above 100 % are left out
+    df_ce = df_summary[['Cycle_ID', 'Discharge_Capacity', 'Charge_Capacity']].reset_index(drop=True)
+    charge = df_ce['Charge_Capacity']
+    df_ce['Coulombic_Efficiency'] = (df_ce['Discharge_Capacity'] / charge.where(charge > 0)) * 100
+    df_ce.loc[~(charge > 0), 'Coulombic_Efficiency'] = 0
+    df_ce = df_ce[~(df_ce['Coulombic_Efficiency'] > 100)].reset_index(drop=True)
     
-    # Extract unique cycle numbers from the column names
-    cycle_columns = [col for col in df_VQ_grouped.columns if re.match(r'Cycle_\d+_', col)]
-    cycle_numbers = sorted({int(re.search(r'Cycle_(\d+)_', col).group(1)) for col in cycle_columns})
-
-    for cycle_id in cycle_numbers:      
-        cchg = df_VQ_grouped[f'Cycle_{cycle_id}_CapChg'].dropna()
-        cdchg = df_VQ_grouped[f'Cycle_{cycle_id}_CapDChg'].dropna()
-        
-        # Calculate Coulombic Efficiency (CE)
-        total_CapChg = cchg.iloc[-1] if not cchg.empty else 0
-        total_CapDChg = cdchg.iloc[-1] if not cdchg.empty else 0
-        ce = (total_CapDChg / total_CapChg) * 100 if total_CapChg > 0 else 0
-        if ce > 100:
-            continue
-        
-        # Combine into a DataFrame
-        ce_cycle.append({
-            'Cycle_ID': cycle_id,
-            'Discharge_Capacity': total_CapDChg,
-            'Charge_Capacity': total_CapChg,
-            'Coulombic_Efficiency': ce,
-            })
-               
-    # Create a DataFrame for Coulombic Efficiencies and save the result
-    df_ce = pd.DataFrame(ce_cycle)
-    df_ce.to_csv(f'{result_folder}/{file_name}/df_CE_{file_name}.csv', index=False)
+    # Save the result
+    DA00_Function_Export_Table(df_ce,result_folder,file_name,'df_CE')
     pd.set_option('display.max_columns', None)  # Show all columns   
     print('DataFrame df_ce preview: ')
     print(df_ce.head(5))
@@ -80,8 +66,7 @@ def DA03_Function_Coulombic_Efficiency(df_VQ_grouped,file_name,result_folder):
     fig.legend(loc='upper left', bbox_to_anchor=(0.1,0.9))
     plt.title(f'Coulombic Efficiency and Capacity vs Cycle - {file_name}')
     plt.grid(True)
-    plt.savefig(f'{result_folder}/{file_name}/CE-cycles_{file_name}.png', dpi=300)
-    plt.show()
+    DA00_Function_Save_Figure(plt.gcf(), f'{result_folder}/{file_name}/CE-cycles_{file_name}.png', dpi=300)
     
     return df_ce
     
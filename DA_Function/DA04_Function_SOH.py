@@ -11,6 +11,7 @@ Code Structure:
     6. DA04: Plot & analysis SOH over cycles
 7. DA05: Analysis of Statistical Summary
 8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
 
 == Part of DA ==
 - Function code for Plot & analysis of SOH
@@ -20,39 +21,22 @@ Authors: Hans and Matthias
 
 """
 
-import re
 import pandas as pd
 import matplotlib.pyplot as plt
+from DA_Function.DA00_Function_Render import DA00_Function_Save_Figure
+from DA_Function.DA00_Function_Profile import (DA00_Function_Profiled)
+from DA_Function.DA00_Function_Export import (DA00_Function_Export_Table)
 
 #--------------------Processing & Plotting SOH over cycles---------------------
-def DA04_Function_SOH(df_VQ_grouped,rated_capacity,file_name,result_folder):
-    SOH_data = []
+@DA00_Function_Profiled
+def DA04_Function_SOH(df_summary,rated_capacity,file_name,result_folder):
+    # SOH of every cycle from the maximum capacity of the per-cycle summary
+    # (DA00_Function_Cycle_Summary), the larger of charge and discharge
+    df_SOH = df_summary[['Cycle_ID', 'Maximum_Capacity']].reset_index(drop=True)
+    df_SOH['SOH'] = (df_SOH['Maximum_Capacity'] / rated_capacity) * 100
     
-    # Extract unique cycle numbers from the column names
-    cycle_columns = [col for col in df_VQ_grouped.columns if re.match(r'Cycle_\d+_', col)]
-    cycle_numbers = sorted({int(re.search(r'Cycle_(\d+)_', col).group(1)) for col in cycle_columns})
-
-    for cycle_id in cycle_numbers:
-        cchg = df_VQ_grouped[f'Cycle_{cycle_id}_CapChg'].dropna()
-        cdchg = df_VQ_grouped[f'Cycle_{cycle_id}_CapDChg'].dropna()
-        
-        # Calculate SOH
-        if cchg.max() > cdchg.max():
-            max_capacity_per_cycle = cchg.max()
-        else:
-            max_capacity_per_cycle = cdchg.max()
-            
-        soh = (max_capacity_per_cycle / rated_capacity) * 100
-        
-        # Combine into a DataFrame
-        SOH_data.append({
-            'Cycle_ID': cycle_id,
-            'Maximum_Capacity': max_capacity_per_cycle,
-            'SOH': soh
-            })
-    
-    df_SOH = pd.DataFrame(SOH_data)
-    df_SOH.to_csv(f'{result_folder}/{file_name}/df_SOH_{file_name}.csv', index=False)
+    # Save the result
+    DA00_Function_Export_Table(df_SOH,result_folder,file_name,'df_SOH')
     pd.set_option('display.max_columns', None)  # Show all columns   
     print('DataFrame df_SOH preview: ')
     print(df_SOH.head(5))
@@ -64,7 +48,6 @@ def DA04_Function_SOH(df_VQ_grouped,rated_capacity,file_name,result_folder):
     plt.ylim((df_SOH['SOH'].min()*0.97), (df_SOH['SOH'].max()*1.03))
     plt.title(f'State of Health (SOH) Over Cycles - {file_name}')
     plt.grid(True)
-    plt.savefig(f'{result_folder}/{file_name}/SOH Plot_{file_name}.png', dpi=300)
-    plt.show()
+    DA00_Function_Save_Figure(plt.gcf(), f'{result_folder}/{file_name}/SOH Plot_{file_name}.png', dpi=300)
         
     return  df_SOH
\ No newline at end of file
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage, Current, Power to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+    8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for the multi-peak Gaussian fitting of dQ/dV peaks. All peaks
+  of a cycle are fitted together as a sum of Gaussians with an analytic
+  Jacobian. The curves of all cycles with the same number of peaks are fitted
+  as one batch by a vectorized Levenberg-Marquardt, only the fits which do
+  not converge or end on a limit go through curve_fit one by one, starting
+  from the parameters of the previous cycle. Blocks of cycles can be fitted
+  in parallel worker processes.
+
+
+Authors: Hans and Matthias
+
+"""
+
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import curve_fit
+from scipy.signal import peak_widths
+
+#--------------------------------Sum of Gaussians------------------------------
+def DA06_Function_Gaussian_Sum(x, params):
+    # params: amp, mean, sigma of every peak, flat or as rows of three
+    params = np.asarray(params, dtype=np.float64).reshape(-1, 3)
+    dx = np.asarray(x, dtype=np.float64)[:, None] - params[:, 1]
+    return (params[:, 0] * np.exp(-dx**2 / (2 * params[:, 2]**2))).sum(axis=1)
+
+def DA06_Function_Gaussian_Jacobian(x, params):
+    # Derivatives to amp, mean and sigma of every peak, shape (points, 3*peaks)
+    params = np.asarray(params, dtype=np.float64).reshape(-1, 3)
+    amp, mean, sigma = params[:, 0], params[:, 1], params[:, 2]
+    dx = np.asarray(x, dtype=np.float64)[:, None] - mean
+    exp_term = np.exp(-dx**2 / (2 * sigma**2))
+    jacobian = np.empty((dx.shape[0], 3 * len(params)))
+    jacobian[:, 0::3] = exp_term
+    jacobian[:, 1::3] = amp * exp_term * dx / sigma**2
+    jacobian[:, 2::3] = amp * exp_term * dx**2 / sigma**3
+    return jacobian
+
+def DA06_Function_Gaussian_Sum_Batch(x, params):
+    # Sum of Gaussians of many curves: x (curves, points), params (curves, 
+    # 3*peaks) with amp, mean, sigma of every peak. Returns (curves, points)
+    z = (x[:, :, None] - params[:, None, 1::3]) / params[:, None, 2::3]
+    return (params[:, None, 0::3] * np.exp(-0.5 * z**2)).sum(axis=2)
+
+def DA06_Function_Gaussian_Jacobian_Batch(x, params):
+    # Derivatives of every curve to its parameters, (curves, points, 3*peaks)
+    sigma = params[:, None, 2::3]
+    z = (x[:, :, None] - params[:, None, 1::3]) / sigma
+    jacobian = np.empty(z.shape[:2] + (params.shape[1],))
+    exp_term = np.exp(-0.5 * z**2)
+    jacobian[:, :, 0::3] = exp_term
+    jacobian[:, :, 1::3] = params[:, None, 0::3] * exp_term * z / sigma
+    jacobian[:, :, 2::3] = jacobian[:, :, 1::3] * z
+    return jacobian
+
+#---------------------------------Peak Limits----------------------------------
+def DA06_Function_Gaussian_Limits(x, y, peak_indices, window_size):
+    # Rows of the fit (from the window of the first to the window of the last
+    # peak) and the limits of every parameter: the amplitude keeps the sign
+    # of the peak height, the mean stays within the peak window and sigma is
+    # positive and at most the voltage range
+    windows = [np.arange(max(0, peak - window_size), min(len(x), peak + window_size))
+               for peak in peak_indices]
+    rows = np.arange(windows[0][0], windows[-1][-1] + 1)
+    sigma_max = np.nanmax(x) - np.nanmin(x)
+    lower, upper = [], []
+    for peak, window in zip(peak_indices, windows):
+        lower += [0 if y[peak] >= 0 else -np.inf, np.min(x[window]), 1e-4]
+        upper += [np.inf if y[peak] >= 0 else 0, np.max(x[window]), sigma_max]
+    return rows, np.array(lower), np.array(upper)
+
+def DA06_Function_Sigma_Guess(x, y, peak_indices, sigma_guess):
+    # Sigma of every peak from its width at half height (FWHM / 2.355), the
+    # batch then starts close to its minimum. sigma_guess where no width is
+    # found
+    widths, _, left, right = peak_widths(np.where(y[peak_indices[0]] >= 0, 1, -1) * np.nan_to_num(y),
+                                         peak_indices, rel_height=0.5)
+    positions = np.arange(len(x))
+    half_widths = np.abs(np.interp(right, positions, x) - np.interp(left, positions, x))
+    return np.where((widths > 0) & np.isfinite(half_widths), half_widths / 2.355, sigma_guess)
+
+#-------------------------------Fitting One Branch-----------------------------
+def DA06_Function_Gaussian_Fit_Branch(x, y, peak_indices, window_size, sigma_guess,
+                                      p0=None, maxfev=5000):
+    # Fit all peaks of one charge or discharge curve together, on the points
+    # from the window of the first to the window of the last peak. Without p0
+    # the fit starts from the peak heights and voltages. Every peak has to 
+    # keep the sign of its height and its mean within its window, so the 
+    # Gaussians can not drift away to fit the baseline. The unbounded 
+    # Levenberg-Marquardt fit is tried first, the bounded fit only when its
+    # result breaks these limits. Raises RuntimeError/ValueError when the fit
+    # fails
+    rows, lower, upper = DA06_Function_Gaussian_Limits(x, y, peak_indices, window_size)
+    if p0 is None:
+        p0 = [[y[peak], x[peak], sigma_guess] for peak in peak_indices]
+    p0 = np.clip(np.ravel(p0), lower, upper)
+
+    model = lambda x_fit, *params: DA06_Function_Gaussian_Sum(x_fit, params)
+    jacobian = lambda x_fit, *params: DA06_Function_Gaussian_Jacobian(x_fit, params)
+    try:
+        popt, _ = curve_fit(model, x[rows], y[rows], p0=p0, jac=jacobian, maxfev=maxfev)
+        popt[2::3] = np.abs(popt[2::3])                                        # Sign of sigma has no meaning
+        if np.all(popt >= lower) and np.all(popt <= upper):
+            return popt.reshape(-1, 3)
+    except (RuntimeError, TypeError):
+        pass
+    popt, _ = curve_fit(model, x[rows], y[rows], p0=p0, bounds=(lower, upper),
+                        jac=jacobian, maxfev=maxfev)
+    return popt.reshape(-1, 3)
+
+#--------------------------Batched Levenberg-Marquardt-------------------------
+def DA06_Function_Gaussian_Fit_Batch(x, y, mask, p0, lower, upper, max_iterations=200,
+                                     tolerance=1.5e-8):
+    # Levenberg-Marquardt on many curves with the same number of peaks at
+    # once: x, y, mask (curves, points), masked points (padding, NaN) do not
+    # count. p0, lower, upper (curves, 3*peaks), every step is projected into
+    # the limits. Every curve has its own damping and stops when its cost or
+    # its parameters change by less than tolerance (relative, as ftol and 
+    # xtol of curve_fit) after an accepted step. Returns the parameters and 
+    # whether each curve converged, a curve which stalls (no step lowers its
+    # cost even with full damping) or runs out of iterations has not
+    params = p0.copy()
+    damping = np.full(len(params), 1e-3)
+    residual = (DA06_Function_Gaussian_Sum_Batch(x, params) - y) * mask
+    cost = (residual**2).sum(axis=1)
+    active = np.isfinite(cost)
+    converged = np.zeros(len(params), dtype=bool)
+    identity = np.eye(params.shape[1])
+    for _ in range(max_iterations):
+        curves = np.flatnonzero(active)
+        if len(curves) == 0:
+            break
+        jacobian = DA06_Function_Gaussian_Jacobian_Batch(x[curves], params[curves]) * mask[curves, :, None]
+        normal = np.matmul(jacobian.transpose(0, 2, 1), jacobian)
+        gradient = np.matmul(jacobian.transpose(0, 2, 1), residual[curves][:, :, None])[:, :, 0]
+
+        # Parameters on a limit which the step would push further out are
+        # held: their rows and columns are replaced by the identity
+        held = (((params[curves] <= lower[curves]) & (gradient > 0))
+                | ((params[curves] >= upper[curves]) & (gradient < 0)))
+        normal[held[:, :, None] | held[:, None, :]] = 0
+        normal += identity * held[:, None, :]
+        gradient[held] = 0
+        scaled = normal + damping[curves, None, None] * identity * np.diagonal(normal, axis1=1, axis2=2)[:, None, :]
+        with np.errstate(all='ignore'):
+            try:
+                step = -np.linalg.solve(scaled, gradient[:, :, None])[:, :, 0]
+            except np.linalg.LinAlgError:
+                step = -np.stack([np.linalg.lstsq(matrix, vector, rcond=None)[0]
+                                  for matrix, vector in zip(scaled, gradient)])
+            trial = np.clip(params[curves] + step, lower[curves], upper[curves])
+            trial_residual = (DA06_Function_Gaussian_Sum_Batch(x[curves], trial) - y[curves]) * mask[curves]
+            trial_cost = (trial_residual**2).sum(axis=1)
+        better = np.isfinite(trial_cost) & (trial_cost < cost[curves])
+        done = better & ((cost[curves] - trial_cost <= tolerance * cost[curves])
+                         | np.all(np.abs(trial - params[curves]) <= tolerance * (np.abs(params[curves]) + tolerance),
+                                  axis=1))
+        accepted = curves[better]
+        params[accepted] = trial[better]
+        residual[accepted] = trial_residual[better]
+        cost[accepted] = trial_cost[better]
+        damping[curves] = np.where(better, damping[curves] / 10, damping[curves] * 10)
+
+        # No step lowers the cost even with full damping: the curve stalled,
+        # often against a limit, and is left to curve_fit
+        stalled = ~better & (damping[curves] > 1e10)
+        converged[curves[done]] = True
+        active[curves[done | stalled]] = False
+    return params, converged
+
+#-------------------------------Fitting of Cycles------------------------------
+def DA06_Function_Gaussian_Fit_Block(tasks, window_size, maxfev=5000, batched=True):
+    # tasks: (cycle_id, direction, x, y, peak_indices, sigma_guess) in cycle
+    # order. With batched all curves with the same number of peaks are fitted
+    # as one batch from their peak heights, voltages and half-height widths,
+    # within the peak limits. A batch result only counts when it converged with every 
+    # amplitude off zero and every sigma inside its limits. All other curves
+    # (all curves without batched) are fitted with curve_fit in cycle order,
+    # starting from the result of the previous cycle in the same direction 
+    # when it has the same number of peaks. A failed joint fit falls back to
+    # one Gaussian per peak, fits which still fail are reported
+    results = {}
+    messages = []
+    by_peaks = {}
+    for task in tasks:
+        if len(task[4]) == 0:
+            results[(task[0], task[1])] = []
+        elif batched:
+            by_peaks.setdefault(len(task[4]), []).append(task)
+    
+    for n_peaks, batch in by_peaks.items():
+        limits = [DA06_Function_Gaussian_Limits(x, y, peak_indices, window_size)
+                  for _, _, x, y, peak_indices, _ in batch]
+        points = max(len(rows) for rows, _, _ in limits)
+        x_batch, y_batch = np.zeros((len(batch), points)), np.zeros((len(batch), points))
+        mask = np.zeros((len(batch), points))
+        p0, lower, upper = (np.empty((len(batch), 3 * n_peaks)) for _ in range(3))
+        for i, ((_, _, x, y, peak_indices, sigma_guess), (rows, lower[i], upper[i])) in enumerate(zip(batch, limits)):
+            valid = np.isfinite(x[rows]) & np.isfinite(y[rows])
+            x_batch[i, :len(rows)] = np.where(valid, x[rows], 0)
+            y_batch[i, :len(rows)] = np.where(valid, y[rows], 0)
+            mask[i, :len(rows)] = valid
+            p0[i] = np.clip(np.ravel([[y[peak], x[peak], sigma] for peak, sigma in
+                                      zip(peak_indices, DA06_Function_Sigma_Guess(x, y, peak_indices, sigma_guess))]),
+                            lower[i], upper[i])
+        params, converged = DA06_Function_Gaussian_Fit_Batch(x_batch, y_batch, mask, p0, lower, upper)
+        
+        # Amplitude at 0 or sigma at a limit (to 0.1 %): the batch fit ended
+        # on a limit
+        on_limit = ((np.abs(params[:, 0::3]) <= 1e-3 * np.abs(p0[:, 0::3]))
+                    | (params[:, 2::3] <= lower[:, 2::3] * 1.001)
+                    | (params[:, 2::3] >= upper[:, 2::3] * 0.999)).any(axis=1)
+        for i, (cycle_id, direction, *_) in enumerate(batch):
+            if converged[i] and not on_limit[i]:
+                results[(cycle_id, direction)] = list(params[i].reshape(-1, 3))
+    
+    # One by one in cycle order for the curves left
+    previous = {}
+    for cycle_id, direction, x, y, peak_indices, sigma_guess in tasks:
+        if (cycle_id, direction) in results:
+            params = results[(cycle_id, direction)]
+            previous[direction] = np.array(params) if params else None
+            continue
+        params = []
+        warm_start = previous.get(direction)
+        starts = [None]
+        if warm_start is not None and len(warm_start) == len(peak_indices):
+            starts = [warm_start, None]
+        for p0 in starts:
+            try:
+                params = list(DA06_Function_Gaussian_Fit_Branch(x, y, peak_indices, window_size,
+                                                                sigma_guess, p0, maxfev))
+                break
+            except (RuntimeError, ValueError):
+                continue
+        else:
+            messages.append(f"Joint Gaussian fit failed on cycle {cycle_id} ({direction}), fitting peaks one by one")
+            for peak in peak_indices:
+                try:
+                    params += list(DA06_Function_Gaussian_Fit_Branch(x, y, [peak], window_size,
+                                                                     sigma_guess, None, maxfev))
+                except (RuntimeError, ValueError) as exc:
+                    messages.append(f"Gaussian fit skipped on cycle {cycle_id} ({direction}), peak at {x[peak]:.3f} V: {exc}")
+        results[(cycle_id, direction)] = params
+        previous[direction] = np.array(params) if params else None
+    return results, messages
+
+def DA06_Function_Gaussian_Fit_Cycles(tasks, window_size, workers=1, maxfev=5000, batched=True):
+    # Fit all cycles, with workers > 1 the cycles are split into contiguous
+    # blocks (one per worker) so the warm start still runs within a block.
+    # Workers are spawned, not forked, as the render thread may be busy. 
+    # Starting a worker costs about as much as the batched fit of a few 
+    # thousand cycles, so they only pay off on very long tests or without 
+    # batched
+    cycle_ids = sorted({task[0] for task in tasks})
+    if workers <= 1 or len(cycle_ids) < 2 * workers:
+        results, messages = DA06_Function_Gaussian_Fit_Block(tasks, window_size, maxfev, batched)
+    else:
+        blocks = [set(block) for block in np.array_split(cycle_ids, workers)]
+        block_tasks = [[task for task in tasks if task[0] in block] for block in blocks]
+        results, messages = {}, []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            for block_results, block_messages in executor.map(DA06_Function_Gaussian_Fit_Block, block_tasks,
+                                                              [window_size] * workers, [maxfev] * workers,
+                                                              [batched] * workers):
+                results.update(block_results)
+                messages += block_messages
+
+    for message in messages:
+        print(message)
+    return results
@@ -11,6 +11,7 @@ Code Structure:
 6. DA04: Plot & analysis SOH over cycles
 7. DA05: Analysis of Statistical Summary
     8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
 
 == Part of DA ==
 - Function code for Plot & analysis of dQ/dV to Voltage
@@ -27,12 +28,200 @@ from scipy.interpolate import interp1d
 from scipy.signal import find_peaks
 from scipy.optimize import curve_fit
 import re
+from DA_Function.DA00_Function_Render import (DA00_Function_Save_Figure,
+                                              DA00_Function_Render_Submit)
+from DA_Function.DA00_Function_Profile import (DA00_Function_Profile_Step,
+                                               DA00_Function_Profiled)
+from DA_Function.DA06_Function_Gaussian_Fitting import DA06_Function_Gaussian_Fit_Cycles
+from DA_Function.DA00_Function_Results_Cache import (DA00_Function_Results_Cache_Key,
+                                                     DA00_Function_Results_Cache_Get,
+                                                     DA00_Function_Results_Cache_Put)
+from DA_Function.DA00_Function_Export import (DA00_Function_Export_Table,
+                                              DA00_Function_Export_Read)
 
+#----------------------------Batched dQ/dV Calculation--------------------------
+def DA06_Function_dQdV_Batch(df_VQ_grouped,cycle_numbers,interpolation_points,
+                             window_length,polyorder):
+    # Interpolate the charge and discharge branch of every cycle into one 2-D
+    # array (branches x interpolation_points), then calculate and smooth dQ/dV
+    # for all branches at once along axis 1. Every row has its own voltage 
+    # grid from its minimum to maximum voltage, the same as the per-cycle 
+    # calculation, so the results are identical. Branches with too few points
+    # are left out and calculated per cycle.
+    branches = []
+    for cycle_id in cycle_numbers:
+        for direction in ['Chg', 'DChg']:
+            columns = [f'Cycle_{cycle_id}_Cap{direction}', f'Cycle_{cycle_id}_V{direction}',
+                       f'Cycle_{cycle_id}_dQdV{direction}']
+            if all(column in df_VQ_grouped for column in columns):
+                cap = df_VQ_grouped[columns[0]].dropna().to_numpy(dtype=np.float64)
+                v = df_VQ_grouped[columns[1]].dropna().to_numpy(dtype=np.float64)
+                if len(v) >= 2 and len(v) == len(cap) and interpolation_points - 1 >= 3:
+                    branches.append((cycle_id, direction, v, cap))
+    if not branches:
+        return {}
+
+    # Voltage grid of every branch, shape (branches, interpolation_points)
+    v_min = np.array([np.min(v) for _, _, v, _ in branches])
+    v_max = np.array([np.max(v) for _, _, v, _ in branches])
+    v_interp = np.linspace(v_min, v_max, interpolation_points, axis=1)
+
+    # Linear interpolation of capacity, on voltage sorted the same way as 
+    # interp1d (stable sort, then numpy.interp)
+    cap_interp = np.empty_like(v_interp)
+    for row, (_, _, v, cap) in enumerate(branches):
+        sort_index = np.argsort(v, kind='mergesort')
+        cap_interp[row] = np.interp(v_interp[row], v[sort_index], cap[sort_index])
+
+    # dQ/dV and Savitzky-Golay smoothing of all branches in one call
+    dqdv_int = np.diff(cap_interp, axis=1) / np.diff(v_interp, axis=1)
+    dqdv_smooth = savgol_filter(dqdv_int, window_length, polyorder, axis=1)
+
+    return {(cycle_id, direction): (v_interp[row], cap_interp[row], dqdv_int[row], dqdv_smooth[row])
+            for row, (cycle_id, direction, _, _) in enumerate(branches)}
+
+#-------------------------Analytic Peak Threshold Search------------------------
+def DA06_Function_Peak_Search(signal,min_height,min_prominence,max_height,
+                              max_prominence,height_step,prominence_step,
+                              max_iterations,max_peaks,lower_thresholds=None):
+    # Same result as the stepping loop of DA06 (thresholds raised by one step
+    # while more than max_peaks peaks are found, lowered by one step while no
+    # peak is found), but find_peaks runs only once. All candidate peaks are
+    # found with their heights and prominences, the number of peaks at any 
+    # threshold is then a count over the candidates, and the first step with
+    # at most max_peaks peaks is found by bisection.
+    # lower_thresholds: None lowers the thresholds when this signal has no 
+    # peak (charge loop), True/False as in the discharge loop, which lowers
+    # them whenever it finds at most max_peaks peaks and no charge peak was 
+    # found
+    candidates, properties = find_peaks(signal, height=(None, None), prominence=(None, None))
+    heights = properties['peak_heights']
+    prominences = properties['prominences']
+
+    # Thresholds after k steps up from the minimum, and their peak count
+    def thresholds(k):
+        return (min(min_height + k * height_step, max_height),
+                min(min_prominence + k * prominence_step, max_prominence))
+
+    def count(height, prominence):
+        return int(np.count_nonzero((heights >= height) & (prominences >= prominence)))
+
+    height, prominence = thresholds(0)
+    k_stop = 0
+    if max_iterations > 0 and count(height, prominence) > max_peaks:
+        # The count never increases with k, bisect for the first step with
+        # at most max_peaks peaks within the iteration budget
+        low, high = 1, max_iterations
+        while low < high:
+            mid = (low + high) // 2
+            if count(*thresholds(mid)) <= max_peaks:
+                high = mid
+            else:
+                low = mid + 1
+        k_stop = low
+        height, prominence = thresholds(k_stop)
+
+    if k_stop < max_iterations:
+        peaks = count(height, prominence)
+        lower = peaks == 0 if lower_thresholds is None else lower_thresholds
+        # With peaks the loop ends after one step down. Without peaks it goes
+        # down and up again until max_iterations (one step below has too many
+        # peaks), the final thresholds depend on the remaining iterations
+        if lower and (peaks > 0 or (max_iterations - 1 - k_stop) % 2 == 0):
+            height = max(height - height_step, min_height)
+            prominence = max(prominence - prominence_step, min_prominence)
+
+    keep = (heights >= height) & (prominences >= prominence)
+    return candidates[keep], height, prominence
+
+#--------------------------------Per-Cycle Figures-----------------------------
+# Function for fitting
+def gaussian(x, amp, mean, sigma):
+    # Convert inputs to float to avoid type mismatch errors
+    amp, mean, sigma = map(float, (amp, mean, sigma))  # Convert parameters to float only
+    return amp * np.exp(-(x - mean)**2 / (2 * sigma**2))  # Array-safe operation
+
+def DA06_Function_dQdV_Cycle_Plot(file_name,result_folder,cycle_id,show_on_plot,
+                                  vchg,dqdvchg,vdchg,dqdvdchg,dQdV_chg_ori,
+                                  dQdV_dchg_ori,vchg_interp,vdchg_interp,
+                                  dQdV_chg_int,dQdV_dchg_int,dQdV_chg_smooth,
+                                  dQdV_dchg_smooth):
+    # dQ/dV figure of one cycle, may run in a render worker
+    plt.figure(figsize=(10, 6))
+
+    # Plot dQ/dV data from Neware
+    if 'data' in show_on_plot:
+        plt.plot(vchg, dqdvchg, label='Charge data', linestyle='--', color='purple')
+        plt.plot(vdchg, dqdvdchg, label='Discharge data', linestyle='--', color='orange')
+        
+    # Plot calculated dQ/dV 
+    if 'ori' in show_on_plot:
+        plt.scatter(vchg[:-1], dQdV_chg_ori, label='Charge ori', color='purple')
+        plt.scatter(vdchg[:-1], dQdV_dchg_ori, label='Discharge ori', color='orange')
+             
+    # Plot interpolated dQ/dV
+    if 'int' in show_on_plot:
+        plt.plot(vchg_interp[:-1], dQdV_chg_int, label='Charge int', linestyle='--', color='cyan')
+        plt.plot(vdchg_interp[:-1], dQdV_dchg_int, label='Discharge int', linestyle='--', color='yellow')
+        
+    # Plot smoothed dQ/dV
+    if 'smooth' in show_on_plot:
+        plt.plot(vchg_interp[:-1], dQdV_chg_smooth, label='Charge smooth', color='blue')
+        plt.plot(vdchg_interp[:-1], dQdV_dchg_smooth, label='Discharge smooth', color='red')
+
+    plt.xlabel('Voltage (V)')
+    plt.ylabel('dQ/dV (mAh/V)')
+    plt.ylim((dQdV_dchg_int.min()*1.05), (dQdV_chg_int.max()*1.05))
+    plt.title(f'dQ/dV Curve of {file_name} Cycle {cycle_id}')
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    DA00_Function_Save_Figure(plt.gcf(), f'{result_folder}/{file_name}/dQdV_{file_name}_Cycle_{cycle_id}.png', dpi=300)
+
+def DA06_Function_dQdV_Fitting_Plot(file_name,result_folder,cycle_id,v_chg_smooth,
+                                    dqdv_chg_smooth,v_dchg_smooth,dqdv_dchg_smooth,
+                                    Chg_peak_indices,DChg_peak_indices,
+                                    Chg_gauss_params,DChg_gauss_params):
+    # Peaks and Gaussian fits of one cycle, may run in a render worker
+    plt.figure(figsize=(12, 6))
+
+    # Plot the smoothed dQ/dV curve
+    plt.plot(v_chg_smooth, dqdv_chg_smooth, label='Charge Smoothed dQ/dV curve', color='blue')
+    plt.plot(v_dchg_smooth, dqdv_dchg_smooth, label='Discharge Smoothed dQ/dV curve', color='red')
+        
+    # Plot each fitted Gaussian
+    for Chg_params in Chg_gauss_params:
+        plt.plot(v_chg_smooth, gaussian(v_chg_smooth, *Chg_params), '--', label=f'Charging Gaussian fit (mean={Chg_params[1]:.2f})')
+        
+    # Highlight the detected peaks
+    plt.scatter(v_chg_smooth[Chg_peak_indices], dqdv_chg_smooth[Chg_peak_indices], color='red', label='Charge Detected Peaks')
+
+    # Plot each fitted Gaussian
+    for DChg_params in DChg_gauss_params:
+        plt.plot(v_dchg_smooth, gaussian(v_dchg_smooth, *DChg_params), '--', label=f'Discharging Gaussian fit (mean={DChg_params[1]:.2f})')
+
+    # Highlight the detected peaks
+    plt.scatter(v_dchg_smooth[DChg_peak_indices], dqdv_dchg_smooth[DChg_peak_indices], color='purple', label='Discharge Detected Peaks')
+
+    # Add labels, title, and legend
+    plt.xlabel('Voltage (V)')
+    plt.ylabel('dQ/dV (mAh/V)')
+    plt.ylim(dqdv_dchg_smooth[DChg_peak_indices].min(), dqdv_chg_smooth[Chg_peak_indices].max())
+    plt.title(f'dQ/dV Curve with fitting of {file_name} Cycle {cycle_id}')
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    DA00_Function_Save_Figure(plt.gcf(), f'{result_folder}/{file_name}/dQdV_fitting_{file_name}_Cycle_{cycle_id}.png', dpi=300)   
+
+#-------------------------------dQ/dV Main Function-----------------------------
+@DA00_Function_Profiled
 def DA06_Function_dQdV(file_name,df_VQ_grouped,show_on_plot,
                        interpolation_points,window_length,polyorder,
                        window_size,min_prominence,min_height,max_prominence,
                        max_height,prominence_step,height_step,max_iterations,
-                       max_peaks,result_folder):
+                       max_peaks,result_folder,cycles_to_update=None,
+                       batched=False,fast_peaks=False,fit_engine=False,
+                       fit_workers=1,results_cache=None,df_summary=None):
 
 #----------------------------------Functions-----------------------------------
     # Function of interpolation to reduce data points
@@ -50,11 +239,12 @@ def DA06_Function_dQdV(file_name,df_VQ_grouped,show_on_plot,
             return y  # Not enough data to smooth
         return savgol_filter(y,window_length,polyorder)
 
-    # Function for fitting
-    def gaussian(x, amp, mean, sigma):
-        # Convert inputs to float to avoid type mismatch errors
-        amp, mean, sigma = map(float, (amp, mean, sigma))  # Convert parameters to float only
-        return amp * np.exp(-(x - mean)**2 / (2 * sigma**2))  # Array-safe operation
+    # Function to combine stored results with updated cycles, sorted by cycle
+    def merge_cycle_columns(df_prev, df_new):
+        if df_prev.empty:
+            return df_new
+        df_merged = pd.concat([df_prev, df_new], axis=1)
+        return df_merged[sorted(df_merged.columns, key=lambda col: int(re.search(r'Cycle_(\d+)', col).group(1)))]
 
 #-----------------Initiation: create DataFrame & call Cycle ID-----------------   
     # Create DataFrames
@@ -63,9 +253,73 @@ def DA06_Function_dQdV(file_name,df_VQ_grouped,show_on_plot,
     df_peaks_data = []
     gaussian_results = []
 
-    # Extract unique cycle numbers from the column names
-    cycle_columns = [col for col in df_VQ_grouped.columns if re.match(r'Cycle_\d+_', col)]
-    cycle_numbers = sorted({int(re.search(r'Cycle_(\d+)_', col).group(1)) for col in cycle_columns})
+    # Cycles from the per-cycle summary, else from the column names
+    if df_summary is not None:
+        cycle_numbers = df_summary['Cycle_ID'].tolist()
+    else:
+        cycle_columns = [col for col in df_VQ_grouped.columns if re.match(r'Cycle_\d+_', col)]
+        cycle_numbers = sorted({int(re.search(r'Cycle_(\d+)_', col).group(1)) for col in cycle_columns})
+    all_cycle_numbers = cycle_numbers
+
+    # Incremental run: reuse stored results of cycles which are not updated
+    df_dqdv_prev = pd.DataFrame()
+    df_peaks_prev = pd.DataFrame()
+    df_fitting_prev = pd.DataFrame()
+    if cycles_to_update is not None:
+        keep_stored = lambda col: int(re.search(r'Cycle_(\d+)', col).group(1)) not in cycles_to_update
+        df_dqdv_stored = DA00_Function_Export_Read(result_folder,file_name,'df_dQdV')
+        if df_dqdv_stored is not None:
+            df_dqdv_prev = df_dqdv_stored[[col for col in df_dqdv_stored.columns if keep_stored(col)]]
+        df_peaks_stored = DA00_Function_Export_Read(result_folder,file_name,'df_peaks')
+        if df_peaks_stored is not None:
+            df_peaks_prev = df_peaks_stored[[col for col in df_peaks_stored.columns if keep_stored(col)]]
+        df_fitting_stored = DA00_Function_Export_Read(result_folder,file_name,'df_fitting')
+        if df_fitting_stored is not None:
+            df_fitting_prev = df_fitting_stored[~df_fitting_stored['Cycle ID'].isin(cycles_to_update)]
+        cycle_numbers = [cycle_id for cycle_id in cycle_numbers if cycle_id in cycles_to_update]
+
+    # Only cycles with V-Q data, a cycle still in its charge has none yet
+    cycle_numbers = [cycle_id for cycle_id in cycle_numbers
+                     if f'Cycle_{cycle_id}_VChg' in df_VQ_grouped or f'Cycle_{cycle_id}_VDChg' in df_VQ_grouped]
+    if not cycle_numbers:
+        # Nothing to update: the stored results stay as they are
+        print(f"No cycles of {file_name} with charge/discharge data to update, dQ/dV results unchanged.")
+        if cycles_to_update is None:
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return (df_dqdv_stored if df_dqdv_stored is not None else pd.DataFrame(),
+                df_peaks_stored if df_peaks_stored is not None else pd.DataFrame(),
+                df_fitting_stored if df_fitting_stored is not None else pd.DataFrame())
+
+    # Results cache: dQ/dV curves, peaks and per-peak Gaussian fits of 
+    # cycles with unchanged data and parameters are reused
+    cycle_keys = {}
+    cycle_results = {cycle_id: {} for cycle_id in cycle_numbers}
+    cycles_changed = set()
+    if results_cache is not None:
+        cache_params = {'interpolation_points': interpolation_points, 'window_length': window_length,
+                        'polyorder': polyorder, 'window_size': window_size,
+                        'min_prominence': min_prominence, 'min_height': min_height,
+                        'max_prominence': max_prominence, 'max_height': max_height,
+                        'prominence_step': prominence_step, 'height_step': height_step,
+                        'max_iterations': max_iterations, 'max_peaks': max_peaks}
+        for cycle_id in cycle_numbers:
+            cycle_keys[cycle_id] = DA00_Function_Results_Cache_Key(df_VQ_grouped,cycle_id,cache_params)
+            cycle_results[cycle_id] = DA00_Function_Results_Cache_Get(results_cache,file_name,'DA06',
+                                                                      cycle_id,cycle_keys[cycle_id]) or {}
+        print(f"Results cache: {sum('dqdv' in result for result in cycle_results.values())} of "
+              f"{len(cycle_numbers)} cycles of {file_name} reused.")
+    
+    # dQ/dV of cached cycles, in batched mode of all other cycles as well, is
+    # known before the cycle loop
+    dqdv_batch = {(cycle_id, direction): dqdv
+                  for cycle_id, result in cycle_results.items()
+                  for direction, dqdv in result.get('dqdv', {}).items()}
+    if batched:
+        batch_cycles = [cycle_id for cycle_id in cycle_numbers if 'dqdv' not in cycle_results[cycle_id]]
+        with DA00_Function_Profile_Step('DA06 interpolation', cycles=len(batch_cycles)):
+            dqdv_batch.update(DA06_Function_dQdV_Batch(df_VQ_grouped,batch_cycles,
+                                                       interpolation_points,
+                                                       window_length,polyorder))
 
 #---------------Calculating & Smoothing dQ/dV, Plotting per Cycle--------------
     for cycle_id in cycle_numbers:
@@ -76,13 +330,19 @@ def DA06_Function_dQdV(file_name,df_VQ_grouped,show_on_plot,
             vchg = df_VQ_grouped[f'Cycle_{cycle_id}_VChg'].dropna()
             dqdvchg = df_VQ_grouped[f'Cycle_{cycle_id}_dQdVChg'].dropna()
             
-            # Interpolate data
-            vchg_interp, capchg_interp = interpolate_data(vchg,capchg,interpolation_points)
-            
             # Calculate dQ/dV
             dQdV_chg_ori = np.diff(capchg) / np.diff(vchg)
-            dQdV_chg_int = np.diff(capchg_interp) / np.diff(vchg_interp)
-            dQdV_chg_smooth = smooth_data(dQdV_chg_int,window_length,polyorder)
+            if (cycle_id, 'Chg') in dqdv_batch:
+                vchg_interp, capchg_interp, dQdV_chg_int, dQdV_chg_smooth = dqdv_batch[(cycle_id, 'Chg')]
+            else:
+                # Interpolate data
+                with DA00_Function_Profile_Step('DA06 interpolation', cycles=1):
+                    vchg_interp, capchg_interp = interpolate_data(vchg,capchg,interpolation_points)
+                    dQdV_chg_int = np.diff(capchg_interp) / np.diff(vchg_interp)
+                    dQdV_chg_smooth = smooth_data(dQdV_chg_int,window_length,polyorder)
+            if 'Chg' not in cycle_results[cycle_id].setdefault('dqdv', {}):
+                cycle_results[cycle_id]['dqdv']['Chg'] = (vchg_interp, capchg_interp, dQdV_chg_int, dQdV_chg_smooth)
+                cycles_changed.add(cycle_id)
            
             # Combine those data into dataframe
             dqdv_data = pd.DataFrame({
@@ -98,13 +358,19 @@ def DA06_Function_dQdV(file_name,df_VQ_grouped,show_on_plot,
             vdchg = df_VQ_grouped[f'Cycle_{cycle_id}_VDChg'].dropna()
             dqdvdchg = df_VQ_grouped[f'Cycle_{cycle_id}_dQdVDChg'].dropna()
             
-            # Interpolate data
-            vdchg_interp, capdchg_interp = interpolate_data(vdchg,capdchg,interpolation_points)
-            
             # Calculate dQ/dV on interpolated data
             dQdV_dchg_ori = np.diff(capdchg) / np.diff(vdchg)
-            dQdV_dchg_int = np.diff(capdchg_interp) / np.diff(vdchg_interp)
-            dQdV_dchg_smooth = smooth_data(dQdV_dchg_int,window_length,polyorder)
+            if (cycle_id, 'DChg') in dqdv_batch:
+                vdchg_interp, capdchg_interp, dQdV_dchg_int, dQdV_dchg_smooth = dqdv_batch[(cycle_id, 'DChg')]
+            else:
+                # Interpolate data
+                with DA00_Function_Profile_Step('DA06 interpolation', cycles=1):
+                    vdchg_interp, capdchg_interp = interpolate_data(vdchg,capdchg,interpolation_points)
+                    dQdV_dchg_int = np.diff(capdchg_interp) / np.diff(vdchg_interp)
+                    dQdV_dchg_smooth = smooth_data(dQdV_dchg_int,window_length,polyorder)
+            if 'DChg' not in cycle_results[cycle_id].setdefault('dqdv', {}):
+                cycle_results[cycle_id]['dqdv']['DChg'] = (vdchg_interp, capdchg_interp, dQdV_dchg_int, dQdV_dchg_smooth)
+                cycles_changed.add(cycle_id)
             
             # Combine those data into dataframe
             dqdv_data = pd.DataFrame({
@@ -117,70 +383,44 @@ def DA06_Function_dQdV(file_name,df_VQ_grouped,show_on_plot,
     #----------------------------Plotting per cycle----------------------------
         # Plotting dQ/dV vs Voltage
         if 'data' or 'ori' or 'int' or 'smooth' in show_on_plot:
-            plt.figure(figsize=(10, 6))
-     
-            # Plot dQ/dV data from Neware
-            if 'data' in show_on_plot:
-                plt.plot(vchg, dqdvchg, label='Charge data', linestyle='--', color='purple')
-                plt.plot(vdchg, dqdvdchg, label='Discharge data', linestyle='--', color='orange')
-                
-            # Plot calculated dQ/dV 
-            if 'ori' in show_on_plot:
-                plt.scatter(vchg[:-1], dQdV_chg_ori, label='Charge ori', color='purple')
-                plt.scatter(vdchg[:-1], dQdV_dchg_ori, label='Discharge ori', color='orange')
-                     
-            # Plot interpolated dQ/dV
-            if 'int' in show_on_plot:
-                plt.plot(vchg_interp[:-1], dQdV_chg_int, label='Charge int', linestyle='--', color='cyan')
-                plt.plot(vdchg_interp[:-1], dQdV_dchg_int, label='Discharge int', linestyle='--', color='yellow')
-                
-            # Plot smoothed dQ/dV
-            if 'smooth' in show_on_plot:
-                plt.plot(vchg_interp[:-1], dQdV_chg_smooth, label='Charge smooth', color='blue')
-                plt.plot(vdchg_interp[:-1], dQdV_dchg_smooth, label='Discharge smooth', color='red')
-        
-            plt.xlabel('Voltage (V)')
-            plt.ylabel('dQ/dV (mAh/V)')
-            plt.ylim((dQdV_dchg_int.min()*1.05), (dQdV_chg_int.max()*1.05))
-            plt.title(f'dQ/dV Curve of {file_name} Cycle {cycle_id}')
-            plt.legend()
-            plt.grid(True)
-            plt.tight_layout()
-            plt.savefig(f'{result_folder}/{file_name}/dQdV_{file_name}_Cycle_{cycle_id}.png', dpi=300)
-            plt.show()
+            DA00_Function_Render_Submit(DA06_Function_dQdV_Cycle_Plot,file_name,result_folder,
+                                        cycle_id,show_on_plot,vchg,dqdvchg,vdchg,dqdvdchg,
+                                        dQdV_chg_ori,dQdV_dchg_ori,vchg_interp,vdchg_interp,
+                                        dQdV_chg_int,dQdV_dchg_int,dQdV_chg_smooth,
+                                        dQdV_dchg_smooth)
             
         else:
             continue
      
-    # Export the dQ/dV data to a CSV
+    # Export the dQ/dV data
     df_dqdv = pd.concat(df_dqdv_data, axis=1)
-    df_dqdv.to_csv(f'{result_folder}/{file_name}/df_dQdV_{file_name}.csv', index=False)
-    print("dQ/dV data saved successfully to",f'{result_folder}/{file_name}/df_dQdV_{file_name}.csv')
+    df_dqdv_all = merge_cycle_columns(df_dqdv_prev, df_dqdv)
+    DA00_Function_Export_Table(df_dqdv_all,result_folder,file_name,'df_dQdV')
     pd.set_option('display.max_columns', None)  # Show all columns   
     print('DataFrame df_dqdv preview: ')
-    print(df_dqdv.head(5))
+    print(df_dqdv_all.head(5))
 
 #-----------------------------Plot all cycles----------------------------------       
     # Create the plot with a rainbow color map, all cycles
-    colors = plt.cm.rainbow(np.linspace(0, 1, len(cycle_numbers)))
+    colors = plt.cm.rainbow(np.linspace(0, 1, len(all_cycle_numbers)))
     plt.figure(figsize=(10, 6))
     
-    for idx, cycle_id in enumerate(cycle_numbers):
+    for idx, cycle_id in enumerate(all_cycle_numbers):
         color = colors[idx]
         if cycle_id == 1:
             cycle_id = 2
             idx = 2
         else :
             #---------------------------On Charging----------------------------
-            if f'Cycle_{cycle_id}_VChg' in df_dqdv and f'Cycle_{cycle_id}_dQdVChg_Smooth' in df_dqdv:
-                plt.plot(df_dqdv[f'Cycle_{cycle_id}_VChg'], 
-                         df_dqdv[f'Cycle_{cycle_id}_dQdVChg_Smooth'],  
+            if f'Cycle_{cycle_id}_VChg' in df_dqdv_all and f'Cycle_{cycle_id}_dQdVChg_Smooth' in df_dqdv_all:
+                plt.plot(df_dqdv_all[f'Cycle_{cycle_id}_VChg'], 
+                         df_dqdv_all[f'Cycle_{cycle_id}_dQdVChg_Smooth'],  
                          color=color)
 
             #--------------------------On Discharging--------------------------
-            if f'Cycle_{cycle_id}_VDChg' in df_dqdv and f'Cycle_{cycle_id}_dQdVDChg_Smooth' in df_dqdv:
-                plt.plot(df_dqdv[f'Cycle_{cycle_id}_VDChg'],
-                         df_dqdv[f'Cycle_{cycle_id}_dQdVDChg_Smooth'], 
+            if f'Cycle_{cycle_id}_VDChg' in df_dqdv_all and f'Cycle_{cycle_id}_dQdVDChg_Smooth' in df_dqdv_all:
+                plt.plot(df_dqdv_all[f'Cycle_{cycle_id}_VDChg'],
+                         df_dqdv_all[f'Cycle_{cycle_id}_dQdVDChg_Smooth'], 
                          linestyle='--', color=color)
 
     plt.xlabel('Voltage (V)')
@@ -189,167 +429,196 @@ def DA06_Function_dQdV(file_name,df_VQ_grouped,show_on_plot,
     plt.title(f'Voltage vs dQ/dV for All Cycles - {file_name}')
     plt.legend()
     plt.grid(True)
-    plt.savefig(f'{result_folder}/{file_name}/All_Cycles_dQdV_{file_name}.png')
-    plt.show()
+    DA00_Function_Save_Figure(plt.gcf(), f'{result_folder}/{file_name}/All_Cycles_dQdV_{file_name}.png')
       
 #-----------------------Peaks finding & Gaussian Fitting-----------------------
     # Plot Charge dQ/dV with significant peaks
     if 'peaks-fitting' in show_on_plot:
-        for cycle_id in cycle_numbers:                       
-        #-----------------------------Peak Finding-----------------------------
-            #---------------------------On Charging----------------------------
-            height_range = min_height
-            prominence_range = min_prominence
-            Chg_peak_indices = []
-            iterations = 0
-            dqdv_chg_smooth = df_dqdv[f'Cycle_{cycle_id}_dQdVChg_Smooth']
-            print(dqdv_chg_smooth)
-            v_chg_smooth = df_dqdv[f'Cycle_{cycle_id}_VChg']
+        cycle_peaks = {}
+        with DA00_Function_Profile_Step('DA06 peak search', cycles=len(cycle_numbers)):
+            for cycle_id in cycle_numbers:                       
+            #-----------------------------Peak Finding-----------------------------
+                #---------------------------On Charging----------------------------
+                height_range = min_height
+                prominence_range = min_prominence
+                Chg_peak_indices = []
+                iterations = 0
+                dqdv_chg_smooth = df_dqdv[f'Cycle_{cycle_id}_dQdVChg_Smooth']
+                print(dqdv_chg_smooth)
+                v_chg_smooth = df_dqdv[f'Cycle_{cycle_id}_VChg']
             
-            # Looping height and prominence from minimum value for flexibility
-            while (len(Chg_peak_indices) > max_peaks or len(Chg_peak_indices) == 0) and iterations < max_iterations:
-                print(f"Iteration {iterations}: len(Chg_peak_indices) = {len(Chg_peak_indices)}, height_range = {height_range}, prominence_range = {prominence_range}")
+                if 'peaks' in cycle_results[cycle_id]:
+                    Chg_peak_indices = cycle_results[cycle_id]['peaks'][0]
+                elif fast_peaks:
+                    # One find_peaks call, thresholds from the candidate peaks
+                    Chg_peak_indices, height_range, prominence_range = DA06_Function_Peak_Search(
+                        dqdv_chg_smooth,min_height,min_prominence,max_height,max_prominence,
+                        height_step,prominence_step,max_iterations,max_peaks)
+                else:
+                    # Looping height and prominence from minimum value for flexibility
+                    while (len(Chg_peak_indices) > max_peaks or len(Chg_peak_indices) == 0) and iterations < max_iterations:
+                        print(f"Iteration {iterations}: len(Chg_peak_indices) = {len(Chg_peak_indices)}, height_range = {height_range}, prominence_range = {prominence_range}")
     
-                # Detect peaks
-                Chg_peak_indices, _ = find_peaks(dqdv_chg_smooth, height=height_range, prominence=prominence_range)
+                        # Detect peaks
+                        Chg_peak_indices, _ = find_peaks(dqdv_chg_smooth, height=height_range, prominence=prominence_range)
     
-                # Adjust height and prominence based on the number of detected peaks
-                if len(Chg_peak_indices) > max_peaks:
-                    print("Detected more than 2 peaks; increasing thresholds")
-                    height_range = min(height_range + height_step, max_height)
-                    prominence_range = min(prominence_range + prominence_step, max_prominence)
-                elif len(Chg_peak_indices) == 0:
-                    print("No peaks detected; decreasing thresholds")
-                    height_range = max(height_range - height_step, min_height)
-                    prominence_range = max(prominence_range - prominence_step, min_prominence)
+                        # Adjust height and prominence based on the number of detected peaks
+                        if len(Chg_peak_indices) > max_peaks:
+                            print("Detected more than 2 peaks; increasing thresholds")
+                            height_range = min(height_range + height_step, max_height)
+                            prominence_range = min(prominence_range + prominence_step, max_prominence)
+                        elif len(Chg_peak_indices) == 0:
+                            print("No peaks detected; decreasing thresholds")
+                            height_range = max(height_range - height_step, min_height)
+                            prominence_range = max(prominence_range - prominence_step, min_prominence)
     
-                iterations += 1     # Increment iteration count
+                        iterations += 1     # Increment iteration count
             
-            # Final peak detection after exiting the loop
-            Chg_peak_indices, _ = find_peaks(dqdv_chg_smooth, height=height_range, prominence=prominence_range)
-            Chg_peak_voltages = v_chg_smooth[Chg_peak_indices]
-            Chg_peak_heights = dqdv_chg_smooth[Chg_peak_indices]
-            print(f"On Cycle {cycle_id},Charge, the Peaks are Peak Voltages: {Chg_peak_voltages}, Peak Heights: {Chg_peak_heights}, Peak Indices: {Chg_peak_indices}\n")
+                    # Final peak detection after exiting the loop
+                    Chg_peak_indices, _ = find_peaks(dqdv_chg_smooth, height=height_range, prominence=prominence_range)
+                Chg_peak_voltages = v_chg_smooth[Chg_peak_indices]
+                Chg_peak_heights = dqdv_chg_smooth[Chg_peak_indices]
+                print(f"On Cycle {cycle_id},Charge, the Peaks are Peak Voltages: {Chg_peak_voltages}, Peak Heights: {Chg_peak_heights}, Peak Indices: {Chg_peak_indices}\n")
     
-            #--------------------------On Discharging--------------------------
-            height_range = min_height
-            prominence_range = min_prominence
-            DChg_peak_indices = []
-            iterations = 0
-            dqdv_dchg_smooth = df_dqdv[f'Cycle_{cycle_id}_dQdVDChg_Smooth']
-            v_dchg_smooth = df_dqdv[f'Cycle_{cycle_id}_VDChg']
+                #--------------------------On Discharging--------------------------
+                height_range = min_height
+                prominence_range = min_prominence
+                DChg_peak_indices = []
+                iterations = 0
+                dqdv_dchg_smooth = df_dqdv[f'Cycle_{cycle_id}_dQdVDChg_Smooth']
+                v_dchg_smooth = df_dqdv[f'Cycle_{cycle_id}_VDChg']
             
-            # Looping height and prominence from minimum value for flexibility
-            while (len(DChg_peak_indices) > max_peaks or len(DChg_peak_indices) == 0) and iterations < max_iterations:
-                print(f"Iteration {iterations}: len(DChg_peak_indices) = {len(DChg_peak_indices)}, height_range = {height_range}, prominence_range = {prominence_range}")
+                if 'peaks' in cycle_results[cycle_id]:
+                    DChg_peak_indices = cycle_results[cycle_id]['peaks'][1]
+                elif fast_peaks:
+                    # One find_peaks call, thresholds from the candidate peaks
+                    DChg_peak_indices, height_range, prominence_range = DA06_Function_Peak_Search(
+                        -dqdv_dchg_smooth,min_height,min_prominence,max_height,max_prominence,
+                        height_step,prominence_step,max_iterations,max_peaks,
+                        len(Chg_peak_indices) == 0)
+                else:
+                    # Looping height and prominence from minimum value for flexibility
+                    while (len(DChg_peak_indices) > max_peaks or len(DChg_peak_indices) == 0) and iterations < max_iterations:
+                        print(f"Iteration {iterations}: len(DChg_peak_indices) = {len(DChg_peak_indices)}, height_range = {height_range}, prominence_range = {prominence_range}")
     
-                # Detect peaks
-                DChg_peak_indices, _ = find_peaks(-dqdv_dchg_smooth, height=height_range, prominence=prominence_range)
+                        # Detect peaks
+                        DChg_peak_indices, _ = find_peaks(-dqdv_dchg_smooth, height=height_range, prominence=prominence_range)
     
-                # Adjust height and prominence based on the number of detected peaks
-                if len(DChg_peak_indices) > max_peaks:
-                    print("Detected more than 2 peaks; increasing thresholds")
-                    height_range = min(height_range + height_step, max_height)
-                    prominence_range = min(prominence_range + prominence_step, max_prominence)
-                elif len(Chg_peak_indices) == 0:
-                    print("No peaks detected; decreasing thresholds")
-                    height_range = max(height_range - height_step, min_height)
-                    prominence_range = max(prominence_range - prominence_step, min_prominence)
-
-                iterations += 1     # Increment iteration count
+                        # Adjust height and prominence based on the number of detected peaks
+                        if len(DChg_peak_indices) > max_peaks:
+                            print("Detected more than 2 peaks; increasing thresholds")
+                            height_range = min(height_range + height_step, max_height)
+                            prominence_range = min(prominence_range + prominence_step, max_prominence)
+                        elif len(Chg_peak_indices) == 0:
+                            print("No peaks detected; decreasing thresholds")
+                            height_range = max(height_range - height_step, min_height)
+                            prominence_range = max(prominence_range - prominence_step, min_prominence)
+
+                        iterations += 1     # Increment iteration count
     
-            # Final peak detection after exiting the loop
-            DChg_peak_indices, _ = find_peaks(-dqdv_dchg_smooth, height=height_range, prominence=prominence_range)
-            DChg_peak_voltages = v_dchg_smooth[DChg_peak_indices]
-            DChg_peak_heights = dqdv_dchg_smooth[DChg_peak_indices]
-            print(f"On Cycle {cycle_id}, Discharge, the Peaks are Peak Voltages: {DChg_peak_voltages}, Peak Heights: {DChg_peak_heights}, Peak Indices: {DChg_peak_indices}\n")
-
-            # Combine peak data into a dataframe for further analysis or export
-            peaks_data = pd.DataFrame({
-                f'Voltage_Charge_Peaks_Cycle_{cycle_id}': Chg_peak_voltages.reset_index(drop=True),
-                f'dQdV_Charge_Peaks_Cycle_{cycle_id}': Chg_peak_heights.reset_index(drop=True),
-                f'Voltage_DisCharge_Peaks_Cycle_{cycle_id}': DChg_peak_voltages.reset_index(drop=True),
-                f'dQdV_DisCharge_Peaks_Cycle_{cycle_id}': DChg_peak_heights.reset_index(drop=True),
-                f'Overvoltage_Peaks_Cycle_{cycle_id}': Chg_peak_voltages.reset_index(drop=True)-DChg_peak_voltages.reset_index(drop=True)
-            })
-            df_peaks_data.append(peaks_data)
+                    # Final peak detection after exiting the loop
+                    DChg_peak_indices, _ = find_peaks(-dqdv_dchg_smooth, height=height_range, prominence=prominence_range)
+                DChg_peak_voltages = v_dchg_smooth[DChg_peak_indices]
+                DChg_peak_heights = dqdv_dchg_smooth[DChg_peak_indices]
+                print(f"On Cycle {cycle_id}, Discharge, the Peaks are Peak Voltages: {DChg_peak_voltages}, Peak Heights: {DChg_peak_heights}, Peak Indices: {DChg_peak_indices}\n")
+
+                # Combine peak data into a dataframe for further analysis or export
+                peaks_data = pd.DataFrame({
+                    f'Voltage_Charge_Peaks_Cycle_{cycle_id}': Chg_peak_voltages.reset_index(drop=True),
+                    f'dQdV_Charge_Peaks_Cycle_{cycle_id}': Chg_peak_heights.reset_index(drop=True),
+                    f'Voltage_DisCharge_Peaks_Cycle_{cycle_id}': DChg_peak_voltages.reset_index(drop=True),
+                    f'dQdV_DisCharge_Peaks_Cycle_{cycle_id}': DChg_peak_heights.reset_index(drop=True),
+                    f'Overvoltage_Peaks_Cycle_{cycle_id}': Chg_peak_voltages.reset_index(drop=True)-DChg_peak_voltages.reset_index(drop=True)
+                })
+                df_peaks_data.append(peaks_data)
             
+                cycle_peaks[cycle_id] = (Chg_peak_indices, DChg_peak_indices)
+                if 'peaks' not in cycle_results[cycle_id]:
+                    cycle_results[cycle_id]['peaks'] = cycle_peaks[cycle_id]
+                    cycles_changed.add(cycle_id)
+
+        # Fitting engine: all peaks of a cycle together, all cycles at once
+        if fit_engine:
+            fit_tasks = []
+            for cycle_id in cycle_numbers:
+                Chg_peak_indices, DChg_peak_indices = cycle_peaks[cycle_id]
+                fit_tasks.append((cycle_id, 'Charge',
+                                  df_dqdv[f'Cycle_{cycle_id}_VChg'].to_numpy(),
+                                  df_dqdv[f'Cycle_{cycle_id}_dQdVChg_Smooth'].to_numpy(),
+                                  Chg_peak_indices, 0.05))
+                fit_tasks.append((cycle_id, 'Discharge',
+                                  df_dqdv[f'Cycle_{cycle_id}_VDChg'].to_numpy(),
+                                  df_dqdv[f'Cycle_{cycle_id}_dQdVDChg_Smooth'].to_numpy(),
+                                  DChg_peak_indices, 0.5))
+            with DA00_Function_Profile_Step('DA06 curve_fit', cycles=len(cycle_numbers)):
+                fit_results = DA06_Function_Gaussian_Fit_Cycles(fit_tasks,window_size,fit_workers)
+
+        for cycle_id in cycle_numbers:
+            Chg_peak_indices, DChg_peak_indices = cycle_peaks[cycle_id]
+            dqdv_chg_smooth = df_dqdv[f'Cycle_{cycle_id}_dQdVChg_Smooth']
+            v_chg_smooth = df_dqdv[f'Cycle_{cycle_id}_VChg']
+            dqdv_dchg_smooth = df_dqdv[f'Cycle_{cycle_id}_dQdVDChg_Smooth']
+            v_dchg_smooth = df_dqdv[f'Cycle_{cycle_id}_VDChg']
+
         #---------------Gaussian Fitting based on Detected Peaks---------------
             Chg_gauss_params = []
             DChg_gauss_params = []  
             Chg_gauss_area = []
             DChg_gauss_area = []
             
-            #---------------------------On Charging----------------------------
-            for Chg_peak in Chg_peak_indices:
-                # Take a small window around each peak for fitting
-                Chg_x_peak = v_chg_smooth[max(0, Chg_peak - window_size):min(len(v_chg_smooth), Chg_peak + window_size)]
-                Chg_y_peak = dqdv_chg_smooth[max(0, Chg_peak - window_size):min(len(v_chg_smooth), Chg_peak + window_size)]
+            if fit_engine:
+                Chg_gauss_params = fit_results[(cycle_id, 'Charge')]
+                DChg_gauss_params = fit_results[(cycle_id, 'Discharge')]
+            elif 'fits' in cycle_results[cycle_id]:
+                Chg_gauss_params, DChg_gauss_params, Chg_gauss_area, DChg_gauss_area = cycle_results[cycle_id]['fits']
+            else:
+                with DA00_Function_Profile_Step('DA06 curve_fit', cycles=1):
+                    #-------------------------On Charging--------------------------
+                    for Chg_peak in Chg_peak_indices:
+                        # Take a small window around each peak for fitting
+                        Chg_x_peak = v_chg_smooth[max(0, Chg_peak - window_size):min(len(v_chg_smooth), Chg_peak + window_size)]
+                        Chg_y_peak = dqdv_chg_smooth[max(0, Chg_peak - window_size):min(len(v_chg_smooth), Chg_peak + window_size)]
     
-                # Initial guesses for amp, mean, sigma
-                Chg_amp_guess = dqdv_chg_smooth[Chg_peak]
-                Chg_mean_guess = v_chg_smooth[Chg_peak]
-                Chg_sigma_guess = 0.05
+                        # Initial guesses for amp, mean, sigma
+                        Chg_amp_guess = dqdv_chg_smooth[Chg_peak]
+                        Chg_mean_guess = v_chg_smooth[Chg_peak]
+                        Chg_sigma_guess = 0.05
                 
-                try:
-                    Chg_popt, _ = curve_fit(gaussian, Chg_x_peak, Chg_y_peak, p0=[Chg_amp_guess, Chg_mean_guess, Chg_sigma_guess], maxfev=5000)
-                    Chg_area = Chg_popt[0] * Chg_popt[2] * np.sqrt(2 * np.pi)
-                    Chg_gauss_params.append(Chg_popt)  
-                    Chg_gauss_area.append(Chg_area)
-                except RuntimeError:
-                    continue # Skip if fitting fails
+                        try:
+                            Chg_popt, _ = curve_fit(gaussian, Chg_x_peak, Chg_y_peak, p0=[Chg_amp_guess, Chg_mean_guess, Chg_sigma_guess], maxfev=5000)
+                            Chg_area = Chg_popt[0] * Chg_popt[2] * np.sqrt(2 * np.pi)
+                            Chg_gauss_params.append(Chg_popt)  
+                            Chg_gauss_area.append(Chg_area)
+                        except RuntimeError:
+                            continue # Skip if fitting fails
                 
-            #--------------------------On Discharging--------------------------
-            for DChg_peak in DChg_peak_indices:
-                # Take a small window around each peak for fitting
-                DChg_x_peak = v_dchg_smooth[max(0, DChg_peak - window_size):min(len(v_dchg_smooth), DChg_peak + window_size)]
-                DChg_y_peak = dqdv_dchg_smooth[max(0, DChg_peak - window_size):min(len(v_dchg_smooth), DChg_peak + window_size)]
+                    #------------------------On Discharging------------------------
+                    for DChg_peak in DChg_peak_indices:
+                        # Take a small window around each peak for fitting
+                        DChg_x_peak = v_dchg_smooth[max(0, DChg_peak - window_size):min(len(v_dchg_smooth), DChg_peak + window_size)]
+                        DChg_y_peak = dqdv_dchg_smooth[max(0, DChg_peak - window_size):min(len(v_dchg_smooth), DChg_peak + window_size)]
     
-                # Initial guesses for amp, mean, sigma
-                DChg_amp_guess = dqdv_dchg_smooth[DChg_peak]
-                DChg_mean_guess = v_dchg_smooth[DChg_peak]
-                DChg_sigma_guess = 0.5
+                        # Initial guesses for amp, mean, sigma
+                        DChg_amp_guess = dqdv_dchg_smooth[DChg_peak]
+                        DChg_mean_guess = v_dchg_smooth[DChg_peak]
+                        DChg_sigma_guess = 0.5
                    
-                # Fit Gaussian to each peak
-                try:
-                    DChg_popt, _ = curve_fit(gaussian, DChg_x_peak, DChg_y_peak, p0=[DChg_amp_guess, DChg_mean_guess, DChg_sigma_guess], maxfev=5000)
-                    DChg_area = DChg_popt[0] * DChg_popt[2] * np.sqrt(2 * np.pi)
-                    DChg_gauss_params.append(DChg_popt)     
-                    DChg_gauss_area.append(DChg_area)
-                except RuntimeError:
-                    continue # Skip if fitting fails
+                        # Fit Gaussian to each peak
+                        try:
+                            DChg_popt, _ = curve_fit(gaussian, DChg_x_peak, DChg_y_peak, p0=[DChg_amp_guess, DChg_mean_guess, DChg_sigma_guess], maxfev=5000)
+                            DChg_area = DChg_popt[0] * DChg_popt[2] * np.sqrt(2 * np.pi)
+                            DChg_gauss_params.append(DChg_popt)     
+                            DChg_gauss_area.append(DChg_area)
+                        except RuntimeError:
+                            continue # Skip if fitting fails
+                    cycle_results[cycle_id]['fits'] = (Chg_gauss_params, DChg_gauss_params, Chg_gauss_area, DChg_gauss_area)
+                    cycles_changed.add(cycle_id)
             
             #------------------Plotting Fitted Curve on dQ/dV------------------
-            plt.figure(figsize=(12, 6))
-
-            # Plot the smoothed dQ/dV curve
-            plt.plot(v_chg_smooth, dqdv_chg_smooth, label='Charge Smoothed dQ/dV curve', color='blue')
-            plt.plot(v_dchg_smooth, dqdv_dchg_smooth, label='Discharge Smoothed dQ/dV curve', color='red')
-                
-            # Plot each fitted Gaussian
-            for Chg_params in Chg_gauss_params:
-                plt.plot(v_chg_smooth, gaussian(v_chg_smooth, *Chg_params), '--', label=f'Charging Gaussian fit (mean={Chg_params[1]:.2f})')
-                
-            # Highlight the detected peaks
-            plt.scatter(v_chg_smooth[Chg_peak_indices], dqdv_chg_smooth[Chg_peak_indices], color='red', label='Charge Detected Peaks')
-    
-            # Plot each fitted Gaussian
-            for DChg_params in DChg_gauss_params:
-                plt.plot(v_dchg_smooth, gaussian(v_dchg_smooth, *DChg_params), '--', label=f'Discharging Gaussian fit (mean={DChg_params[1]:.2f})')
-    
-            # Highlight the detected peaks
-            plt.scatter(v_dchg_smooth[DChg_peak_indices], dqdv_dchg_smooth[DChg_peak_indices], color='purple', label='Discharge Detected Peaks')
-    
-            # Add labels, title, and legend
-            plt.xlabel('Voltage (V)')
-            plt.ylabel('dQ/dV (mAh/V)')
-            plt.ylim(dqdv_dchg_smooth[DChg_peak_indices].min(), dqdv_chg_smooth[Chg_peak_indices].max())
-            plt.title(f'dQ/dV Curve with fitting of {file_name} Cycle {cycle_id}')
-            plt.legend()
-            plt.grid(True)
-            plt.tight_layout()
-            plt.savefig(f'{result_folder}/{file_name}/dQdV_fitting_{file_name}_Cycle_{cycle_id}.png', dpi=300)
-            plt.show()   
+            DA00_Function_Render_Submit(DA06_Function_dQdV_Fitting_Plot,file_name,result_folder,
+                                        cycle_id,v_chg_smooth,dqdv_chg_smooth,v_dchg_smooth,
+                                        dqdv_dchg_smooth,Chg_peak_indices,DChg_peak_indices,
+                                        Chg_gauss_params,DChg_gauss_params)
             
             #-------------------Compiling Fitted Properties--------------------
             peak_no_Chg = 1
@@ -369,20 +638,26 @@ def DA06_Function_dQdV(file_name,df_VQ_grouped,show_on_plot,
                 gaussian_results.append([cycle_id, 'Discharge', dchg_label, *dchg_popt, dchg_area])
                     
     #--------------------------------Exporting---------------------------------
-        # Export peak data to CSV
-        df_peaks = pd.concat(df_peaks_data, axis=1)
-        df_peaks.to_csv(f'{result_folder}/{file_name}/df_peaks_{file_name}.csv', index=False)
-        print("Peaks data saved successfully to", f'{result_folder}/{file_name}/df_peaks_{file_name}.csv')
+        # Export peak data
+        df_peaks = merge_cycle_columns(df_peaks_prev, pd.concat(df_peaks_data, axis=1))
+        DA00_Function_Export_Table(df_peaks,result_folder,file_name,'df_peaks')
         pd.set_option('display.max_columns', None)  # Show all columns   
         print('DataFrame df_peaks preview: ')
         print(df_peaks.head(5))
         
-        # Export fitted peaks properties data to CSV
+        # Export fitted peaks properties data
         df_fitting = pd.DataFrame(gaussian_results, columns=['Cycle ID', 'Status', 'Peak No', 'Amplitude', 'Mean', 'Sigma', 'Area'])
-        df_fitting.to_csv(f'{result_folder}/{file_name}/df_fitting_{file_name}.csv', index=False)
-        print("Gaussian fitting properties saved successfully to",f'{result_folder}/{file_name}/df_fitting_{file_name}.csv')
+        if not df_fitting_prev.empty:
+            df_fitting = pd.concat([df_fitting_prev, df_fitting], ignore_index=True).sort_values(by='Cycle ID', kind='stable').reset_index(drop=True)
+        DA00_Function_Export_Table(df_fitting,result_folder,file_name,'df_fitting')
         pd.set_option('display.max_columns', None)  # Show all columns   
         print('DataFrame df_fitting preview: ')
         print(df_fitting.head(5))
     
-    return df_dqdv, df_peaks, df_fitting
\ No newline at end of file
+    # Store the new results of changed cycles
+    if results_cache is not None:
+        for cycle_id in cycles_changed:
+            DA00_Function_Results_Cache_Put(results_cache,file_name,'DA06',cycle_id,
+                                            cycle_keys[cycle_id],cycle_results[cycle_id])
+    
+    return df_dqdv_all, df_peaks, df_fitting
\ No newline at end of file
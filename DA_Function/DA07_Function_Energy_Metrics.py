@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Code for automated data preprocessing
+
+Code Structure:
+1. Main
+2. DA00: Data Import, Dataframe creation, grouping
+3. DA01: Plot & analysis of Voltage and Current to Time
+4. DA02: Plot & analysis of Voltage to Capacity (Potential Profile)
+5. DA03: Plot & analysis of Coulombic Efficiency
+6. DA04: Plot & analysis SOH over cycles
+7. DA05: Analysis of Statistical Summary
+8. DA06: Plot & analysis of dQ/dV to Voltage
+    9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
+
+== Part of DA ==
+- Function code for Plot & analysis of the energy metrics of every cycle:
+  round-trip energy efficiency, mean charge and discharge voltage and a DC
+  internal resistance (DCIR) estimate from the current steps between a rest
+  and a CC/CV step. df_main is reduced to one row per step in one pass, all
+  metrics are array operations on that step table.
+
+
+Authors: Hans and Matthias
+
+"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from DA_Function.DA00_Function_Render import DA00_Function_Save_Figure
+from DA_Function.DA00_Function_Profile import (DA00_Function_Profiled)
+from DA_Function.DA00_Function_Export import (DA00_Function_Export_Table)
+
+# Step names of charge, discharge and rest steps
+CHARGE_STEPS = ['CC_Chg', 'CV_Chg']
+DISCHARGE_STEPS = ['CC_DChg']
+REST_STEPS = ['Rest']
+
+#-----------------------------------Step Table---------------------------------
+def DA07_Function_Step_Table(df_main):
+    # One row per step (records in record order): first and last voltage and
+    # current, last capacity and energy. Capacity and Energy restart with
+    # every step, so their last value is the amount of the step
+    cycle_ids = df_main['Cycle ID'].to_numpy()
+    step_ids = df_main['Step ID'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, (cycle_ids[1:] != cycle_ids[:-1]) | (step_ids[1:] != step_ids[:-1])])
+    lasts = np.r_[starts[1:], len(df_main)] - 1
+    if len(df_main) == 0:
+        starts = lasts = np.zeros(0, dtype=np.int64)
+    voltage = df_main['Voltage'].to_numpy(dtype=np.float64)
+    current = df_main['Current'].to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        'Cycle_ID': cycle_ids[starts].astype(np.int64),
+        'Step_ID': step_ids[starts].astype(np.int64),
+        'Step_Name': np.asarray(df_main['Step Name'], dtype=object)[starts],
+        'Samples': lasts - starts + 1,
+        'Voltage_First': voltage[starts],
+        'Voltage_Last': voltage[lasts],
+        'Current_First': current[starts],
+        'Current_Last': current[lasts],
+        'Capacity': df_main['Capacity'].to_numpy(dtype=np.float64)[lasts],
+        'Energy': df_main['Energy'].to_numpy(dtype=np.float64)[lasts],
+        })
+
+#--------------------------------Cycle Metrics---------------------------------
+def DA07_Function_Cycle_Metrics(df_steps,min_current_step):
+    # Metrics of every cycle with a discharge step:
+    # - Charge/Discharge_Energy (mWh), Charge/Discharge_Capacity (mAh): sum
+    #   over the charge / discharge steps of the cycle
+    # - Energy_Efficiency (%): discharge over charge energy
+    # - Mean_Charge/Discharge_Voltage (V): energy over capacity
+    # - DCIR_Chg/DChg (mOhm): mean of dV/dI over the transitions between a
+    #   rest and a charge / discharge step of the cycle (last record before,
+    #   first record after), only current steps of at least min_current_step
+    #   (mA). The transition belongs to the cycle of the charge/discharge step
+    names = df_steps['Step_Name'].to_numpy()
+    is_charge = np.isin(names, CHARGE_STEPS)
+    is_discharge = np.isin(names, DISCHARGE_STEPS)
+    is_rest = np.isin(names, REST_STEPS)
+    cycle_codes, cycle_ids = pd.factorize(df_steps['Cycle_ID'], sort=True)
+    n_cycles = len(cycle_ids)
+    cycle_sum = lambda weights, mask: np.bincount(cycle_codes[mask], weights[mask], minlength=n_cycles)
+
+    energy = df_steps['Energy'].to_numpy()
+    capacity = df_steps['Capacity'].to_numpy()
+    charge_energy = cycle_sum(energy, is_charge)
+    discharge_energy = cycle_sum(energy, is_discharge)
+    charge_capacity = cycle_sum(capacity, is_charge)
+    discharge_capacity = cycle_sum(capacity, is_discharge)
+
+    # Transitions rest -> CC/CV step and CC/CV step -> rest
+    is_active = is_charge | is_discharge
+    previous, following = np.arange(len(df_steps) - 1), np.arange(1, len(df_steps))
+    into_step = is_rest[previous] & is_active[following]
+    out_of_step = is_active[previous] & is_rest[following]
+    active = np.where(into_step, following, previous)
+    delta_current = df_steps['Current_First'].to_numpy()[following] - df_steps['Current_Last'].to_numpy()[previous]
+    delta_voltage = df_steps['Voltage_First'].to_numpy()[following] - df_steps['Voltage_Last'].to_numpy()[previous]
+    valid = (into_step | out_of_step) & (np.abs(delta_current) >= min_current_step)
+    resistance = np.zeros(len(valid))
+    resistance[valid] = delta_voltage[valid] / delta_current[valid] * 1e6                # V/mA -> mOhm
+    transition_cycles = cycle_codes[active]
+
+    def cycle_mean_resistance(step_mask):
+        mask = valid & step_mask[active]
+        counts = np.bincount(transition_cycles[mask], minlength=n_cycles)
+        sums = np.bincount(transition_cycles[mask], resistance[mask], minlength=n_cycles)
+        return np.divide(sums, counts, out=np.full(n_cycles, np.nan), where=counts > 0)
+
+    ratio = lambda numerator, denominator: np.divide(numerator, denominator, out=np.full(n_cycles, np.nan),
+                                                     where=denominator > 0)
+    df_energy = pd.DataFrame({
+        'Cycle_ID': np.asarray(cycle_ids, dtype=np.int64),
+        'Charge_Energy': charge_energy,
+        'Discharge_Energy': discharge_energy,
+        'Energy_Efficiency': ratio(discharge_energy, charge_energy) * 100,
+        'Mean_Charge_Voltage': ratio(charge_energy, charge_capacity),
+        'Mean_Discharge_Voltage': ratio(discharge_energy, discharge_capacity),
+        'DCIR_Chg': cycle_mean_resistance(is_charge),
+        'DCIR_DChg': cycle_mean_resistance(is_discharge),
+        })
+    has_discharge = np.bincount(cycle_codes[is_discharge], minlength=n_cycles) > 0
+    return df_energy[has_discharge].reset_index(drop=True)
+
+#-----------------Processing & Plotting Energy Metrics over cycles-------------
+@DA00_Function_Profiled
+def DA07_Function_Energy_Metrics(df_steps,min_current_step,file_name,result_folder):
+    df_energy = DA07_Function_Cycle_Metrics(df_steps,min_current_step)
+
+    # Save the result
+    DA00_Function_Export_Table(df_energy,result_folder,file_name,'df_Energy')
+    pd.set_option('display.max_columns', None)  # Show all columns
+    print('DataFrame df_energy preview: ')
+    print(df_energy.head(5))
+
+    fig, (ax1, ax3) = plt.subplots(2, 1, figsize=(10, 9), sharex=True, layout='constrained')
+
+    color = 'tab:blue'
+    ax1.set_ylabel('Energy Efficiency (%)', color=color)
+    ax1.plot(df_energy['Cycle_ID'], df_energy['Energy_Efficiency'], color=color,
+             marker='o', label='Energy Efficiency')
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax1.grid(True)
+
+    ax2 = ax1.twinx()
+    ax2.set_ylabel('Mean Voltage (V)')
+    ax2.plot(df_energy['Cycle_ID'], df_energy['Mean_Charge_Voltage'], color='tab:green',
+             marker='x', linestyle='--', label='Mean Charge Voltage')
+    ax2.plot(df_energy['Cycle_ID'], df_energy['Mean_Discharge_Voltage'], color='tab:red',
+             marker='x', linestyle='--', label='Mean Discharge Voltage')
+    ax1.set_title(f'Energy Efficiency, Mean Voltage and DCIR vs Cycle - {file_name}')
+
+    ax3.set_xlabel('Cycle ID')
+    ax3.set_ylabel('DCIR (mOhm)')
+    ax3.plot(df_energy['Cycle_ID'], df_energy['DCIR_Chg'], color='tab:green',
+             marker='o', label='DCIR Charge')
+    ax3.plot(df_energy['Cycle_ID'], df_energy['DCIR_DChg'], color='tab:red',
+             marker='o', label='DCIR Discharge')
+    ax3.grid(True)
+
+    fig.legend(loc='outside lower center', ncols=3)
+    DA00_Function_Save_Figure(fig, f'{result_folder}/{file_name}/Energy-cycles_{file_name}.png', dpi=300)
+
+    return df_energy
@@ -11,6 +11,7 @@ Code Structure:
 6. DA04: Plot & analysis SOH over cycles
 7. DA05: Analysis of Statistical Summary
 8. DA06: Plot & analysis of dQ/dV to Voltage
+9. DA07: Plot & analysis of Energy Efficiency, Mean Voltage and DCIR
 
 
 == Part of DA ==
@@ -21,48 +22,89 @@ Authors: Hans and Matthias
 
 """
 
+import argparse
 from DA_Function.DA00_Function_Import_Main_df import (DA00_Function_Import, 
-                                                      DA00_Function_df_Cycle_Grouping)
+                                                      DA00_Function_Import_Incremental,
+                                                      DA00_Function_Import_Commit,
+                                                      DA00_Function_Import_Stream,
+                                                      DA00_Function_df_Cycle_Grouping,
+                                                      DA00_Function_df_Cycle_Grouping_Stream,
+                                                      DA00_Function_Grouping_Save,
+                                                      DA00_Function_Grouping_Load,
+                                                      DA00_Function_Import_Signatures,
+                                                      DA00_Function_Schema)
 from DA_Function.DA01_Function_VnIvsTime import (DA01_Function_VnIvsTime,
                                                  DA01_Function_Power)
 from DA_Function.DA02_Function_VvsCap import (DA02_Function_VvsCap)
 from DA_Function.DA03_Function_Coulombic_Efficiency import (DA03_Function_Coulombic_Efficiency)
 from DA_Function.DA04_Function_SOH import (DA04_Function_SOH)
 from DA_Function.DA06_Function_dQdV import (DA06_Function_dQdV)
+from DA_Function.DA07_Function_Energy_Metrics import (DA07_Function_Energy_Metrics)
+from DA_Function.DA00_Function_Pipeline import (DA00_Function_Pipeline_Run)
+from DA_Function.DA00_Function_Results_Cache import (DA00_Function_Results_Cache_Evict)
+from DA_Function.DA00_Function_Render import (DA00_Function_Render_Setup,
+                                              DA00_Function_Render_Wait)
+from DA_Function.DA00_Function_Profile import (DA00_Function_Profile_Start,
+                                               DA00_Function_Profile_Report)
+from DA_Function.DA00_Function_Export import (DA00_Function_Export_Setup,
+                                              DA00_Function_Export_Table,
+                                              DA00_Function_Export_Read,
+                                              DA00_Function_Export_Wait)
+from DA_Function.DA00_Function_Fleet import (DA00_Function_Fleet_Update)
+from DA_Function.DA00_Function_Online import (DA00_Online_Metrics,
+                                              DA00_Function_Online_Print)
 
 #----------------------------------Data input----------------------------------
 data_folder = 'DA_Data'                                                        # <=== Insert folder of the data file(s)
 result_folder = 'DA_Result'                                                    # <=== Insert folder for result
 file_names = ['N1T1', 'N2T2']                                                  # <=== Insert file name
 rated_capacity = 2100                                                          # <=== Insert rated capacity of battery
+cache_folder = 'DA_Cache'                                                      # <=== Insert folder for import cache (None to disable)
+fleet_folder = 'DA_Fleet'                                                      # <=== Insert folder of the fleet store collecting CE/SOH of all cells (None to disable)
+results_cache_mb = 500                                                         # <=== Insert size limit of the DA06 results cache in cache_folder (MB)
+incremental = False                                                            # <=== Insert True to only update new cycles of running tests (needs cache_folder)
+streaming = False                                                              # <=== Insert True to import cycle by cycle without building df_main (no cache)
+online_metrics = False                                                         # <=== Insert True to print CE/SOH of every cycle as soon as its discharge is read (streaming or incremental)
+neware_parser = 'numpy'                                                        # <=== Insert parser of the txt files: 'numpy' (fixed-format), 'pyarrow' (multithreaded, needs pyarrow) or 'pandas'
+measurement_float32 = False                                                    # <=== Insert True to keep Voltage, Current, Capacity, Power, Energy, dQdV as float32
+dtype_overrides = {}                                                           # <=== Insert column dtypes replacing NEWARE_SCHEMA, e.g. {'Energy': 'float32'}
+headless = False                                                               # <=== Insert True to only save figures, rendered in the background (no windows)
+render_workers = 1                                                             # <=== Insert number of worker processes for per-cycle figures (headless only)
+full_resolution_plots = False                                                  # <=== Insert True to plot every sample in DA01 (no decimation)
+long_format = True                                                             # <=== Insert True to keep V-Q data in the long-format cycle store
+export_wide_csv = True                                                         # <=== Insert True to export the wide df_VQ_grouped CSV (needs 'csv' in export_formats)
+export_formats = ['parquet']                                                   # <=== Insert formats of the result tables: 'parquet' (one compressed dataset per cell, needs pyarrow) and/or 'csv'
+export_compression = 'zstd'                                                    # <=== Insert compression of the Parquet tables ('zstd', 'snappy', 'gzip' or None)
+profiling = False                                                              # <=== Insert True to write a timing report DA_Profile_{file_name}.json/.csv per cell
+profiling_cprofile = False                                                     # <=== Insert True to also dump cProfile stats DA_Profile_{file_name}.prof (needs profiling)
+batched_dqdv = True                                                            # <=== Insert True to calculate dQ/dV of all cycles in one batch (DA06)
+fast_peak_search = True                                                        # <=== Insert True to find the peak thresholds with one find_peaks call (DA06)
+gaussian_fit_engine = False                                                    # <=== Insert True to fit all peaks of a cycle together (sum of Gaussians, batched over the cycles, DA06)
+fit_workers = 1                                                                # <=== Insert number of worker processes for the fitting engine (DA06)
+dcir_min_current = 0.1                                                         # <=== Insert the smallest current step used for DCIR (C-rate, DA07)
 
 
-for file_name in file_names:
+#-------------------------------Process one cell-------------------------------
+def DA_Main_Process(data_folder,result_folder,file_name,rated_capacity,stages=None):
+    # stages: names of the stages to run (default all), the stages they depend
+    # on are only run again when their stored products are missing or stale
     print(f"Processing file: {file_name}")
-#---------------------------------Data Import----------------------------------
-    df_main = DA00_Function_Import(data_folder,file_name,rated_capacity)
-
-# ----------------------------Data Grouping by Cycle----------------------------
-    # Grouping based on cycle, combining CC Chg & CV Chg into one Chg data
-    df_cycle_grouped,df_VQ_grouped = DA00_Function_df_Cycle_Grouping(df_main,
-                                                                   result_folder,
-                                                                   file_name)
-
-#-------------------------Direct Plotting: VnIvsTime---------------------------
-    DA01_Function_VnIvsTime(result_folder,file_name,df_cycle_grouped)     
-
-#---------------------------Direct Plotting: Power-----------------------------
-    DA01_Function_Power(result_folder,file_name,df_cycle_grouped)           
-
-#------------------Direct Plotting: VvsCap (Potential Profile)-----------------
-    DA02_Function_VvsCap(df_VQ_grouped,file_name,result_folder,rated_capacity)
-
-#-----------------Calculation & Plotting: Coulombic Efficiency-----------------
-    df_ce = DA03_Function_Coulombic_Efficiency(df_VQ_grouped,file_name,result_folder)  
-
-#----------------Calculation & Plotting: State of Health (SOH)-----------------
-    df_SOH = DA04_Function_SOH(df_VQ_grouped,rated_capacity,file_name,result_folder)
-
+    # Timing of every DA function and sub-step of this cell
+    DA00_Function_Profile_Start(profiling,profiling_cprofile)
+    # Result tables are written on the export thread
+    DA00_Function_Export_Setup(export_formats,export_compression)
+    # Column types of df_main
+    schema = DA00_Function_Schema(measurement_float32,dtype_overrides)
+    
+    # Intermediate products of the pipeline are stored next to the cache
+    store_folder = None if cache_folder is None else f'{cache_folder}/{file_name}/pipeline'
+    
+    # Cycles with new records, set when the import runs (None: all cycles)
+    update_state = {'cycles_to_update': None}
+    
+    # CE and SOH of every cycle while the records are read
+    online = DA00_Online_Metrics(rated_capacity,DA00_Function_Online_Print) if online_metrics else None
+    
 #------------------------------------dQ/dV-------------------------------------
     # Interpolation setup
     interpolation_points = 300                                               # <=== Insert data point numbers for interpolation
@@ -93,13 +135,192 @@ for file_name in file_names:
                     'peaks-fitting'                                            #      - 'peaks-fitting':notate peaks and plot Gaussian 
                                                                                #         fitting curve on the plot             
                     ]
+
+#---------------------------------Data Import----------------------------------
+    def stage_import():
+        if incremental:
+            df_main,cycles_to_update = DA00_Function_Import_Incremental(data_folder,file_name,
+                                                                        rated_capacity,
+                                                                        cache_folder,schema,
+                                                                        neware_parser,online)
+            if not cycles_to_update:
+                print(f"No new records for {file_name}, results are up to date.")
+                return None
+        elif not streaming:
+            df_main = DA00_Function_Import(data_folder,file_name,rated_capacity,
+                                           cache_folder,schema,neware_parser)
+            cycles_to_update = None
+        else:
+            # Cycles are read while they are grouped, df_main is never built
+            df_main,cycles_to_update = None,None
+        update_state['cycles_to_update'] = cycles_to_update
+        return (df_main,)
+
+    def load_import():
+        # df_main from the import cache
+        return stage_import() if not incremental else None
+
+# ----------------------------Data Grouping by Cycle----------------------------
+    def stage_grouping(df_main):
+        # Grouping based on cycle, combining CC Chg & CV Chg into one Chg data.
+        # The long-format store is the pipeline product, with long_format off
+        # DA02/DA06 get the wide dataframe made from it (vq_input)
+        if df_main is None:
+            cycles = DA00_Function_Import_Stream(data_folder,file_name,rated_capacity,
+                                                 online=online,schema=schema,
+                                                 parser=neware_parser)
+            df_cycle_grouped,vq_store,df_steps = DA00_Function_df_Cycle_Grouping_Stream(cycles,
+                                                                                        result_folder,
+                                                                                        file_name,
+                                                                                        True,
+                                                                                        export_wide_csv)
+        else:
+            df_cycle_grouped,vq_store,df_steps = DA00_Function_df_Cycle_Grouping(df_main,
+                                                                                 result_folder,
+                                                                                 file_name,
+                                                                                 True,
+                                                                                 export_wide_csv)
+        return df_cycle_grouped,vq_store,vq_store.summary,df_steps
+
+    def save_grouping(df_cycle_grouped,df_VQ_grouped,df_summary,df_steps):
+        DA00_Function_Grouping_Save(store_folder,df_cycle_grouped,df_VQ_grouped,df_steps)
+
+    def load_grouping():
+        stored = DA00_Function_Grouping_Load(store_folder)
+        if stored is None:
+            return None
+        df_cycle_grouped,vq_store,df_steps = stored
+        return df_cycle_grouped,vq_store,vq_store.summary,df_steps
+
+    def vq_input(vq_store):
+        # V-Q data as DA02/DA06 take it: the store or the wide dataframe
+        return vq_store if long_format else vq_store.to_wide()
+
+#-------------------------Direct Plotting: VnIvsTime---------------------------
+    def stage_vnitime(df_cycle_grouped):
+        DA01_Function_VnIvsTime(result_folder,file_name,df_cycle_grouped,
+                                full_resolution_plots,update_state['cycles_to_update'])
+        return ()
+
+#---------------------------Direct Plotting: Power-----------------------------
+    def stage_power(df_cycle_grouped):
+        DA01_Function_Power(result_folder,file_name,df_cycle_grouped,
+                            full_resolution_plots,update_state['cycles_to_update'])
+        return ()
+
+#------------------Direct Plotting: VvsCap (Potential Profile)-----------------
+    def stage_vvscap(df_VQ_grouped,df_summary):
+        DA02_Function_VvsCap(vq_input(df_VQ_grouped),file_name,result_folder,rated_capacity,
+                             df_summary,update_state['cycles_to_update'])
+        return ()
+
+#-----------------Calculation & Plotting: Coulombic Efficiency-----------------
+    def stage_ce(df_summary):
+        df_ce = DA03_Function_Coulombic_Efficiency(df_summary,file_name,result_folder)
+        return (df_ce,)
+
+#----------------Calculation & Plotting: State of Health (SOH)-----------------
+    def stage_soh(df_summary):
+        df_SOH = DA04_Function_SOH(df_summary,rated_capacity,file_name,result_folder)
+        return (df_SOH,)
+
+#--------Calculation & Plotting: Energy Efficiency, Mean Voltage, DCIR---------
+    def stage_energy(df_steps):
+        # One row per step, built by the grouping (also while streaming)
+        df_energy = DA07_Function_Energy_Metrics(df_steps,dcir_min_current*rated_capacity,
+                                                 file_name,result_folder)
+        return (df_energy,)
+
+#------------------------------------dQ/dV-------------------------------------
+    def stage_dqdv(df_VQ_grouped,df_summary):
+        cycles_to_update = update_state['cycles_to_update']
+        df_dqdv,df_peaks,df_fitting = DA06_Function_dQdV(file_name,vq_input(df_VQ_grouped),
+                                                         show_on_plot,
+                                                         interpolation_points,
+                                                         window_length,polyorder,
+                                                         window_size,min_prominence,
+                                                         min_height,max_prominence,
+                                                         max_height,prominence_step,
+                                                         height_step,max_iterations,
+                                                         max_peaks,result_folder,
+                                                         cycles_to_update,batched_dqdv,
+                                                         fast_peak_search,gaussian_fit_engine,
+                                                         fit_workers,cache_folder,df_summary)
+        return df_dqdv,df_peaks,df_fitting
+
+    def load_results(*names):
+        # Products of DA03-DA06 are their exported result tables
+        tables = [DA00_Function_Export_Read(result_folder,file_name,name) for name in names]
+        if any(table is None for table in tables):
+            return None
+        return tuple(tables)
+
+#------------------------------------Pipeline----------------------------------
+    # Stages in running order with the products they need and make
+    pipeline = {
+        'import':   {'inputs': [], 'outputs': ['df_main'],
+                     'run': stage_import, 'load': load_import,
+                     'params': {'files': DA00_Function_Import_Signatures(data_folder,file_name),
+                                'schema': schema, 'incremental': incremental,
+                                'streaming': streaming}},
+        'grouping': {'inputs': ['df_main'], 'outputs': ['df_cycle_grouped', 'df_VQ_grouped', 'df_summary', 'df_steps'],
+                     'run': stage_grouping, 'save': save_grouping, 'load': load_grouping},
+        'vnitime':  {'inputs': ['df_cycle_grouped'], 'outputs': [], 'run': stage_vnitime},
+        'power':    {'inputs': ['df_cycle_grouped'], 'outputs': [], 'run': stage_power},
+        'vvscap':   {'inputs': ['df_VQ_grouped', 'df_summary'], 'outputs': [], 'run': stage_vvscap},
+        'ce':       {'inputs': ['df_summary'], 'outputs': ['df_ce'],
+                     'run': stage_ce, 'load': lambda: load_results('df_CE')},
+        'soh':      {'inputs': ['df_summary'], 'outputs': ['df_SOH'],
+                     'run': stage_soh, 'load': lambda: load_results('df_SOH'),
+                     'params': {'rated_capacity': rated_capacity}},
+        'energy':   {'inputs': ['df_steps'], 'outputs': ['df_energy'],
+                     'run': stage_energy, 'load': lambda: load_results('df_Energy'),
+                     'params': {'rated_capacity': rated_capacity, 'dcir_min_current': dcir_min_current}},
+        'dqdv':     {'inputs': ['df_VQ_grouped', 'df_summary'], 'outputs': ['df_dqdv', 'df_peaks', 'df_fitting'],
+                     'run': stage_dqdv, 'load': lambda: load_results('df_dQdV', 'df_peaks', 'df_fitting'),
+                     'params': {'interpolation_points': interpolation_points, 'window_length': window_length,
+                                'polyorder': polyorder, 'min_prominence': min_prominence,
+                                'min_height': min_height, 'max_prominence': max_prominence,
+                                'max_height': max_height, 'prominence_step': prominence_step,
+                                'height_step': height_step, 'max_iterations': max_iterations,
+                                'max_peaks': max_peaks, 'window_size': window_size,
+                                'gaussian_fit_engine': gaussian_fit_engine, 'show_on_plot': show_on_plot}},
+        }
+    DA00_Function_Pipeline_Run(pipeline,stages or list(pipeline),store_folder)
+    if online is not None and online.rows:
+        DA00_Function_Export_Table(online.results(),result_folder,file_name,'df_Online')
+
+    # Wait until every figure and result table of this cell is saved
+    DA00_Function_Render_Wait()
+    DA00_Function_Export_Wait()
+    DA00_Function_Profile_Report(result_folder,file_name)
+
+    # The new records count as ingested once every stage has saved its results
+    # of them, a failed or partial run reads them again next time
+    if incremental and (stages is None or set(stages) >= set(pipeline)):
+        DA00_Function_Import_Commit(cache_folder,file_name)
+
+    # Per-cycle CE and SOH of this cell for the cross-cell queries
+    if fleet_folder is not None:
+        DA00_Function_Fleet_Update(fleet_folder,file_name,
+                                   DA00_Function_Export_Read(result_folder,file_name,'df_CE'),
+                                   DA00_Function_Export_Read(result_folder,file_name,'df_SOH'))
+
+    # Keep the results cache within its size limit
+    if cache_folder is not None:
+        DA00_Function_Results_Cache_Evict(cache_folder,results_cache_mb)
+
+    return
+
+#-------------------------------Process all cells------------------------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Process the cells of DA_Main.py.')
+    parser.add_argument('--stages', default=None, 
+                        help='comma separated stages to run: import, grouping, vnitime, power, vvscap, ce, soh, energy, dqdv (default all)')
+    parser.add_argument('--cells', default=None, help='comma separated cells (default file_names)')
+    args = parser.parse_args()
+    stages = args.stages.split(',') if args.stages else None
     
-    df_dqdv,df_peaks,df_fitting = DA06_Function_dQdV(file_name,df_VQ_grouped,
-                                                     show_on_plot,
-                                                     interpolation_points,
-                                                     window_length,polyorder,
-                                                     window_size,min_prominence,
-                                                     min_height,max_prominence,
-                                                     max_height,prominence_step,
-                                                     height_step,max_iterations,
-                                                     max_peaks,result_folder)
\ No newline at end of file
+    DA00_Function_Render_Setup(headless,workers=render_workers)
+    for file_name in (args.cells.split(',') if args.cells else file_names):
+        DA_Main_Process(data_folder,result_folder,file_name,rated_capacity,stages)